@@ -117,6 +117,7 @@ http://pythonhosted.org/steelscript/
         'test': test,
         'doc': doc,
         'dev': [pkg for pkg in itertools.chain(test, doc)],
+        'feather': ['pyarrow'],
         'all': ['steelscript.cmdline', 'pysnmp']
     },
 
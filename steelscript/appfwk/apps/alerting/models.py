@@ -140,7 +140,10 @@ def process_data(sender, **kwargs):
     if triggers:
         logger.debug('Found %d triggers.' % len(triggers))
         if callable(data):
+            # Job data is shared, trigger functions get their own copy
             data = data()
+            if data is not None:
+                data = data.copy()
         for t in triggers:
             TriggerThread(t, data, context).start()
 
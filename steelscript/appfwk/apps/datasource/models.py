@@ -8,16 +8,19 @@
 import copy
 import string
 import inspect
+import uuid
 import logging
 import datetime
-import tokenize
 import importlib
-from StringIO import StringIO
+from collections import OrderedDict
 
 import pytz
+import pandas
 
 from django.db import models
 from django.db import DatabaseError
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from django.utils.text import slugify
@@ -30,9 +33,12 @@ from steelscript.appfwk.project.utils import (get_module_name, get_sourcefile,
 from steelscript.appfwk.libs.fields import (PickledObjectField, FunctionField,
                                             SeparatedValuesField,
                                             check_field_choice,
-                                            field_choice_str)
+                                            field_choice_str,
+                                            clear_decoded_values)
 from steelscript.appfwk.apps.datasource.exceptions import \
     TableComputeSyntheticError, DatasourceException
+from steelscript.appfwk.apps.datasource.synthetic import \
+    SyntheticExpression, synthetic_graph, synthetic_closure, synthetic_order
 
 
 logger = logging.getLogger(__name__)
@@ -45,6 +51,37 @@ for module in settings.APPFWK_SYNTHETIC_MODULES:
     globals()[module] = importlib.import_module(module)
 
 
+# Functions returning the names of the columns of a table they read,
+# or None for any column, see Table.consumed_columns
+column_consumers = []
+
+
+def register_column_consumer(func):
+    """ Register `func` as a reader of table columns.
+
+    `func` is called with a Table and returns the names of the columns
+    it reads from data of that table, or None if it may read any.
+
+    """
+    column_consumers.append(func)
+    return func
+
+
+# Query classes by (module, class name), see Table.queryclass
+queryclasses = {}
+
+
+def clear_table_cache():
+    """ Drop resolved query classes and decoded table options.
+
+    Reloading a report module replaces the classes it defines, so this
+    is called when reports are reloaded.
+
+    """
+    queryclasses.clear()
+    clear_decoded_values()
+
+
 class TableField(models.Model):
     """
     Defines a single field associated with a table.
@@ -166,6 +203,10 @@ class TableField(models.Model):
         return param
 
 
+def new_columns_stamp():
+    return uuid.uuid4().hex
+
+
 class Table(models.Model):
     name = models.CharField(max_length=200)
 
@@ -195,7 +236,7 @@ class Table(models.Model):
     resample = models.BooleanField(default=False)
 
     # options are typically fixed attributes defined at Table creation
-    options = PickledObjectField()
+    options = PickledObjectField(cache_values=True, fast=True)
 
     # list of fields that must be bound to values in criteria
     # that this table needs to run
@@ -203,7 +244,7 @@ class Table(models.Model):
 
     # Default values for fields associated with this table, these
     # may be overridden by user criteria at run time
-    criteria = PickledObjectField()
+    criteria = PickledObjectField(cache_values=True, fast=True)
 
     # Function to call to tweak criteria for computing a job handle.
     # This must return a dictionary of key/value pairs of values
@@ -213,6 +254,12 @@ class Table(models.Model):
     # Indicates if data can be cached
     cacheable = models.BooleanField(default=True)
 
+    # Replaced each time a column of this table is saved or deleted,
+    # column definitions cached in any process are only used while
+    # the stamp matches, see get_columns
+    columns_stamp = models.CharField(max_length=32,
+                                     default=new_columns_stamp)
+
     @classmethod
     def to_ref(cls, arg):
         """ Generate a table reference.
@@ -263,6 +310,11 @@ class Table(models.Model):
     @property
     def queryclass(self):
         # Lookup the query class for the table associated with this task
+        key = (self.module, self.queryclassname)
+        queryclass = queryclasses.get(key)
+        if queryclass is not None:
+            return queryclass
+
         try:
             i = importlib.import_module(self.module)
             queryclass = i.__dict__[self.queryclassname]
@@ -271,6 +323,7 @@ class Table(models.Model):
                 "Could not lookup queryclass %s in module %s" %
                 (self.queryclassname, self.module))
 
+        queryclasses[key] = queryclass
         return queryclass
 
     def get_columns(self, synthetic=None, ephemeral=None, iskey=None):
@@ -288,21 +341,56 @@ class Table(models.Model):
             True means only key columns, False means
             only non-key columns
 
+        Column definitions are cached per process along with the
+        `columns_stamp` of this table, and are used while the stamp
+        of this instance matches.  Each call returns new Column
+        instances.
+
         """
+        cached = table_columns.get(self.id)
+        if cached is not None and cached[0] == self.columns_stamp:
+            columns = cached[1]
+        else:
+            columns = list(Column.objects
+                           .filter(table=self, ephemeral=None)
+                           .order_by('position', 'name'))
+            if self.id is not None:
+                table_columns[self.id] = (self.columns_stamp, columns)
+
+        if ephemeral:
+            columns = sorted(columns + self._ephemeral_columns(ephemeral),
+                             key=lambda c: (c.position, c.name))
 
         filtered = []
-        for c in Column.objects.filter(table=self).order_by('position',
-                                                            'name'):
+        for c in columns:
             if synthetic is not None and c.synthetic != synthetic:
                 continue
-            if c.ephemeral is not None and c.ephemeral != ephemeral:
-                continue
             if iskey is not None and c.iskey != iskey:
                 continue
-            filtered.append(c)
+            filtered.append(copy.copy(c))
 
         return filtered
 
+    def _ephemeral_columns(self, job):
+        """ Return the ephemeral columns of this table added by `job`. """
+        key = (self.id, job.id)
+
+        # Job and table ids may be reused once deleted
+        stamp = (self.columns_stamp, job.created)
+        cached = ephemeral_columns.get(key)
+        if cached is not None and cached[0] == stamp:
+            columns = cached[1]
+        else:
+            columns = list(Column.objects.filter(table=self, ephemeral=job))
+
+            # Columns may still be added by a running job in another
+            # process, only the columns of a finished job are final
+            if job.status in (job.COMPLETE, job.ERROR):
+                if len(ephemeral_columns) >= EPHEMERAL_COLUMNS_MAX:
+                    ephemeral_columns.clear()
+                ephemeral_columns[key] = (stamp, columns)
+        return columns
+
     def copy_columns(self, table, columns=None, except_columns=None,
                      synthetic=None, ephemeral=None):
         """ Copy the columns from `table` into this table.
@@ -341,7 +429,94 @@ class Table(models.Model):
             self.sortdir = sortdir
             self.save()
 
-    def compute_synthetic(self, job, df):
+    def consumed_columns(self):
+        """ Return the names of the columns of this table that are used.
+
+        Returns None if any column may be used, such as when a consumer
+        registered with `register_column_consumer` does not restrict
+        the columns it reads.  Key and sort columns are always included.
+
+        """
+        names = set()
+        for consumer in column_consumers:
+            consumed = consumer(self)
+            if consumed is None:
+                return None
+            names.update(consumed)
+
+        if not names:
+            return None
+
+        names.update(c.name for c in self.get_columns(iskey=True))
+        names.update(self.sortcols or [])
+        return names
+
+    def deferrable(self, column):
+        """ Return True if `column` can be computed from the saved data.
+
+        Saved data is resampled and limited to the table rows, so
+        columns computed before resampling, or from other rows of the
+        data, must be computed when the data is first saved.
+
+        """
+        return ((column.compute_post_resample or not self.resample) and
+                (self.rows <= 0 or
+                 column.compiled_expression().elementwise))
+
+    def _compute_columns(self, job, df, syncols, all_col_names):
+        """ Return `df` with the synthetic columns `syncols` added. """
+        # Columns are added to the frame together at the end, adding
+        # them one at a time is slow for wide tables
+        computed = OrderedDict()
+        for syncol in syncols:
+            expr = syncol.compiled_expression()
+            try:
+                value = expr.evaluate(df, all_col_names, job.criteria,
+                                      globals(), computed)
+            except NameError as e:
+                m = (('%s: expression failed: %s, check '
+                      'APPFWK_SYNTHETIC_MODULES: %s') %
+                     (self, expr.display, str(e)))
+                logger.exception(m)
+                raise TableComputeSyntheticError(m)
+
+            # Align the value as assigning it to the frame would
+            if not isinstance(value, pandas.Series):
+                value = pandas.Series(value, index=df.index)
+            elif not value.index.equals(df.index):
+                value = value.reindex(df.index)
+            computed[syncol.name] = value
+
+        if not computed:
+            return df
+
+        df = df.drop([name for name in computed if name in df], axis=1)
+        return pandas.concat([df, pandas.DataFrame(computed,
+                                                   index=df.index)],
+                             axis=1)
+
+    def _synthetic_columns(self, all_columns, columns=None):
+        """ Return the synthetic columns needed for `columns` in order.
+
+        Columns that cannot be computed later, see `deferrable`, are
+        always included.  If `columns` is None all are returned.
+
+        """
+        try:
+            graph = synthetic_graph(all_columns)
+            syncols = synthetic_order(all_columns, graph)
+        except ValueError as e:
+            raise TableComputeSyntheticError('%s: %s' % (self, e))
+
+        if columns is None:
+            return syncols
+
+        wanted = set(columns)
+        wanted.update(c.name for c in syncols if not self.deferrable(c))
+        needed = synthetic_closure(graph, wanted)
+        return [c for c in syncols if c.name in needed]
+
+    def compute_synthetic(self, job, df, columns=None):
         """ Compute the synthetic columns from DF a two-dimensional array
             of the non-synthetic columns.
 
@@ -354,56 +529,24 @@ class Table(models.Model):
                the result is resampled.
 
             3. Any remaining columns are computed.
+
+            Synthetic columns are computed after the columns they refer
+            to.  If `columns` is a list of the column names that will be
+            used, only the synthetic columns needed for these are
+            computed, as long as the others can be computed later by
+            `compute_deferred`.
         """
         if df is None:
             return None
 
         all_columns = job.get_columns()
         all_col_names = [c.name for c in all_columns]
-
-        def compute(df, syncols):
-            for syncol in syncols:
-                expr = syncol.compute_expression
-                g = tokenize.generate_tokens(StringIO(expr).readline)
-                newexpr = ""
-                getvalue = False
-                getclose = False
-                for ttype, tvalue, _, _, _ in g:
-                    if getvalue:
-                        if ttype != tokenize.NAME:
-                            msg = "Invalid syntax, expected {name}: %s" % tvalue
-                            raise ValueError(msg)
-                        elif tvalue in all_col_names:
-                            newexpr += "df['%s']" % tvalue
-                        elif tvalue in job.criteria:
-                            newexpr += '"%s"' % str(job.criteria.get(tvalue))
-                        else:
-                            raise ValueError("Invalid variable name: %s" % tvalue)
-
-                        getclose = True
-                        getvalue = False
-                    elif getclose:
-                        if ttype != tokenize.OP and tvalue != "}":
-                            msg = "Invalid syntax, expected {name}: %s" % tvalue
-                            raise ValueError(msg)
-                        getclose = False
-                    elif ttype == tokenize.OP and tvalue == "{":
-                        getvalue = True
-                    else:
-                        newexpr += tvalue
-                    newexpr += ' '
-                try:
-                    df[syncol.name] = eval(newexpr)
-                except NameError as e:
-                    m = (('%s: expression failed: %s, check '
-                          'APPFWK_SYNTHETIC_MODULES: %s') %
-                         (self, newexpr, str(e)))
-                    logger.exception(m)
-                    raise TableComputeSyntheticError(m)
+        syncols = self._synthetic_columns(all_columns, columns)
 
         # 1. Compute synthetic columns where post_resample is False
-        compute(df, [col for col in all_columns if
-                     (col.synthetic and col.compute_post_resample is False)])
+        df = self._compute_columns(
+            job, df, [c for c in syncols if c.compute_post_resample is False],
+            all_col_names)
 
         # 2. Resample
         colmap = {}
@@ -452,11 +595,29 @@ class Table(models.Model):
             df = resampled
 
         # 3. Compute remaining synthetic columns (post_resample is True)
-        compute(df, [c for c in all_columns
-                     if (c.synthetic and c.compute_post_resample is True)])
+        df = self._compute_columns(
+            job, df, [c for c in syncols if c.compute_post_resample is True],
+            all_col_names)
 
         return df
 
+    def compute_deferred(self, job, df, names):
+        """ Compute synthetic columns left out by compute_synthetic.
+
+        Returns `df` with the synthetic columns in `names`, and those
+        they refer to, added if they are missing.
+
+        """
+        all_columns = job.get_columns()
+        graph = synthetic_graph(all_columns)
+        needed = synthetic_closure(graph, names)
+        syncols = [c for c in self._synthetic_columns(all_columns)
+                   if c.name in needed and c.name not in df]
+        logger.debug('%s: computing deferred columns %s' %
+                     (self, [c.name for c in syncols]))
+        return self._compute_columns(job, df, syncols,
+                                     [c.name for c in all_columns])
+
 
 class DatasourceTable(Table):
 
@@ -504,6 +665,13 @@ class DatasourceTable(Table):
             same report but with different criteria via different
             keywords.
 
+        :param cache_bucket: snap criteria starttime and endtime to
+            this bucket when looking for an existing job to reuse, so
+            requests made close together share the same results.  Either
+            a timedelta, a number of seconds, or ``'resolution'`` to use
+            the resolution in the criteria.  Defaults to None, times
+            must match exactly.
+
         Additional table and field options keyword arguments may
         be provided that are unique to the specific data source
         table being instantiatied:
@@ -542,6 +710,7 @@ class DatasourceTable(Table):
         # The field_map mapping is stored in table_options for reference
         # later when building criteria for this table
         table_options['field_map'] = {}
+        table_options['cache_bucket'] = None
         to = dict((k, kwargs.pop(k)) for k in keys if k in table_options)
         table_options.update(**to)
 
@@ -595,6 +764,9 @@ class DatasourceTable(Table):
                 raise DatabaseError(msg)
             raise
 
+        # Table ids may be reused, such as after a rolled back transaction
+        clear_column_cache(t.id)
+
         # post process table *instance* now that its been initialized
         t.post_process_table(field_options)
 
@@ -738,6 +910,45 @@ class DatasourceQuery(object):
 TableQueryBase = DatasourceQuery
 
 
+# Compiled synthetic expressions by column id
+compiled_expressions = {}
+COMPILED_EXPRESSIONS_MAX = 5000
+
+# Column definitions by table id, and ephemeral columns of finished jobs
+# by (table id, job id), each along with the stamp it was read with,
+# see Table.get_columns
+table_columns = {}
+ephemeral_columns = {}
+EPHEMERAL_COLUMNS_MAX = 5000
+
+
+def clear_column_cache(table_id=None):
+    """ Drop the cached columns of table `table_id`, or of all tables. """
+    if table_id is None:
+        table_columns.clear()
+        ephemeral_columns.clear()
+        return
+
+    table_columns.pop(table_id, None)
+    for key in [k for k in ephemeral_columns if k[0] == table_id]:
+        ephemeral_columns.pop(key, None)
+
+
+def _column_changed(column):
+    if column.ephemeral_id is None:
+        table_columns.pop(column.table_id, None)
+
+        # Let other processes know their cached columns are stale
+        stamp = new_columns_stamp()
+        Table.objects.filter(id=column.table_id).update(columns_stamp=stamp)
+        cache_name = column._meta.get_field('table').get_cache_name()
+        table = getattr(column, cache_name, None)
+        if table is not None:
+            table.columns_stamp = stamp
+    else:
+        ephemeral_columns.pop((column.table_id, column.ephemeral_id), None)
+
+
 class Column(models.Model):
 
     table = models.ForeignKey(Table)
@@ -827,6 +1038,25 @@ class Column(models.Model):
         if self.label is None:
             self.label = self.name
         super(Column, self).save()
+        compiled_expressions.pop(self.pk, None)
+        _column_changed(self)
+
+    def compiled_expression(self):
+        """ Return compute_expression compiled as a SyntheticExpression.
+
+        The result is kept until the column is saved again, or the
+        expression no longer matches, such as after a change made by
+        another process.
+
+        """
+        entry = compiled_expressions.get(self.pk)
+        if entry is None or entry.expr != self.compute_expression:
+            if len(compiled_expressions) >= COMPILED_EXPRESSIONS_MAX:
+                compiled_expressions.clear()
+            entry = SyntheticExpression(self.compute_expression)
+            if self.pk is not None:
+                compiled_expressions[self.pk] = entry
+        return entry
 
     @classmethod
     def create(cls, table, name, label=None,
@@ -896,6 +1126,11 @@ class Column(models.Model):
         return field_choice_str(self, 'units', self.units)
 
 
+@receiver(post_delete, sender=Column, dispatch_uid='column_delete_receiver')
+def _column_delete(sender, instance, **kwargs):
+    _column_changed(instance)
+
+
 class Criteria(DictObject):
     """ Manage a collection of criteria values. """
 
@@ -162,7 +162,10 @@ class AnalysisQuery(DatasourceQuery):
             tables = {}
             if jobs:
                 for (name, job) in jobs.items():
+                    # Functions may modify the tables they are given
                     f = job.data()
+                    if f is not None:
+                        f = f.copy()
                     tables[name] = f
                 logger.debug("%s: Table[%s] - %d rows" %
                              (self, name, len(f) if f is not None else 0))
@@ -284,7 +287,8 @@ class FocusedAnalysisQuery(AnalysisQuery):
         return QueryContinue(self.finish, {'job': job})
 
     def finish(self, jobs):
-        return QueryComplete(jobs['job'].data())
+        # Saving the result normalizes the frame in place
+        return QueryComplete(jobs['job'].data().copy())
 
 
 class PivotTable(AnalysisTable):
@@ -381,7 +385,7 @@ class ResampleQuery(AnalysisQuery):
 
             job.criteria.resample_interval = u'{0}'.format(rs.split('s')[0])
 
-        df = job.data()
+        df = job.data().copy()
         rs_df = resample(df,
                          self.table.options.resample_column,
                          rs,
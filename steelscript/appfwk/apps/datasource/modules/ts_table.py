@@ -242,10 +242,8 @@ class TimeSeriesQuery(AnalysisQuery):
     def analyze(self, jobs=None):
         logger.debug('TimeSeriesTable analysis with jobs %s' % jobs)
 
-        filtered_list = ExistingIntervals.objects.filter(
-            table_handle=self.handle,
-            criteria=self.no_time_criteria
-        )
+        filtered_list = ExistingIntervals.lookup(self.handle,
+                                                 self.no_time_criteria)
 
         existing_intervals = None
 
@@ -286,8 +284,7 @@ class TimeSeriesQuery(AnalysisQuery):
         logger.debug('TimeSeriesTable collect with jobs %s' % jobs)
         dfs_from_jobs, dfs_from_db = [], []
 
-        objs = ExistingIntervals.objects.filter(table_handle=self.handle,
-                                                criteria=self.no_time_criteria)
+        objs = ExistingIntervals.lookup(self.handle, self.no_time_criteria)
 
         if objs:
             # we should only find one with our handle
@@ -27,7 +27,9 @@ class PickledObjectField(serializers.Field):
 
         if field:
             if hasattr(field, 'iteritems'):
-                for k, v in field.iteritems():
+                # Convert a copy, not the value held by the instance
+                field = dict(field.iteritems())
+                for k in field.keys():
                     field[k] = self.field_to_native(field, k)
             else:
                 if not isinstance(field, (str, unicode)):
@@ -0,0 +1,242 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+"""
+Compiled synthetic column expressions.
+
+A ``compute_expression`` such as ``2*{sin1} + {sin2}`` is parsed once
+into a code object, with each ``{name}`` replaced by a variable bound
+at evaluation time to the column of that name, or to the string value
+of the criteria field of that name.
+
+Expressions made only of arithmetic and comparisons on numeric columns
+are evaluated with numexpr when it is installed and the frame is large
+enough for it to pay off.  numexpr keeps its own compiled form of each
+expression.  Anything else, such as method or function calls, is
+evaluated as Python with the modules in
+``settings.APPFWK_SYNTHETIC_MODULES`` available.
+
+The ``{name}`` references of the synthetic columns of a table form a
+dependency graph, used to compute columns after those they refer to,
+and to compute only the columns that are needed.
+"""
+
+import ast
+import logging
+import tokenize
+from StringIO import StringIO
+
+import pandas
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numexpr
+    VECTORIZED_ENGINE = 'numexpr'
+except ImportError:
+    numexpr = None
+    VECTORIZED_ENGINE = None
+
+# Below this many rows, numexpr setup costs more than it saves
+VECTORIZED_MIN_ROWS = 10000
+
+# Expression node types whose value for a row depends only on that row
+ELEMENTWISE_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare,
+                     ast.Num, ast.Name, ast.Load, ast.operator, ast.unaryop,
+                     ast.cmpop)
+
+# Expression node types that numexpr evaluates the same way as Python,
+# numexpr differs on the sign of % and on integer // and **
+VECTORIZED_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare,
+                    ast.Num, ast.Name, ast.Load, ast.Add, ast.Sub, ast.Mult,
+                    ast.Div, ast.USub, ast.UAdd, ast.cmpop)
+
+
+class SyntheticExpression(object):
+    """A compute_expression compiled for repeated evaluation.
+
+    :param str expr: expression with ``{name}`` column and criteria
+        references
+
+    Raises ValueError if the expression is not valid.
+
+    """
+    def __init__(self, expr):
+        self.expr = expr
+
+        # Names referenced by {name}, in order of first use
+        self.names = []
+
+        source = []
+        display = []
+        getvalue = False
+        getclose = False
+        g = tokenize.generate_tokens(StringIO(expr).readline)
+        for ttype, tvalue, _, _, _ in g:
+            if getvalue:
+                if ttype != tokenize.NAME:
+                    msg = "Invalid syntax, expected {name}: %s" % tvalue
+                    raise ValueError(msg)
+                if tvalue not in self.names:
+                    self.names.append(tvalue)
+                source.append(self.var(tvalue))
+                display.append("{%s}" % tvalue)
+                getclose = True
+                getvalue = False
+            elif getclose:
+                if ttype != tokenize.OP and tvalue != "}":
+                    msg = "Invalid syntax, expected {name}: %s" % tvalue
+                    raise ValueError(msg)
+                getclose = False
+            elif ttype == tokenize.OP and tvalue == "{":
+                getvalue = True
+            else:
+                source.append(tvalue)
+                display.append(tvalue)
+
+        self.source = ' '.join(source).strip()
+        self.display = ' '.join(display).strip()
+
+        try:
+            tree = ast.parse(self.source, mode='eval')
+            self.code = compile(tree, '<synthetic %s>' % expr, 'eval')
+        except SyntaxError as e:
+            raise ValueError("Invalid expression %s: %s" % (expr, e))
+
+        # Row by row computations, whose values do not depend on the
+        # other rows of the frame
+        nodes = list(ast.walk(tree))
+        self.elementwise = all(isinstance(node, ELEMENTWISE_NODES)
+                               for node in nodes)
+        self.vectorized = all(isinstance(node, VECTORIZED_NODES)
+                              for node in nodes)
+
+    def __repr__(self):
+        return '<SyntheticExpression %s>' % self.expr
+
+    def var(self, name):
+        """Return the variable bound to `name` in the compiled code."""
+        return '_v%d' % self.names.index(name)
+
+    def bind(self, df, columns, criteria, computed=None):
+        """Return the variables for evaluating against `df`.
+
+        :param df: DataFrame holding the columns computed so far
+        :param columns: names of all columns of the table
+        :param criteria: criteria of the job
+        :param computed: dict of synthetic column values computed but
+            not yet added to `df`
+
+        """
+        variables = {}
+        for name in self.names:
+            if computed and name in computed:
+                variables[self.var(name)] = computed[name]
+            elif name in columns:
+                variables[self.var(name)] = df[name]
+            elif name in criteria:
+                variables[self.var(name)] = str(criteria.get(name))
+            else:
+                raise ValueError("Invalid variable name: %s" % name)
+        return variables
+
+    def evaluate_vectorized(self, df, variables):
+        """Evaluate with numexpr, or return None if it cannot be used."""
+        arrays = {}
+        for var, value in variables.iteritems():
+            if (not isinstance(value, pandas.Series) or
+                    value.dtype.kind not in 'biuf'):
+                return None
+            arrays[var] = value.values
+
+        try:
+            # Divide as pandas does, even for integer columns
+            result = numexpr.evaluate(self.source, local_dict=arrays,
+                                      global_dict={}, truediv=True)
+        except Exception as e:
+            logger.debug('%s: numexpr failed, using Python: %s' % (self, e))
+            self.vectorized = False
+            return None
+
+        return pandas.Series(result, index=df.index)
+
+    def evaluate(self, df, columns, criteria, namespace, computed=None):
+        """Return the result of the expression for `df`.
+
+        :param namespace: globals for Python evaluation, providing the
+            synthetic modules
+
+        See `bind` for the other parameters.
+
+        """
+        variables = self.bind(df, columns, criteria, computed)
+
+        if (self.vectorized and numexpr is not None and
+                len(df) >= VECTORIZED_MIN_ROWS):
+            result = self.evaluate_vectorized(df, variables)
+            if result is not None:
+                return result
+
+        # Expressions may also refer to the frame directly
+        variables['df'] = df
+        return eval(self.code, namespace, variables)
+
+
+def synthetic_graph(columns):
+    """Return a dict of synthetic column name to the names of the
+    synthetic columns its expression refers to.
+
+    :param columns: all columns of a table, as Column objects
+
+    """
+    synthetic = dict((c.name, c) for c in columns if c.synthetic)
+    return dict((name, [n for n in c.compiled_expression().names
+                        if n in synthetic and n != name])
+                for name, c in synthetic.iteritems())
+
+
+def synthetic_closure(graph, names):
+    """Return the set of synthetic columns needed to compute `names`."""
+    needed = set()
+    pending = [n for n in names if n in graph]
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending.extend(graph[name])
+    return needed
+
+
+def synthetic_order(columns, graph):
+    """Return the synthetic `columns` with each after those it refers to.
+
+    Otherwise columns keep their order.  Raises ValueError if columns
+    refer to each other in a cycle.
+
+    """
+    synthetic = [c for c in columns if c.synthetic]
+    byname = dict((c.name, c) for c in synthetic)
+
+    ordered = []
+    done = set()
+    visiting = set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError("Synthetic column %s refers to itself through "
+                             "%s" % (name, ', '.join(sorted(visiting))))
+        visiting.add(name)
+        for dep in graph[name]:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+        ordered.append(byname[name])
+
+    for c in synthetic:
+        visit(c.name)
+    return ordered
@@ -21,6 +21,7 @@ from steelscript.appfwk.apps.datasource import serializers
 from steelscript.appfwk.apps.datasource.models import \
     Table, TableField, Column
 from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.task.base import PRIORITY_BACKGROUND
 from steelscript.appfwk.apps.jobs.serializers import JobSerializer
 
 
@@ -106,7 +107,7 @@ class TableJobList(APIView):
 
         try:
             job = Job.create(table, criteria)
-            job.start()
+            job.start(priority=PRIORITY_BACKGROUND)
             serializer = JobSerializer(job, many=False)
             return Response(serializer.data, status=status.HTTP_201_CREATED,
                             headers=self.get_success_headers(job))
@@ -6,7 +6,8 @@
 
 from django.db import models
 
-from steelscript.appfwk.libs.fields import PickledObjectField
+from steelscript.appfwk.libs.fields import \
+    PickledObjectField, PickledHashField, pickled_hash
 
 
 class ExistingIntervals(models.Model):
@@ -16,10 +17,11 @@ class ExistingIntervals(models.Model):
     namespace = models.CharField(max_length=20)
     sourcefile = models.CharField(max_length=200)
     table = models.CharField(max_length=50)
-    criteria = PickledObjectField(null=True)
+    criteria = PickledObjectField(null=True, fast=True)
+    criteria_hash = PickledHashField(source='criteria')
     table_handle = models.CharField(max_length=100, default="")
-    intervals = PickledObjectField(null=True)
-    tzinfo = PickledObjectField()
+    intervals = PickledObjectField(null=True, fast=True)
+    tzinfo = PickledObjectField(fast=True)
 
     def __unicode__(self):
         return "<ExistingIntervals %s/%s - %s>" % (self.id, self.table_handle,
@@ -27,3 +29,9 @@ class ExistingIntervals(models.Model):
 
     def __repr__(self):
         return unicode(self)
+
+    @classmethod
+    def lookup(cls, table_handle, criteria):
+        """Return the intervals stored for `table_handle` and `criteria`."""
+        return cls.objects.filter(table_handle=table_handle,
+                                  criteria_hash=pickled_hash(criteria))
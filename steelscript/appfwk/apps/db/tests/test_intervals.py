@@ -0,0 +1,48 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import logging
+import datetime
+
+from django.test import TestCase
+
+from steelscript.appfwk.apps.datasource.models import Criteria
+from steelscript.appfwk.apps.db.models import ExistingIntervals
+from steelscript.appfwk.libs.fields import pickled_hash
+
+logger = logging.getLogger(__name__)
+
+
+class ExistingIntervalsTest(TestCase):
+
+    def criteria(self, **kwargs):
+        return Criteria(resolution=datetime.timedelta(seconds=60),
+                        device=u'1', filterexpr='', **kwargs)
+
+    def test_lookup(self):
+        obj = ExistingIntervals(namespace='test', sourcefile='test',
+                                table='test', table_handle='handle',
+                                criteria=self.criteria(), intervals=[])
+        obj.save()
+        self.assertEqual(obj.criteria_hash, pickled_hash(self.criteria()))
+
+        found = ExistingIntervals.lookup('handle', self.criteria())
+        self.assertEqual([o.id for o in found], [obj.id])
+        self.assertFalse(ExistingIntervals.lookup('handle',
+                                                  self.criteria(extra=1)))
+        self.assertFalse(ExistingIntervals.lookup('other', self.criteria()))
+
+    def test_hash_updated(self):
+        obj = ExistingIntervals(namespace='test', sourcefile='test',
+                                table='test', table_handle='handle',
+                                criteria=self.criteria(), intervals=[])
+        obj.save()
+
+        obj.criteria = self.criteria(extra=1)
+        obj.save()
+        self.assertFalse(ExistingIntervals.lookup('handle', self.criteria()))
+        self.assertTrue(ExistingIntervals.lookup('handle',
+                                                 self.criteria(extra=1)))
@@ -6,4 +6,4 @@
 
 
 from steelscript.appfwk.apps.jobs.task.base import \
-    QueryComplete, QueryContinue, QueryError
+    QueryComplete, QueryContinue, QueryError, QueryStream
@@ -0,0 +1,158 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+"""
+In-process cache of job result DataFrames.
+
+A single report page reads the same job data many times, from widget
+rendering, from followers completing against their master and from
+analysis tables sharing a dependency.  This cache keeps recently used
+frames in memory, keyed by job handle, so repeated reads do not go back
+to the datastore.
+
+The cache is bounded by the memory used by the cached frames, see
+``settings.APPFWK_JOB_DATA_CACHE_MB``, and evicts the least recently used
+frames first.  Entries also record the id of the job that owns the data
+(the master job), so data for a handle that has since been recomputed by
+a different job is never returned.
+
+Cached frames are shared, not copied: frames passed to ``put`` must not
+be modified afterwards, and frames returned by ``get`` are read only.
+Job.data() returns the same shared frames, callers that modify the data
+make a copy of their own.  The cache is per process, so with
+the ``process`` task model each worker has a cache of its own.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DataFrameCache(object):
+    """Byte-size bounded LRU cache of DataFrames keyed by job handle."""
+
+    def __init__(self, maxbytes):
+        self.maxbytes = maxbytes
+        self.lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def enabled(self):
+        return self.maxbytes > 0
+
+    @classmethod
+    def sizeof(cls, df):
+        return int(df.memory_usage(index=True, deep=True).sum())
+
+    def get(self, handle, owner, columns=None):
+        """Return the cached frame for `handle`, or None.
+
+        The frame is shared and must not be modified.  With `columns`,
+        a new frame holding a copy of only those columns is returned.
+
+        :param str handle: job handle
+        :param int owner: id of the job that owns the data
+        :param list columns: optional list of column names to return,
+            columns not in the frame are ignored
+
+        """
+        if not self.enabled:
+            return None
+
+        with self.lock:
+            entry = self._entries.get(handle)
+            if entry is not None and entry[0] != owner:
+                # Data was computed by a job that no longer exists
+                self._remove(handle)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries[handle] = self._entries.pop(handle)
+            self.hits += 1
+            df = entry[1]
+
+        if columns is not None:
+            return df[[c for c in columns if c in df]]
+        return df
+
+    def put(self, handle, owner, df):
+        """Add `df` as the data for `handle`.
+
+        The frame is kept as is, it must not be modified afterwards.
+        """
+        if not self.enabled or df is None:
+            return
+
+        nbytes = self.sizeof(df)
+        if nbytes > self.maxbytes:
+            logger.debug('%s: not caching %s, %d bytes exceeds limit' %
+                         (self.__class__.__name__, handle, nbytes))
+            self.invalidate(handle)
+            return
+
+        with self.lock:
+            self._remove(handle)
+            self._entries[handle] = (owner, df, nbytes)
+            self.nbytes += nbytes
+
+            while self.nbytes > self.maxbytes:
+                evicted = next(iter(self._entries))
+                self._remove(evicted)
+                self.evictions += 1
+
+    def invalidate(self, handle):
+        """Drop any cached data for `handle`."""
+        with self.lock:
+            self._remove(handle)
+
+    def retain(self, handles):
+        """Drop cached data for all handles not in `handles`."""
+        handles = set(handles)
+        with self.lock:
+            for handle in self._entries.keys():
+                if handle not in handles:
+                    self._remove(handle)
+
+    def handles(self):
+        with self.lock:
+            return self._entries.keys()
+
+    def clear(self):
+        with self.lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """Return a dict of cache counters."""
+        with self.lock:
+            return {'entries': len(self._entries),
+                    'bytes': self.nbytes,
+                    'maxbytes': self.maxbytes,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions}
+
+    def _remove(self, handle):
+        entry = self._entries.pop(handle, None)
+        if entry is not None:
+            self.nbytes -= entry[2]
+
+
+dfcache = DataFrameCache(int(settings.APPFWK_JOB_DATA_CACHE_MB * 1024 * 1024))
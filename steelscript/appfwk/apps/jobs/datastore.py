@@ -0,0 +1,187 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+"""
+Storage backends for job result data.
+
+Each completed job writes its DataFrame to a file in ``settings.DATA_CACHE``
+named after the job handle.  The backend is chosen by
+``settings.APPFWK_JOB_DATASTORE``:
+
+``pickle``
+    The original format, ``job-<handle>.data`` written with
+    ``DataFrame.to_pickle``.  Loading always reads the whole frame.
+
+``feather``
+    Columnar Arrow/Feather files, ``job-<handle>.feather``.  Files are
+    memory-mapped on read and only the requested columns are
+    materialized.  Requires the optional ``pyarrow`` package.
+
+Whatever backend is configured, existing ``job-<handle>.data`` pickles are
+still found and read, so switching backends does not invalidate the
+datacache.
+"""
+
+import os
+import logging
+
+import pandas
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DataStore(object):
+    """Base class for job data storage backends."""
+
+    extension = None
+
+    def path(self, handle):
+        """Return the native data file path for `handle`."""
+        return os.path.join(settings.DATA_CACHE,
+                            'job-%s.%s' % (handle, self.extension))
+
+    def paths(self, handle):
+        """Return all paths that may hold data for `handle`.
+
+        The native path is always first, followed by any legacy
+        locations that are still readable.
+        """
+        paths = [self.path(handle)]
+        legacy = PickleDataStore.legacy_path(handle)
+        if legacy not in paths:
+            paths.append(legacy)
+        return paths
+
+    def find(self, handle):
+        """Return the path of an existing data file for `handle`, or None."""
+        for path in self.paths(handle):
+            if os.path.exists(path):
+                return path
+        return None
+
+    def save(self, handle, df):
+        """Write `df` as the data for `handle`, returning the path."""
+        raise NotImplementedError()
+
+    def load(self, path, columns=None):
+        """Read the DataFrame stored at `path`.
+
+        :param list columns: optional list of column names to load,
+            columns not present in the file are ignored
+        """
+        if path.endswith('.' + PickleDataStore.extension):
+            return PickleDataStore().read(path, columns)
+        return self.read(path, columns)
+
+    def delete(self, handle):
+        """Remove all data files for `handle`."""
+        for path in self.paths(handle):
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def read(self, path, columns=None):
+        raise NotImplementedError()
+
+
+class PickleDataStore(DataStore):
+    """Store each job result as a pickled DataFrame."""
+
+    extension = 'data'
+
+    @classmethod
+    def legacy_path(cls, handle):
+        return os.path.join(settings.DATA_CACHE,
+                            'job-%s.%s' % (handle, cls.extension))
+
+    def save(self, handle, df):
+        path = self.path(handle)
+        df.to_pickle(path)
+        return path
+
+    def read(self, path, columns=None):
+        df = pandas.read_pickle(path)
+        if columns is not None:
+            df = df[[c for c in columns if c in df]]
+        return df
+
+
+class FeatherDataStore(DataStore):
+    """Store each job result as an Arrow/Feather file.
+
+    Feather cannot represent every DataFrame (for example object columns
+    holding mixed Python types).  Such frames are written with the pickle
+    backend instead, and are found again through the legacy path lookup.
+    """
+
+    extension = 'feather'
+
+    def __init__(self):
+        # Fail early with a clear message rather than on the first save
+        import pyarrow.feather
+        self._feather = pyarrow.feather
+
+    def save(self, handle, df):
+        path = self.path(handle)
+
+        # Feather requires a default index and string column names
+        out = df.reset_index(drop=True)
+        out.columns = [str(c) for c in out.columns]
+        try:
+            self._feather.write_feather(out, path)
+        except Exception as e:
+            logger.warning('Unable to store job-%s as feather, falling back '
+                           'to pickle: %s' % (handle, e))
+            if os.path.exists(path):
+                os.unlink(path)
+            return PickleDataStore().save(handle, df)
+
+        # Clear a stale pickle from an earlier run with the same handle
+        legacy = PickleDataStore.legacy_path(handle)
+        if os.path.exists(legacy):
+            os.unlink(legacy)
+        return path
+
+    def read(self, path, columns=None):
+        import pyarrow
+
+        # Reading from a memory map is zero-copy, columns are only
+        # materialized by to_pandas().  The map is released once the
+        # last buffer referencing it is garbage collected.
+        source = pyarrow.memory_map(path, 'r')
+        table = self._feather.read_table(source)
+        if columns is None:
+            return table.to_pandas()
+
+        # Drop the other columns from the mapped table, which only
+        # changes its schema, rather than reading the file again
+        names = table.schema.names
+        wanted = [c for c in columns if c in names]
+        for i in reversed(range(len(names))):
+            if names[i] not in wanted:
+                table = table.remove_column(i)
+
+        df = table.to_pandas()
+        if list(df.columns) != wanted:
+            df = df[wanted]
+        return df
+
+
+DATASTORES = {
+    'pickle': PickleDataStore,
+    'feather': FeatherDataStore,
+}
+
+
+def get_datastore():
+    name = settings.APPFWK_JOB_DATASTORE
+    if name not in DATASTORES:
+        raise Exception('Unrecognized settings.APPFWK_JOB_DATASTORE: %s' %
+                        name)
+    return DATASTORES[name]()
+
+
+datastore = get_datastore()
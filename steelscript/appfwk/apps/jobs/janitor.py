@@ -0,0 +1,283 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+"""
+Cleanup of aged jobs and job data files.
+
+The janitor is run by the ``janitor`` management command, outside of
+request handling.  Each run:
+
+* cancels jobs that are not done by their deadline, so anything waiting
+  on them gets an error even if the query never returns
+
+* deletes ancient jobs, and old jobs that are no longer referenced, in
+  batches of ``settings.APPFWK_JANITOR_BATCH_SIZE`` jobs ordered by id,
+  removing them from progressd with one request per batch
+
+* removes ``job-*`` files in ``settings.DATA_CACHE`` that no job refers
+  to, left behind by crashes or by jobs deleted outside the janitor
+
+* if ``settings.APPFWK_DATACACHE_QUOTA_MB`` is set, deletes the least
+  recently used unreferenced results until the data files fit the quota
+"""
+
+import os
+import re
+import logging
+import datetime
+from collections import Counter
+
+import pytz
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+
+from steelscript.appfwk.apps.jobs.models import Job, collect_deletes
+from steelscript.appfwk.apps.jobs.progress import progressd
+from steelscript.appfwk.apps.jobs.datastore import datastore
+from steelscript.appfwk.apps.jobs.cache import dfcache
+
+logger = logging.getLogger(__name__)
+
+
+# Data and any other backend files written for a job handle
+JOB_FILE_RE = re.compile(r'^job-(?P<handle>\w+)\.\w+$')
+
+
+def chunks(items, size):
+    items = list(items)
+    for i in xrange(0, len(items), size):
+        yield items[i:i + size]
+
+
+class Janitor(object):
+
+    def __init__(self, batch_size=None, quota_mb=None):
+        self.batch_size = batch_size or settings.APPFWK_JANITOR_BATCH_SIZE
+        if quota_mb is None:
+            quota_mb = settings.APPFWK_DATACACHE_QUOTA_MB
+        self.quota = int(quota_mb * 1024 * 1024)
+
+    def run(self):
+        """Run all cleanup steps, returning a dict of counts."""
+        expired = self.expire_jobs()
+        stats = self.age_jobs(
+            datetime.timedelta(
+                seconds=settings.APPS_DATASOURCE['job_age_old_seconds']),
+            datetime.timedelta(
+                seconds=settings.APPS_DATASOURCE['job_age_ancient_seconds']))
+        stats['expired'] = expired
+        stats['orphans'] = self.sweep_orphans()
+        stats['evicted'] = self.enforce_quota()
+        logger.info('Janitor run complete: %s' % stats)
+        return stats
+
+    def expire_jobs(self):
+        """Cancel jobs past their deadline, returning the number cancelled."""
+        now = datetime.datetime.now(tz=pytz.utc)
+        expired = (Job.objects
+                   .filter(deadline__lte=now)
+                   .exclude(status__in=[Job.COMPLETE, Job.ERROR])
+                   .order_by('pk'))
+
+        cancelled = set()
+        for job in expired:
+            if job.pk not in cancelled:
+                cancelled.update(job.cancel('Job deadline exceeded'))
+
+        if cancelled:
+            logger.info('Cancelled %d jobs past their deadline' %
+                        len(cancelled))
+        return len(cancelled)
+
+    def age_jobs(self, old, ancient):
+        """Delete ancient jobs and old jobs with a refcount of 0."""
+        now = datetime.datetime.now(tz=pytz.utc)
+        stats = {'ancient': 0, 'old': 0}
+
+        # Ancient jobs are deleted regardless of refcount
+        try:
+            stats['ancient'] = self.delete_jobs(Q(touched__lte=now - ancient))
+        except:
+            logger.exception("Failed to delete ancient jobs")
+
+        # Old jobs are deleted only if they have a refcount of 0
+        try:
+            stats['old'] = self.delete_jobs(Q(touched__lte=now - old,
+                                              refcount=0))
+        except:
+            logger.exception("Failed to delete old jobs")
+
+        if stats['ancient'] or stats['old']:
+            logger.info('Deleted %d ancient and %d old jobs' %
+                        (stats['ancient'], stats['old']))
+
+        # Drop cached data for any handle no longer owned by a master job
+        handles = dfcache.handles()
+        if handles:
+            dfcache.retain(Job.objects
+                           .filter(handle__in=handles, master=None)
+                           .values_list('handle', flat=True))
+        return stats
+
+    def delete_jobs(self, q):
+        """Delete jobs matching `q`, returning the number deleted.
+
+        Jobs are deleted in id order, one bounded batch per
+        transaction, so rows are not all locked at once.  Jobs deleted
+        by cascade are included in the count.
+
+        """
+        total = 0
+        last = 0
+        while True:
+            ids = list(Job.objects.filter(q, pk__gt=last)
+                       .order_by('pk')
+                       .values_list('pk', flat=True)[:self.batch_size])
+            if not ids:
+                break
+            last = ids[-1]
+            total += self.delete_batch(
+                Job.objects.filter(q, pk__gte=ids[0], pk__lte=last))
+        return total
+
+    def delete_batch(self, qs):
+        """Delete jobs in `qs` and clean up after them."""
+        with collect_deletes() as deleted:
+            with transaction.atomic():
+                # The query is evaluated again with the rows locked, in
+                # case jobs were referenced in the meantime
+                pks = list(qs.select_for_update().values_list('pk',
+                                                              flat=True))
+                if pks:
+                    Job.objects.filter(pk__in=pks).delete()
+
+        if deleted:
+            self.cleanup(deleted)
+        return len(deleted)
+
+    def cleanup(self, deleted):
+        """Cleanup for jobs deleted under collect_deletes()."""
+        ids = set(pk for pk, handle, master_id in deleted)
+
+        # Deleted followers release their reference on masters that
+        # are still around
+        derefs = Counter(master_id for pk, handle, master_id in deleted
+                         if master_id is not None and master_id not in ids)
+        for master_id, count in derefs.iteritems():
+            (Job.objects.filter(pk=master_id)
+             .update(refcount=F('refcount') - count))
+
+        # Data belongs to the handle, keep it if another master job
+        # for the same handle still exists
+        handles = set(handle for pk, handle, master_id in deleted
+                      if master_id is None)
+        for batch in chunks(handles, self.batch_size):
+            live = set(Job.objects
+                       .filter(handle__in=batch, master=None)
+                       .values_list('handle', flat=True))
+            for handle in set(batch) - live:
+                dfcache.invalidate(handle)
+                try:
+                    datastore.delete(handle)
+                except OSError as e:
+                    # permissions issues, perhaps
+                    logger.error('Error deleting data for job handle %s: %s'
+                                 % (handle, e))
+
+        try:
+            progressd.delete_many(ids)
+        except BaseException as e:
+            logger.error('Error deleting %d jobs from progressd: %s' %
+                         (len(ids), e))
+
+    def job_files(self):
+        """Return a dict of handle to list of (path, size, mtime)."""
+        files = {}
+        for name in os.listdir(settings.DATA_CACHE):
+            m = JOB_FILE_RE.match(name)
+            if not m:
+                continue
+            path = os.path.join(settings.DATA_CACHE, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                # Removed since listing the directory
+                continue
+            files.setdefault(m.group('handle'), []).append(
+                (path, st.st_size, st.st_mtime))
+        return files
+
+    def sweep_orphans(self):
+        """Remove job files for handles without any job."""
+        # Files are listed before looking up jobs: a job row always
+        # exists before its files are written, so a file listed here
+        # with no job found after is not about to be claimed
+        files = self.job_files()
+
+        referenced = set()
+        for batch in chunks(files.keys(), self.batch_size):
+            referenced.update(Job.objects.filter(handle__in=batch)
+                              .values_list('handle', flat=True))
+
+        removed = 0
+        for handle, entries in files.iteritems():
+            if handle in referenced:
+                continue
+            for path, size, mtime in entries:
+                try:
+                    os.unlink(path)
+                    removed += 1
+                except OSError as e:
+                    logger.error('Error removing orphan %s: %s' % (path, e))
+
+        if removed:
+            logger.info('Removed %d orphan job files' % removed)
+        return removed
+
+    def enforce_quota(self):
+        """Delete least recently used results to fit the datacache quota.
+
+        Only completed master jobs that no other job references are
+        considered, oldest `touched` first.  Returns the number of jobs
+        deleted.
+
+        """
+        if self.quota <= 0:
+            return 0
+
+        files = self.job_files()
+        sizes = dict((handle, sum(size for path, size, mtime in entries))
+                     for handle, entries in files.iteritems())
+        total = sum(sizes.itervalues())
+        if total <= self.quota:
+            return 0
+
+        logger.info('Datacache is %d bytes, over quota of %d bytes' %
+                    (total, self.quota))
+
+        evict = []
+        candidates = (Job.objects
+                      .filter(master=None, refcount=0,
+                              status__in=[Job.COMPLETE, Job.ERROR])
+                      .order_by('touched')
+                      .values_list('pk', 'handle'))
+        for pk, handle in candidates.iterator():
+            if total <= self.quota:
+                break
+            if handle not in sizes:
+                # No data on disk, deleting the job frees nothing
+                continue
+            evict.append(pk)
+            total -= sizes.pop(handle, 0)
+
+        deleted = 0
+        for batch in chunks(evict, self.batch_size):
+            deleted += self.delete_batch(
+                Job.objects.filter(pk__in=batch, refcount=0))
+
+        logger.info('Evicted %d jobs to fit the datacache quota' % deleted)
+        return deleted
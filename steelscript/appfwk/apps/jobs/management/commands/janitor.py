@@ -0,0 +1,56 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+
+import time
+import logging
+
+from django.core.management.base import BaseCommand
+
+from steelscript.appfwk.apps.jobs.janitor import Janitor
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    args = ''
+    help = ('Delete aged jobs, remove orphan job data files and enforce '
+            'the datacache quota')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval',
+                            action='store',
+                            dest='interval',
+                            type=int,
+                            default=0,
+                            help='Keep running, once every INTERVAL seconds')
+        parser.add_argument('--quota',
+                            action='store',
+                            dest='quota',
+                            type=float,
+                            default=None,
+                            help='Datacache quota in MB, overrides '
+                                 'settings.APPFWK_DATACACHE_QUOTA_MB')
+
+    def handle(self, *args, **options):
+        janitor = Janitor(quota_mb=options['quota'])
+
+        while True:
+            try:
+                stats = janitor.run()
+                self.stdout.write(
+                    'Cancelled %(expired)d expired jobs, '
+                    'deleted %(ancient)d ancient and %(old)d old jobs, '
+                    'removed %(orphans)d orphan files, evicted %(evicted)d '
+                    'jobs' % stats)
+            except Exception:
+                logger.exception('Janitor run failed')
+                if not options['interval']:
+                    raise
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
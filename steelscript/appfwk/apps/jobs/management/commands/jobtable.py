@@ -0,0 +1,208 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+
+import time
+import random
+import datetime
+import logging
+
+import pytz
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand, CommandError
+
+from steelscript.appfwk.apps.datasource.models import Table
+from steelscript.appfwk.apps.jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+# Handle prefix of the rows added by --populate
+POPULATE_PREFIX = 'jobtable-'
+
+
+class Command(BaseCommand):
+    args = ''
+    help = ('Report the size of the job table, its indexes and the latency '
+            'of master job and job aging lookups')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples',
+                            action='store',
+                            dest='samples',
+                            type=int,
+                            default=100,
+                            help='Number of master lookups to time')
+        parser.add_argument('--explain',
+                            action='store_true',
+                            dest='explain',
+                            default=False,
+                            help='Show the query plan for each lookup')
+        parser.add_argument('--create-indexes',
+                            action='store_true',
+                            dest='create_indexes',
+                            default=False,
+                            help='Create missing job indexes in place, for '
+                                 'databases created before they were added')
+        parser.add_argument('--populate',
+                            action='store',
+                            dest='populate',
+                            type=int,
+                            default=0,
+                            help='Add POPULATE completed jobs before timing, '
+                                 'they are removed again afterwards')
+
+    def handle(self, *args, **options):
+        if options['create_indexes']:
+            self.create_indexes()
+
+        populated = 0
+        if options['populate']:
+            populated = self.populate(options['populate'])
+
+        try:
+            self.report_size()
+            self.report_indexes()
+            self.report_latency(options['samples'], options['explain'])
+        finally:
+            if populated:
+                deleted = self.depopulate()
+                self.stdout.write('Removed %d added jobs' % deleted)
+
+    def wanted_indexes(self):
+        """Return a list of column lists for the indexes of the job table."""
+        return [[Job._meta.get_field(f).column for f in fields]
+                for fields in Job._meta.index_together]
+
+    def existing_indexes(self):
+        """Return a list of column lists for indexes on the job table."""
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Job._meta.db_table)
+        return [c['columns'] for c in constraints.itervalues()
+                if c['index']]
+
+    def missing_indexes(self):
+        existing = self.existing_indexes()
+        return [(fields, columns) for fields, columns in
+                zip(Job._meta.index_together, self.wanted_indexes())
+                if columns not in existing]
+
+    def create_indexes(self):
+        missing = self.missing_indexes()
+        if not missing:
+            self.stdout.write('All job indexes present')
+            return
+
+        with connection.schema_editor() as editor:
+            for fields, columns in missing:
+                self.stdout.write('Creating index on %s' % ', '.join(columns))
+                editor.alter_index_together(Job, [], [fields])
+
+    def populate(self, count):
+        table = Table.objects.first()
+        if table is None:
+            raise CommandError('No tables defined, cannot add jobs')
+
+        self.stdout.write('Adding %d jobs' % count)
+        start = time.time()
+        now = datetime.datetime.now(tz=pytz.utc)
+        batch = 1000
+        for first in xrange(0, count, batch):
+            Job.objects.bulk_create(
+                [Job(table=table,
+                     handle='%s%d' % (POPULATE_PREFIX, i),
+                     status=Job.COMPLETE,
+                     touched=now - datetime.timedelta(seconds=i))
+                 for i in xrange(first, min(first + batch, count))])
+        self.stdout.write('Added %d jobs in %.3fs' %
+                          (count, time.time() - start))
+        return count
+
+    def depopulate(self):
+        jobs = Job.objects.filter(handle__startswith=POPULATE_PREFIX)
+        count = jobs.count()
+        # Bypass Job.delete(), these rows have no data or progress state
+        jobs._raw_delete(jobs.db)
+        return count
+
+    def report_size(self):
+        total = Job.objects.count()
+        masters = Job.objects.filter(master=None).count()
+        self.stdout.write('Job table: %d jobs, %d masters, %d followers' %
+                          (total, masters, total - masters))
+
+        for status, name in Job._meta.get_field('status').choices:
+            count = Job.objects.filter(status=status).count()
+            self.stdout.write('  %-10s %d' % (name, count))
+
+    def report_indexes(self):
+        self.stdout.write('Indexes:')
+        existing = self.existing_indexes()
+        for columns in self.wanted_indexes():
+            self.stdout.write('  %-40s %s' %
+                              (', '.join(columns),
+                               'present' if columns in existing
+                               else 'MISSING'))
+        if self.missing_indexes():
+            self.stdout.write('Run with --create-indexes to add missing '
+                              'indexes')
+
+    def explain(self, qs):
+        sql, params = qs.query.sql_with_params()
+        if connection.vendor == 'sqlite':
+            sql = 'EXPLAIN QUERY PLAN ' + sql
+        else:
+            sql = 'EXPLAIN ' + sql
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            for row in cursor.fetchall():
+                self.stdout.write('    %s' % ' | '.join(str(c) for c in row))
+
+    def time_query(self, label, queries, explain):
+        """Time evaluating each queryset in `queries`."""
+        if not queries:
+            return
+
+        elapsed = []
+        for qs in queries:
+            start = time.time()
+            with transaction.atomic():
+                list(qs)
+            elapsed.append(time.time() - start)
+
+        elapsed.sort()
+        self.stdout.write('%-14s %d lookups, avg %.2fms, median %.2fms, '
+                          'max %.2fms' %
+                          (label, len(elapsed),
+                           1000 * sum(elapsed) / len(elapsed),
+                           1000 * elapsed[len(elapsed) / 2],
+                           1000 * elapsed[-1]))
+        if explain:
+            self.explain(queries[0])
+
+    def report_latency(self, samples, explain):
+        handles = list(Job.objects.filter(master=None)
+                       .values_list('handle', flat=True)
+                       .order_by('-id')[:samples * 10])
+        handles = random.sample(handles, min(samples, len(handles)))
+
+        # The same query get_master runs while creating a job
+        self.time_query('get_master',
+                        [Job.objects.master_candidates(h).select_for_update()
+                         for h in handles],
+                        explain)
+
+        now = datetime.datetime.now(tz=pytz.utc)
+        touched = now - datetime.timedelta(hours=1)
+        self.time_query('age ancient',
+                        [Job.objects.filter(touched__lte=touched)
+                         .values_list('pk', flat=True).order_by('pk')[:500]],
+                        explain)
+        self.time_query('age old',
+                        [Job.objects.filter(touched__lte=touched, refcount=0)
+                         .values_list('pk', flat=True).order_by('pk')[:500]],
+                        explain)
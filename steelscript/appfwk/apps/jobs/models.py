@@ -15,16 +15,18 @@ import pytz
 import pandas
 import numpy
 import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 
 from django.db import models
-from django.db import transaction
 from django.db.models import F
-from django.db.models.signals import pre_delete
+from django.db.models.signals import pre_delete, post_migrate
 from django.dispatch import receiver
 from django.conf import settings
 
 from steelscript.appfwk.libs.fields import \
     Callable, CallableField
+from steelscript.appfwk.libs import hashing
 
 from steelscript.appfwk.apps.datasource.models import Table
 from steelscript.appfwk.apps.datasource.exceptions import DataError
@@ -36,16 +38,34 @@ from steelscript.common.exceptions import RvbdHTTPException
 
 from steelscript.appfwk.apps.jobs.task import Task
 from steelscript.appfwk.apps.jobs.progress import progressd
-from steelscript.appfwk.project.locks import TransactionLock
+from steelscript.appfwk.apps.jobs.datastore import datastore
+from steelscript.appfwk.apps.jobs.cache import dfcache
+from steelscript.appfwk.project.locks import (TransactionLock, StripedLock,
+                                              LOCK_STRIPES)
 
 logger = logging.getLogger(__name__)
 
 
 age_jobs_last_run = 0
 
+# Counts of jobs created for cacheable criteria that found an existing
+# master job (hits) or not (misses), and jobs that could not be cached
+handle_stats = {'hits': 0, 'misses': 0, 'uncached': 0}
+handle_stats_lock = threading.Lock()
+
 
 class JobManager(models.Manager):
 
+    def master_candidates(self, handle):
+        """Return a queryset of jobs that may be a master for `handle`."""
+        return (self.filter(status__in=[Job.NEW,
+                                        Job.QUEUED,
+                                        Job.RUNNING,
+                                        Job.COMPLETE],
+                            handle=handle,
+                            master=None)
+                .order_by('created'))
+
     def get_master(self, handle):
         """Return Job object for master or None if no valid jobs found."""
         master = None
@@ -55,15 +75,7 @@ class JobManager(models.Manager):
         # so we can ensure they don't get deleted until
         # we have a chance to touch it and refcount the selected
         # master below
-        candidates = (Job.objects
-                      .select_for_update()
-                      .filter(status__in=[Job.NEW,
-                                          Job.QUEUED,
-                                          Job.RUNNING,
-                                          Job.COMPLETE],
-                              handle=handle,
-                              master=None)
-                      .order_by('created'))
+        candidates = self.master_candidates(handle).select_for_update()
 
         if candidates:
             master_jobs = Task.validate_jobs(jobs=candidates, delete=True)
@@ -94,29 +106,9 @@ class JobManager(models.Manager):
         elif type(ancient) in [int, float]:
             ancient = datetime.timedelta(seconds=ancient)
 
-        with transaction.atomic():
-            # Ancient jobs are deleted regardless of refcount
-            now = datetime.datetime.now(tz=pytz.utc)
-            try:
-                qs = (Job.objects.select_for_update().
-                      filter(touched__lte=now - ancient).
-                      order_by('id'))
-                if len(qs) > 0:
-                    logger.info('Deleting %d ancient jobs ...' % len(qs))
-                    qs.delete()
-            except:
-                logger.exception("Failed to delete ancient jobs")
-
-            # Old jobs are deleted only if they have a refcount of 0
-            try:
-                qs = (Job.objects.select_for_update().
-                      filter(touched__lte=now - old, refcount=0).
-                      order_by('id'))
-                if len(qs) > 0:
-                    logger.info('Deleting %d old jobs ...' % len(qs))
-                    qs.delete()
-            except:
-                logger.exception("Failed to delete old jobs")
+        # Imported here, the janitor module depends on this one
+        from steelscript.appfwk.apps.jobs.janitor import Janitor
+        Janitor().age_jobs(old, ancient)
 
     def flush_incomplete(self):
         jobs = Job.objects.exclude(status__in=[Job.COMPLETE, Job.ERROR])
@@ -125,6 +117,28 @@ class JobManager(models.Manager):
         jobs.delete()
 
 
+class JobHandleLock(models.Model):
+    """Rows locked to serialize creating and starting jobs by handle.
+
+    Each row guards the set of handles that hash to its id, see
+    StripedLock.  All rows are created after migrate, so taking the
+    lock never needs to insert one.
+
+    """
+    id = models.IntegerField(primary_key=True)
+
+
+@receiver(post_migrate, dispatch_uid='job_handle_lock_receiver')
+def _create_handle_locks(sender, **kwargs):
+    if sender.label != JobHandleLock._meta.app_label:
+        return
+
+    objects = JobHandleLock.objects.using(kwargs.get('using', 'default'))
+    existing = set(objects.values_list('id', flat=True))
+    objects.bulk_create([JobHandleLock(id=i) for i in range(LOCK_STRIPES)
+                         if i not in existing])
+
+
 class Job(models.Model):
 
     # Timestamp when the job was created
@@ -148,10 +162,10 @@ class Job(models.Model):
     table = models.ForeignKey(Table)
 
     # Criteria used to start this job - an instance of the Criteria class
-    criteria = PickledObjectField(null=True)
+    criteria = PickledObjectField(null=True, fast=True)
 
     # Actual criteria as returned by the job after running
-    actual_criteria = PickledObjectField(null=True)
+    actual_criteria = PickledObjectField(null=True, fast=True)
 
     # Unique handle for the job
     handle = models.CharField(max_length=100, default="")
@@ -187,9 +201,26 @@ class Job(models.Model):
     # Callback function
     callback = CallableField()
 
+    # Number of children started with the callback that are not done
+    # yet, the callback runs when the last one completes
+    pending_children = models.IntegerField(default=0)
+
+    # Time by which the job must be done, children inherit the
+    # deadline of their parent
+    deadline = models.DateTimeField(null=True, default=None)
+
+    # Set when the job was cancelled, no more tasks run for it
+    cancelled = models.BooleanField(default=False)
+
     # Manager class for additional .objects methods
     objects = JobManager()
 
+    class Meta:
+        # Master lookup by handle in get_master, and aging of jobs by
+        # touched and refcount
+        index_together = [('handle', 'master', 'status'),
+                          ('touched', 'refcount')]
+
     def __unicode__(self):
         return "<Job %s (%8.8s) - t%s>" % (self.id, self.handle, self.table.id)
 
@@ -234,17 +265,20 @@ class Job(models.Model):
         # logger.debug("%s: dereference(%s) @ %d" %
         #             (self, message, Job.objects.get(pk=pk).refcount))
 
-    def refresh(self):
-        """ Refresh dynamic job parameters from the database. """
-        # fix bug 227119, by avoiding mysql caching problems
-        # http://stackoverflow.com/a/7028362
-        # should be fixed in Django 1.6
-        # XXXCJ -- can we drop this now?
-        Job.objects.update()
-        job = Job.objects.get(pk=self.pk)
-        for k in ['status', 'message', 'exception', 'actual_criteria',
-                  'touched', 'refcount', 'callback', 'parent']:
-            setattr(self, k, getattr(job, k))
+    # Fields that may be changed by other tasks while this instance
+    # is held
+    DYNAMIC_FIELDS = ['status', 'message', 'exception', 'actual_criteria',
+                      'touched', 'refcount', 'callback', 'parent',
+                      'pending_children', 'cancelled']
+
+    def refresh(self, fields=None):
+        """ Refresh dynamic job parameters from the database.
+
+        :param list fields: names of the fields to reload, defaults
+            to all of DYNAMIC_FIELDS
+
+        """
+        self.refresh_from_db(fields=fields or self.DYNAMIC_FIELDS)
 
     def safe_update(self, **kwargs):
         """ Update the job with the passed dictionary in a database safe way.
@@ -262,7 +296,17 @@ class Job(models.Model):
             self.refresh()
 
     @classmethod
-    def create(cls, table, criteria, update_progress=True, parent=None):
+    def create(cls, table, criteria, update_progress=True, parent=None,
+               deadline=None):
+        """ Create a new job for `table` with `criteria`.
+
+        :param parent: job waiting for the result of this job
+        :param deadline: time by which the job must be done, as a
+            datetime, timedelta or number of seconds from now.  Top level
+            jobs default to settings.APPFWK_JOB_DEADLINE_SECONDS.  A job
+            never gets a later deadline than its parent.
+
+        """
 
         # Adjust the criteria for this specific table, locking
         # down start/end times as needed
@@ -277,8 +321,19 @@ class Job(models.Model):
         # cacheability
         handle = Job._compute_handle(table, criteria)
 
-        # Grab a lock on the row associated with the table
-        with TransactionLock(table, "Job.create"):
+        now = datetime.datetime.now(tz=pytz.utc)
+        if deadline is None and parent is None:
+            deadline = settings.APPFWK_JOB_DEADLINE_SECONDS or None
+        if isinstance(deadline, (int, float)):
+            deadline = datetime.timedelta(seconds=deadline)
+        if isinstance(deadline, datetime.timedelta):
+            deadline = now + deadline
+        if parent is not None and parent.deadline is not None:
+            deadline = min(deadline or parent.deadline, parent.deadline)
+
+        # Grab a lock for the handle, jobs for the same table with
+        # different criteria can be created at the same time
+        with StripedLock(JobHandleLock, handle, "Job.create"):
             # Look for another job by the same handle in any state except ERROR
             master = Job.objects.get_master(handle)
 
@@ -291,13 +346,21 @@ class Job(models.Model):
                       parent=parent,
                       master=master,
                       update_progress=update_progress,
+                      deadline=deadline,
                       message='',
                       exception='')
             job.save()
 
+            with handle_stats_lock:
+                if not (table.cacheable and not criteria.ignore_cache):
+                    handle_stats['uncached'] += 1
+                elif master:
+                    handle_stats['hits'] += 1
+                else:
+                    handle_stats['misses'] += 1
+
             if master:
                 master.reference("Master link from job %s" % job)
-                now = datetime.datetime.now(tz=pytz.utc)
                 master.safe_update(touched=now)
 
                 logger.info("%s: New job for table %s, linked to master %s"
@@ -321,12 +384,18 @@ class Job(models.Model):
 
         return job
 
-    def start(self, method=None, method_args=None):
-        """ Start this job. """
+    def start(self, method=None, method_args=None, priority=None):
+        """ Start this job.
 
-        with TransactionLock(self.table, '%s.start' % self):
+        :param priority: task priority, one of the PRIORITY_* values in
+            jobs.task.base, by default the priority of the task running
+            in this thread, or interactive
+
+        """
+
+        with StripedLock(JobHandleLock, self.handle, '%s.start' % self):
             logger.info("%s: Job starting" % self)
-            self.refresh()
+            self.refresh(fields=['status'])
 
             if self.is_follower:
                 logger.debug("%s: Shadowing master job %s" %
@@ -339,11 +408,15 @@ class Job(models.Model):
 
                 return
 
+        # Any method other than run() resumes a query that is already
+        # underway
+        continuation = method is not None
         if method is None:
             method = self.table.queryclass.run
 
         # Create an task to do the work
-        task = Task(self, Callable(method, method_args))
+        task = Task(self, Callable(method, method_args), priority=priority,
+                    continuation=continuation)
         logger.debug("%s: Created task %s" % (self, task))
         task.start()
 
@@ -353,59 +426,106 @@ class Job(models.Model):
             jobid_map[name] = job.id
 
         logger.debug("%s: Setting callback %s" % (self, callback))
-        self.safe_update(callback=Callable(callback))
+        self.safe_update(callback=Callable(callback),
+                         pending_children=len(jobs))
         logger.debug("%s: Done setting callback %s" % (self, self.callback))
 
         for name, job in jobs.iteritems():
             job.start()
 
-    def check_children(self, objlock=None):
-        # get a lock on the child that's called us to ensure any status
-        # from its transaction will be seen.
-        if objlock is None:
-            objlock = self
+    def cancel_reason(self):
+        """ Return why this job should stop running, or None.
 
-        with TransactionLock(objlock, '%s.checking_children' % self):
-            running_children = Job.objects.filter(
-                parent=self, status__in=[Job.NEW, Job.RUNNING])
+        Long running queries may call this between steps and return
+        early once it is not None.
 
-        logger.info("%s: %d running children" % (self, len(running_children)))
-        logger.debug("%s: all children: %s" %
-                     (self, ';'.join('%s - %s' %
-                                     (j.status, j) for j in
-                                     Job.objects.filter(parent=self))))
+        """
+        self.refresh(fields=['cancelled'])
+        if self.cancelled:
+            return 'Job cancelled'
+        if (self.deadline is not None and
+                self.deadline <= datetime.datetime.now(tz=pytz.utc)):
+            return 'Job deadline exceeded'
+        return None
 
-        if len(running_children) > 0:
-            # Not done yet, do nothing
-            return
+    def cancel(self, message='Job cancelled'):
+        """ Cancel this job and all of its children that are not done.
 
-        # Grab a lock on this job to make sure only one caller
-        # gets the callback
-        with TransactionLock(self, '%s.check_children' % self):
-            # Now that we have the lock, make sure we have latest Job
-            # details
-            self.refresh()
+        Cancelled jobs are marked as errors right away and no further
+        tasks or callbacks run for them.  A query that is already running
+        is not interrupted, its result is dropped when it returns.
 
-            logger.info("%s: checking callback %s" % (self, self.callback))
-            if self.callback is None:
-                # Some other child got to it first
-                return
+        Children that are also the master of a job outside this tree
+        keep running, along with their own children.
 
-            # Save off the callback, we'll call it outside the transaction
-            callback = self.callback
+        :returns: list of ids of the jobs cancelled
 
-            # Clear the callback while still in lockdown
-            self.callback = None
-            self.save()
+        """
+        done = [Job.COMPLETE, Job.ERROR]
+
+        # Collect the tree of jobs below this one that are not done
+        parents = {self.pk: None}
+        pending = [self.pk]
+        while pending:
+            children = list(Job.objects
+                            .filter(parent__in=pending)
+                            .exclude(status__in=done)
+                            .values_list('pk', 'parent'))
+            pending = [pk for pk, parent in children if pk not in parents]
+            parents.update(children)
+
+        # Keep jobs that others outside the tree are following
+        shared = set(Job.objects
+                     .filter(master__in=parents.keys())
+                     .exclude(pk__in=parents.keys())
+                     .exclude(status__in=done)
+                     .values_list('master', flat=True))
+        shared.discard(self.pk)
+
+        def kept(pk):
+            while pk is not None:
+                if pk in shared:
+                    return True
+                pk = parents[pk]
+            return False
+
+        ids = sorted(pk for pk in parents if not kept(pk))
+        Job.objects.filter(pk__in=ids).update(cancelled=True)
+        logger.info("%s: cancelling jobs %s: %s" % (self, ids, message))
+
+        # Parents first, so callbacks of cancelled parents do not run
+        # as their last children are done
+        for job in (Job.objects.filter(pk__in=ids)
+                    .exclude(status__in=done).order_by('pk')):
+            job.mark_error(message)
+
+        return ids
+
+    def cancel_if_unused(self):
+        """ Cancel this job if no other job is waiting for its result.
+
+        Called once the last outside reference to the job is dropped,
+        such as the widget that requested it.  Child jobs belong to their
+        parent and jobs that are followed by others keep running.
+
+        :returns: True if the job was cancelled
 
-        t = Task(self, callback=callback)
-        logger.info("%s: Created callback task %s" % (self, t))
-        t.start()
+        """
+        self.refresh(fields=['status', 'parent'])
+        done = [Job.COMPLETE, Job.ERROR]
+        if self.status in done or self.parent_id is not None:
+            return False
+        if Job.objects.filter(master=self).exclude(status__in=done).exists():
+            return False
+
+        self.cancel('Job no longer in use')
+        return True
 
     def done(self):
         self.status = int(progressd.get(self.id, 'status'))
         if self.status in (Job.COMPLETE, Job.ERROR):
-            self.refresh()
+            self.refresh(fields=['status', 'message', 'exception',
+                                 'actual_criteria'])
 
         return self.status in (Job.COMPLETE, Job.ERROR)
 
@@ -420,9 +540,35 @@ class Job(models.Model):
         except RvbdHTTPException as e:
             logger.debug('***Error saving progress for %s: %s' % (self.id, e))
 
+    def child_done(self):
+        """ Count down the pending children after one is done.
+
+        Returns the callback to run if this was the last pending
+        child, or None.  The callback is cleared so that only one
+        caller gets it.  Cancelled jobs never return their callback.
+
+        """
+        with TransactionLock(self, '%s.child_done' % self):
+            (Job.objects.filter(pk=self.pk)
+             .update(pending_children=F('pending_children') - 1))
+            self.refresh(fields=['pending_children', 'callback',
+                                 'cancelled'])
+
+            logger.debug("%s: %d pending children" %
+                         (self, self.pending_children))
+            if (self.pending_children > 0 or self.callback is None or
+                    self.cancelled):
+                return None
+
+            callback = self.callback
+            self.callback = None
+            self.save(update_fields=['callback'])
+            return callback
+
     def mark_done(self, status, **kwargs):
+        parent_callback = None
         with TransactionLock(self, '%s.mark_done' % self):
-            self.refresh()
+            self.refresh(fields=['status'])
             old_status = self.status
             if old_status in (Job.COMPLETE, Job.ERROR):
                 # Status was already set to a done state, avoid
@@ -431,7 +577,11 @@ class Job(models.Model):
             self.status = status
             for k, v in kwargs.iteritems():
                 setattr(self, k, v)
-            self.save()
+            self.save(update_fields=['status'] + kwargs.keys())
+
+            # Count down in the same transaction as the status change
+            if self.parent:
+                parent_callback = self.parent.child_done()
 
         # On status change, do more...
         self.mark_progress(status=status,
@@ -439,29 +589,70 @@ class Job(models.Model):
 
         if not self.is_follower:
             # Notify followers of this job
-            followers = Job.objects.filter(master=self)
-            for follower in followers:
-                if self.status == Job.COMPLETE:
-                    kwargs['actual_criteria'] = self.actual_criteria
-                    follower.mark_complete(status=status, **kwargs)
-
-                elif self.status == Job.ERROR:
-                    follower.mark_done(status=status, **kwargs)
-
-        if self.parent:
-            logger.info("%s: Asking parent %s to check children" %
-                        (self, self.parent))
-            t = Task(self.parent,
-                     callback=Callable(self.parent.check_children,
-                                       called_kwargs={'objlock': self}),
-                     generic=True)
-            logger.info("%s: Created check_children task %s" % (self, t))
+            self._mark_followers_done(status, **kwargs)
+
+        if parent_callback is not None:
+            logger.info("%s: Last child of %s done" % (self, self.parent))
+            t = Task(self.parent, callback=parent_callback, continuation=True)
+            logger.info("%s: Created callback task %s" % (self.parent, t))
             t.start()
 
         return True
 
+    def _mark_followers_done(self, status, **kwargs):
+        """ Mark all followers of this job done with the same status.
+
+        Followers are updated with a single UPDATE and one progressd
+        request.  They share the data of this job, so post_data_save is
+        only sent for this job rather than once per follower.
+
+        """
+        fields = dict(kwargs, status=status)
+        if status == Job.COMPLETE:
+            fields['message'] = ''
+            fields['actual_criteria'] = self.actual_criteria
+
+        callbacks = []
+        with TransactionLock(self, '%s.followers_done' % self):
+            followers = list(Job.objects.select_for_update()
+                             .filter(master=self)
+                             .exclude(status__in=[Job.COMPLETE, Job.ERROR]))
+            if not followers:
+                return
+
+            (Job.objects.filter(pk__in=[f.pk for f in followers])
+             .update(**fields))
+
+            for follower in followers:
+                if follower.parent:
+                    callback = follower.parent.child_done()
+                    if callback is not None:
+                        callbacks.append((follower.parent, callback))
+
+        logger.info("%s: marked %d followers done" % (self, len(followers)))
+        try:
+            progressd.put_many([{'job_id': f.id,
+                                 'status': status,
+                                 'progress': 100} for f in followers])
+        except RvbdHTTPException as e:
+            logger.debug('***Error saving progress for followers of %s: %s'
+                         % (self.id, e))
+
+        for parent, callback in callbacks:
+            t = Task(parent, callback=callback, continuation=True)
+            logger.info("%s: Created callback task %s" % (parent, t))
+            t.start()
+
     def mark_complete(self, data=None, **kwargs):
         logger.info("%s: complete" % self)
+
+        # The job may have been cancelled since the task last checked,
+        # cancel() marks it as an error so there is nothing to save
+        self.refresh(fields=['cancelled'])
+        if self.cancelled:
+            logger.info("%s: cancelled, dropping result" % self)
+            return
+
         if data is not None:
             self._save_data(data)
 
@@ -471,7 +662,9 @@ class Job(models.Model):
         if (self.actual_criteria is None and 'actual_criteria' not in kwargs):
             kwargs['actual_criteria'] = self.criteria
 
-        self.mark_done(**kwargs)
+        if not self.mark_done(**kwargs):
+            # Already marked done, such as by a cancel after the check above
+            return
         logger.info("%s: saved as COMPLETE" % self)
 
         # Send signal for possible Triggers
@@ -518,9 +711,18 @@ class Job(models.Model):
             if table.criteria_handle_func:
                 criteria = table.criteria_handle_func(criteria)
 
+            bucket = cls._cache_bucket(table, criteria)
+            values = {}
             for k, v in criteria.iteritems():
-                # logger.debug("Updating hash from %s -> %s" % (k,v))
-                h.update('%s:%s' % (k, v))
+                if k.startswith('_'):
+                    # Internal copies of the original times
+                    continue
+                if (bucket and k in ('starttime', 'endtime') and
+                        isinstance(v, datetime.datetime)):
+                    v = hashing.snap_time(v, bucket)
+                values[k] = v
+
+            h.update(hashing.encode(values))
         else:
             # Table is not cacheable, instead use current time plus a random
             # value just to get a unique hash
@@ -529,6 +731,16 @@ class Job(models.Model):
 
         return h.hexdigest()
 
+    @classmethod
+    def _cache_bucket(cls, table, criteria):
+        """ Return the bucket to snap criteria times to, or None. """
+        bucket = table.options.get('cache_bucket') if table.options else None
+        if bucket == 'resolution':
+            bucket = criteria.get('resolution')
+        if isinstance(bucket, (datetime.timedelta, int, long, float)):
+            return bucket
+        return None
+
     def get_columns(self, ephemeral=None, **kwargs):
         """ Return columns assocated with the table for the job.
 
@@ -540,7 +752,8 @@ class Job(models.Model):
             kwargs['ephemeral'] = self.master or self
         return self.table.get_columns(**kwargs)
 
-    def _save_data(self, data):
+    def _prepare_data(self, data):
+        """Convert a query result to a DataFrame with normalized types."""
         if isinstance(data, list) and len(data) > 0:
             # Convert the result to a dataframe
             columns = [col.name for col in
@@ -558,40 +771,130 @@ class Job(models.Model):
         if df is not None:
             self.check_columns(df)
             df = self.normalize_types(df)
-            df = self.table.compute_synthetic(self, df)
-
-            # Sort according to the defined sort columns
-            if self.table.sortcols:
-                sorted = df.sort_values(
-                    self.table.sortcols,
-                    ascending=[b == Table.SORT_ASC
-                               for b in self.table.sortdir]
-                )
-                # Move NaN rows of the first sortcol to the end
-                n = self.table.sortcols[0]
-                df = (sorted[sorted[n].notnull()]
-                      .append(sorted[sorted[n].isnull()]))
-
-            if self.table.rows > 0:
-                df = df[:self.table.rows]
 
+        return df
+
+    def _sort_data(self, df):
+        """Apply the table sort columns and row limit to `df`."""
+        return sort_rows(df, self.table.sortcols,
+                         [b == Table.SORT_ASC for b in self.table.sortdir],
+                         self.table.rows)
+
+    def consumed_columns(self):
+        """ Return the names of the columns read from this job's data.
+
+        Returns None if any column may be read.  Synthetic columns
+        outside this set may be left to be computed by data() when
+        first read.
+
+        """
+        if self.parent_id is not None:
+            # Analysis queries may read any column of their dependencies
+            return None
+        return self.table.consumed_columns()
+
+    def _finalize_data(self, df):
+        """Compute synthetic columns, sort and save the prepared `df`."""
         if df is not None:
-            df.to_pickle(self.datafile())
+            df = self.table.compute_synthetic(self, df,
+                                              self.consumed_columns())
+            df = self._sort_data(df)
+
+        if df is not None:
+            path = datastore.save(self.handle, df)
+            dfcache.put(self.handle, self.master_id or self.id, df)
 
             logger.debug("%s data saved to file: %s" %
-                         (str(self), self.datafile()))
+                         (str(self), path))
         else:
             logger.debug("%s no data saved, data is empty" %
                          (str(self)))
 
         return df
 
+    def _save_data(self, data):
+        return self._finalize_data(self._prepare_data(data))
+
+    def save_stream(self, stream, cancelled=None):
+        """Save the data from a QueryStream one chunk at a time.
+
+        Each chunk is checked and normalized as it arrives.  Memory use
+        is only bounded when the table has a row limit and the result
+        does not depend on the whole data set (no synthetic columns and
+        no resampling): then only the top rows seen so far are kept.
+        Otherwise the chunks are combined once the stream is exhausted,
+        and the peak is the same as for QueryComplete.
+
+        :param cancelled: optional callable checked after each chunk,
+            reading stops and nothing is saved once it returns True
+
+        Returns True if the data was saved.
+
+        """
+        table = self.table
+        topk = (table.rows > 0 and not table.resample and
+                not any(c.synthetic for c in self.get_columns()))
+
+        df = None
+        chunks = []
+        empty = None
+        nchunks = 0
+        try:
+            for chunk in stream:
+                chunk = self._prepare_data(chunk)
+                if chunk is None or len(chunk) == 0:
+                    if empty is None:
+                        empty = chunk
+                elif not topk:
+                    nchunks += 1
+                    chunks.append(chunk)
+                else:
+                    nchunks += 1
+                    # Merge with the current top rows, then trim to the
+                    # limit
+                    if df is not None:
+                        chunk = pandas.concat([df, chunk], ignore_index=True)
+                    df = self._sort_data(chunk)
+
+                    if not table.sortcols and len(df) >= table.rows:
+                        # Unsorted, the first rows are all that is kept
+                        break
+
+                if cancelled is not None and cancelled():
+                    return False
+        finally:
+            stream.close()
+
+        logger.debug("%s: read %d chunks from stream" % (self, nchunks))
+        if chunks:
+            df = pandas.concat(chunks, ignore_index=True)
+            del chunks[:]
+
+        self._finalize_data(df if df is not None else empty)
+        return True
+
     def datafile(self):
-        """ Return the data file for this job. """
-        return os.path.join(settings.DATA_CACHE, "job-%s.data" % self.handle)
+        """ Return the data file for this job.
+
+        This is the existing file holding the data for this job's
+        handle, which may be a legacy pickle file, or the path the
+        configured datastore would write to if no data is saved yet.
+
+        """
+        return datastore.find(self.handle) or datastore.path(self.handle)
 
-    def data(self):
-        """ Returns a pandas.DataFrame of data, or None if not available. """
+    def data(self, columns=None):
+        """ Returns a pandas.DataFrame of data, or None if not available.
+
+        Synthetic columns that were not computed when the data was
+        saved are computed here on first use.  The frame returned may
+        be shared with the job data cache and other callers, so it must
+        not be modified.  Callers that change the data work on a copy.
+
+        :param list columns: optional list of column names to load,
+            by default all columns are returned
+
+        """
 
         if not self.done():
             logger.warning(
@@ -599,23 +902,59 @@ class Job(models.Model):
             raise DataError(
                 "Job not complete, no data available")
 
+        df = self._load_data(columns)
+        if df is None:
+            return None
+
+        synthetic = set(c.name for c in self.get_columns(synthetic=True))
+        missing = [name for name in (columns or synthetic)
+                   if name in synthetic and name not in df]
+        if not missing:
+            return df
+
+        # Columns the missing ones refer to may not have been loaded,
+        # and the cached frame must not be changed
+        df = self.table.compute_deferred(self, self._load_data().copy(),
+                                         missing)
+        dfcache.put(self.handle, self.master_id or self.id, df)
+
+        if columns is None:
+            return df
+        return df[[c for c in columns if c in df]]
+
+    def _load_data(self, columns=None):
+        """ Return the saved data from the cache or the datastore.
+
+        Without `columns`, the frame may be shared with the cache and
+        must not be modified.
+
+        """
+        df = dfcache.get(self.handle, self.master_id or self.id, columns)
+        if df is not None:
+            return df
+
         self.reference("data()")
 
         e = None
+        path = datastore.find(self.handle)
         try:
             logger.debug("%s looking for data file: %s" %
-                         (str(self), self.datafile()))
-            if os.path.exists(self.datafile()):
-                df = pandas.read_pickle(self.datafile())
+                         (str(self), path))
+            if path is not None:
+                if columns is None:
+                    df = datastore.load(path)
+                    dfcache.put(self.handle, self.master_id or self.id, df)
+                else:
+                    df = datastore.load(path, columns=columns)
                 logger.debug("%s data loaded %d rows from file: %s" %
-                             (str(self), len(df), self.datafile()))
+                             (str(self), len(df), path))
             else:
-                logger.debug("%s no data, missing data file: %s" %
-                             (str(self), self.datafile()))
+                logger.debug("%s no data, missing data file for handle %s" %
+                             (str(self), self.handle))
                 df = None
         except Exception as e:
             logger.error("Error loading datafile %s for %s" %
-                         (self.datafile(), str(self)))
+                         (path, str(self)))
             logger.error("Traceback:\n%s" % e)
         finally:
             self.dereference("data()")
@@ -625,38 +964,62 @@ class Job(models.Model):
 
         return df
 
-    def values(self):
-        """ Return data as a list of lists. """
+    def values(self, rows=None, columns=None):
+        """ Return data as a list of lists.
 
-        df = self.data()
-        if df is not None:
-            # Replace NaN with None
-            # NB this recasts all columns to object, which causes issues
-            # when dealing with large values
-            #df = df.where(pandas.notnull(df), None)
+        Missing values are returned as the string 'None'.
 
-            # this will only change affected columns to object type
-            df = df.astype(object).replace(numpy.nan, 'None')
+        :param int rows: optional maximum number of rows to return
+        :param columns: optional collection of the names of the columns
+            to read, the values of other columns of the job are returned
+            as missing so that rows always hold every column
 
-            # Extract tha values in the right order
-            all_columns = self.get_columns()
-            all_col_names = [c.name for c in all_columns]
+        """
+        names = [c.name for c in self.get_columns()]
+        if columns is not None:
+            read = [name for name in names if name in columns]
+        else:
+            read = names
 
-            # Straggling numpy data types may cause problems
-            # downstream (json encoding, for example), so strip
-            # things down to just native ints and floats
-            vals = []
-            for row in df.ix[:, all_col_names].itertuples():
-                vals_row = []
-                for v in row[1:]:
-                    if (isinstance(v, numpy.number) or
-                            isinstance(v, numpy.bool_)):
-                        v = numpy.asscalar(v)
-                    vals_row.append(v)
-                vals.append(vals_row)
+        cols = self.column_values(columns=read, rows=rows, na_value='None')
+        if not cols or not read:
+            return []
 
-        else:
-            vals = []
+        if columns is not None:
+            missing = ['None'] * len(cols.values()[0])
+            cols = OrderedDict((name, cols.get(name, missing))
+                               for name in names)
+        return map(list, zip(*cols.values()))
+
+    def column_values(self, columns=None, rows=None, na_value=None):
+        """ Return data as an OrderedDict of column name to list of values.
+
+        Values are native Python types suitable for JSON encoding, and
+        missing values are replaced by `na_value`.  Returns an empty
+        OrderedDict if the job has no data.
+
+        :param list columns: optional list of column names, by default
+            all of the job's columns in table order
+        :param int rows: optional maximum number of rows to return
+        :param na_value: value used for missing data
+
+        """
+        if columns is None:
+            columns = [c.name for c in self.get_columns()]
+
+        df = self.data(columns=columns)
+        vals = OrderedDict()
+        if df is None:
+            return vals
+
+        if rows is not None and rows >= 0:
+            df = df[:rows]
+
+        for name in columns:
+            if name in df:
+                vals[name] = series_values(df[name], na_value)
+            else:
+                vals[name] = [na_value] * len(df)
         return vals
 
     def check_columns(self, df):
@@ -670,41 +1033,8 @@ class Job(models.Model):
             s = df[col.name]
             if col.istime():
                 # The column is supposed to be time,
-                # make sure all values are datetime objects
-                if str(s.dtype).startswith(str(pandas.np.dtype('datetime64'))):
-                    # Already a datetime
-                    pass
-                elif str(s.dtype).startswith('int'):
-                    # Assume this is a numeric epoch, convert to datetime
-                    df[col.name] = s.astype('datetime64[s]')
-                elif str(s.dtype).startswith('float'):
-                    # This is a numeric epoch as a float, possibly
-                    # has subsecond resolution, convert to
-                    # datetime but preserve up to millisecond
-                    df[col.name] = (1000 * s).astype('datetime64[ms]')
-                else:
-                    # Possibly datetime object or a datetime string,
-                    # hopefully astype() can figure it out
-                    df[col.name] = s.astype('datetime64[ms]')
-
-                # Make sure we are UTC
-                utc = pytz.utc
-                try:
-                    # try to apply timezone to naive timestamps
-                    df[col.name] = df[col.name].apply(lambda x:
-                                                      x.tz_localize(utc))
-                except TypeError as e:
-                    # can occur when first datetime already has timezone
-                    if e.message.startswith('Cannot localize'):
-                        df[col.name] = df[col.name].apply(lambda x:
-                                                          x.tz_convert(utc))
-                except AttributeError as e:
-                    # can occur when first datetime is NaT
-                    # running convert on rest of series will still work
-                    # as expected
-                    if e.message.startswith("'NaTType'"):
-                        df[col.name] = df[col.name].apply(lambda x:
-                                                          x.tz_convert(utc))
+                # make sure all values are UTC datetimes
+                df[col.name] = normalize_time(s)
 
             elif col.isdate():
                 if str(s.dtype).startswith(str(pandas.np.dtype('datetime64'))):
@@ -758,8 +1088,6 @@ class Job(models.Model):
         return df
 
     def combine_filterexprs(self, joinstr="and", exprs=None):
-        self.refresh()
-
         if exprs is None:
             exprs = []
         elif type(exprs) is not list:
@@ -780,16 +1108,161 @@ class Job(models.Model):
             return ""
 
 
+def normalize_time(s):
+    """ Return Series `s` converted to timezone aware UTC datetimes.
+
+    Integer and float values are taken as epoch seconds, floats keep up
+    to millisecond resolution.  Naive datetimes are assumed to be UTC
+    and aware datetimes are converted to UTC.  Other values, such as
+    datetime objects or strings, are parsed with pandas.to_datetime.
+
+    """
+    if getattr(s.dtype, 'tz', None) is not None:
+        # Already timezone aware
+        return s.dt.tz_convert(pytz.utc)
+
+    kind = s.dtype.kind
+    if kind == 'M':
+        pass
+    elif kind in 'iu':
+        s = s.astype('datetime64[s]')
+    elif kind == 'f':
+        s = (1000 * s).astype('datetime64[ms]')
+    else:
+        # Aware values are converted to UTC, the result is naive if
+        # all values were naive
+        s = pandas.to_datetime(s, utc=True)
+        if getattr(s.dtype, 'tz', None) is not None:
+            return s.dt.tz_convert(pytz.utc)
+
+    return s.dt.tz_localize(pytz.utc)
+
+
+def series_values(s, na_value=None):
+    """ Return the values of Series `s` as a list of native Python types.
+
+    Conversion is done per column based on dtype, missing values are
+    found by mask and replaced with `na_value`.
+
+    """
+    values = s.values
+    kind = s.dtype.kind
+
+    if kind in 'iub':
+        # tolist() already converts to native int/long/bool
+        return values.tolist()
+
+    if kind == 'f':
+        vals = values.tolist()
+        mask = numpy.isnan(values)
+    elif kind in 'Mm':
+        # Keep pandas Timestamp and Timedelta objects, which are
+        # datetime/timedelta subclasses
+        vals = s.astype(object).values.tolist()
+        mask = s.isnull().values
+    else:
+        vals = values.tolist()
+        mask = pandas.isnull(values)
+        if pandas.lib.infer_dtype(values[~mask]) not in (
+                'string', 'unicode', 'bytes', 'empty'):
+            # Straggling numpy data types may cause problems
+            # downstream (json encoding, for example)
+            vals = [v.item() if isinstance(v, numpy.generic) else v
+                    for v in vals]
+
+    for i in numpy.flatnonzero(mask):
+        vals[i] = na_value
+    return vals
+
+
+def sort_rows(df, sortcols, ascending, rows=0):
+    """ Return `df` sorted by `sortcols` and limited to `rows` rows.
+
+    Rows are sorted stably by all `sortcols`, with rows where the first
+    sort column is missing moved to the end.  If `rows` is greater than
+    zero only the first `rows` rows are returned.
+
+    When only the top rows are needed and the first sort column is
+    numeric or datetime, the rows that can make the cut are selected
+    with a partial sort (numpy.partition) on that column, keeping all
+    rows tied with the cut-off value, so only the candidates are fully
+    sorted.  The result is the same as sorting all rows.
+
+    """
+    if sortcols and rows > 0 and len(df) > rows:
+        s = df[sortcols[0]]
+        if s.dtype.kind in 'iufMm':
+            values = s.values
+            null = s.isnull().values
+            valid = values[~null]
+            if len(valid) >= rows:
+                # Value of the last row to make the cut, null rows are
+                # dropped below so comparisons against NaN don't matter
+                with numpy.errstate(invalid='ignore'):
+                    if ascending[0]:
+                        kth = numpy.partition(valid, rows - 1)[rows - 1]
+                        keep = values <= kth
+                    else:
+                        k = len(valid) - rows
+                        kth = numpy.partition(valid, k)[k]
+                        keep = values >= kth
+                df = df[keep & ~null]
+            # else: every non-null row is kept, along with the nulls
+            # needed to fill the limit, so nothing can be dropped early
+
+    if sortcols:
+        sorted = df.sort_values(sortcols, ascending=ascending,
+                                kind='mergesort')
+        # Move NaN rows of the first sortcol to the end
+        n = sortcols[0]
+        df = (sorted[sorted[n].notnull()]
+              .append(sorted[sorted[n].isnull()]))
+
+    if rows > 0:
+        df = df[:rows]
+
+    return df
+
+
+# Set while deleting jobs in bulk, see collect_deletes()
+_bulk_delete = threading.local()
+
+
+@contextmanager
+def collect_deletes():
+    """ Defer the per job cleanup for jobs deleted in this thread.
+
+    Yields a list that receives an (id, handle, master_id) tuple for
+    each job deleted within the block, including jobs deleted by
+    cascade.  The caller is responsible for the cleanup normally done
+    by the pre_delete handler: dereferencing masters, removing data
+    files and removing the jobs from progressd.
+
+    """
+    deleted = []
+    _bulk_delete.deleted = deleted
+    try:
+        yield deleted
+    finally:
+        _bulk_delete.deleted = None
+
+
 @receiver(pre_delete, sender=Job)
 def _my_job_delete(sender, instance, **kwargs):
     """ Clean up jobs when deleting. """
+    deleted = getattr(_bulk_delete, 'deleted', None)
+    if deleted is not None:
+        deleted.append((instance.pk, instance.handle, instance.master_id))
+        return
+
     # if a job has a master, just deref, don't delete the datafile since
     # that will remove it from the master as well
     if instance.master is not None:
         instance.master.dereference(str(instance))
-    elif instance.datafile() and os.path.exists(instance.datafile()):
+    else:
+        dfcache.invalidate(instance.handle)
         try:
-            os.unlink(instance.datafile())
+            datastore.delete(instance.handle)
         except OSError:
             # permissions issues, perhaps
             logger.error('OSError occurred when attempting to delete '
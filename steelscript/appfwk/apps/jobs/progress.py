@@ -4,14 +4,19 @@
 # accompanying the software ("License").  This software is distributed "AS IS"
 # as set forth in the License.
 
+import json
 import time
+import socket
+import struct
 import logging
+import threading
 
 from django.conf import settings
 from requests import ConnectionError
 
 from steelscript.common.connection import Connection
 from steelscript.common import RvbdException
+from steelscript.common.exceptions import RvbdHTTPException
 
 
 logger = logging.getLogger(__name__)
@@ -22,6 +27,11 @@ class ProgressDaemon(object):
         self.conn = Connection(settings.PROGRESSD_HOST,
                                port=settings.PROGRESSD_PORT)
 
+    def after_fork(self):
+        """Drop connections inherited from the parent process."""
+        self.conn = Connection(settings.PROGRESSD_HOST,
+                               port=settings.PROGRESSD_PORT)
+
     def _request(self, method, url, **kwargs):
         try:
             return self.conn.json_request(method, url, **kwargs)
@@ -47,17 +57,199 @@ class ProgressDaemon(object):
             return r[attr]
         return r
 
+    def get_many(self, ids):
+        """Return a dict of job id to job status for each of `ids`.
+
+        Jobs unknown to progressd are left out of the result.
+        """
+        r = self._request('POST', '/jobs/query/', body={'ids': list(ids)})
+        return dict((j['job_id'], j) for j in r['items'])
+
     def post(self, **kwargs):
         return self._request('POST', '/jobs/', body=kwargs)
 
     def put(self, id_, **kwargs):
         self._request('PUT', '/jobs/items/%d/' % id_, body=kwargs)
 
+    def put_many(self, items):
+        """Update several jobs, `items` is a list of dicts with job_id."""
+        for item in items:
+            item = dict(item)
+            try:
+                self.put(item.pop('job_id'), **item)
+            except RvbdHTTPException:
+                pass
+
     def delete(self, id_):
         self._request('DELETE', '/jobs/items/%d/' % id_)
 
+    def delete_many(self, ids):
+        """Delete several jobs, ids unknown to progressd are ignored."""
+        self._request('POST', '/jobs/delete/', body={'ids': list(ids)})
+
     def reset(self):
         self._request('POST', '/jobs/reset/')
 
 
-progressd = ProgressDaemon()
+class ProgressdSocketError(RvbdHTTPException):
+    """Error returned by progressd over the socket protocol."""
+    def __init__(self, status, error_text):
+        self.result = None
+        self.status = status
+        self.error_text = error_text
+        self.error_id = None
+        RvbdException.__init__(self, 'progressd error %s: %s' %
+                               (status, error_text))
+
+    def __str__(self):
+        return self.message
+
+
+class SocketProgressDaemon(ProgressDaemon):
+    """Talk to progressd over its Unix domain socket.
+
+    Each thread keeps its own persistent connection, and the batch
+    operations handle many jobs per round-trip.  If the socket cannot be
+    reached, requests fall back to the HTTP API.
+    """
+    FRAME_HEADER = struct.Struct('!I')
+
+    # Requests that may be sent again if the response was lost
+    IDEMPOTENT_OPS = ('get', 'get_many', 'put', 'put_many', 'delete_many',
+                      'reset')
+
+    def __init__(self):
+        super(SocketProgressDaemon, self).__init__()
+        self.path = settings.PROGRESSD_SOCKET
+        self.local = threading.local()
+
+    def after_fork(self):
+        super(SocketProgressDaemon, self).after_fork()
+        # Leave the parent's socket alone, it is still in use there
+        self.local = threading.local()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(settings.PROGRESSD_CONN_TIMEOUT)
+            sock.connect(self.path)
+        except:
+            sock.close()
+            raise
+        self.local.sock = sock
+        self.local.rfile = sock.makefile('rb')
+        return sock
+
+    def _disconnect(self):
+        sock = getattr(self.local, 'sock', None)
+        if sock is not None:
+            self.local.rfile.close()
+            sock.close()
+        self.local.sock = None
+
+    def _send(self, body):
+        sock = getattr(self.local, 'sock', None) or self._connect()
+        sock.sendall(self.FRAME_HEADER.pack(len(body)) + body)
+
+    def _receive(self):
+        header = self.local.rfile.read(self.FRAME_HEADER.size)
+        if len(header) < self.FRAME_HEADER.size:
+            raise socket.error('progressd closed the connection')
+        length, = self.FRAME_HEADER.unpack(header)
+        return json.loads(self.local.rfile.read(length))
+
+    def _roundtrip(self, op, body):
+        try:
+            self._send(body)
+        except socket.error:
+            # Stale connection, progressd may have been restarted.  A
+            # request that was not fully sent was not handled, resend it
+            self._disconnect()
+            self._send(body)
+
+        try:
+            return self._receive()
+        except socket.error:
+            # The request may have been handled, only resend it if
+            # handling it twice is harmless
+            if op not in self.IDEMPOTENT_OPS:
+                raise
+            self._disconnect()
+            self._send(body)
+            return self._receive()
+
+    def _call(self, op, **kwargs):
+        """Send request `op`, returning None if the socket is unusable."""
+        kwargs['op'] = op
+        try:
+            resp = self._roundtrip(op, json.dumps(kwargs))
+        except socket.error as e:
+            self._disconnect()
+            logger.warning('Unable to reach progressd at %s, using HTTP: %s'
+                           % (self.path, e))
+            return None
+
+        if 'error' in resp:
+            raise ProgressdSocketError(resp['code'], resp['error'])
+        return resp
+
+    def get(self, id_, attr=None):
+        resp = self._call('get', job_id=id_)
+        if resp is None:
+            return super(SocketProgressDaemon, self).get(id_, attr)
+        r = resp['result']
+        if attr:
+            return r[attr]
+        return r
+
+    def get_many(self, ids):
+        ids = list(ids)
+        resp = self._call('get_many', ids=ids)
+        if resp is None:
+            return super(SocketProgressDaemon, self).get_many(ids)
+        return dict((id_, r) for id_, r in zip(ids, resp['result'])
+                    if r is not None)
+
+    def post(self, **kwargs):
+        resp = self._call('post', data=kwargs)
+        if resp is None:
+            return super(SocketProgressDaemon, self).post(**kwargs)
+        return resp['result']
+
+    def put(self, id_, **kwargs):
+        if self._call('put', job_id=id_, data=kwargs) is None:
+            super(SocketProgressDaemon, self).put(id_, **kwargs)
+
+    def put_many(self, items):
+        items = list(items)
+        if self._call('put_many', items=items) is None:
+            super(SocketProgressDaemon, self).put_many(items)
+
+    def delete(self, id_):
+        if self._call('delete', job_id=id_) is None:
+            super(SocketProgressDaemon, self).delete(id_)
+
+    def delete_many(self, ids):
+        ids = list(ids)
+        if self._call('delete_many', ids=ids) is None:
+            super(SocketProgressDaemon, self).delete_many(ids)
+
+    def reset(self):
+        if self._call('reset') is None:
+            super(SocketProgressDaemon, self).reset()
+
+
+PROGRESSD_BACKENDS = {
+    'http': ProgressDaemon,
+    'socket': SocketProgressDaemon,
+}
+
+
+def get_progressd():
+    name = settings.PROGRESSD_BACKEND
+    if name not in PROGRESSD_BACKENDS:
+        raise Exception('Unrecognized settings.PROGRESSD_BACKEND: %s' % name)
+    return PROGRESSD_BACKENDS[name]()
+
+
+progressd = get_progressd()
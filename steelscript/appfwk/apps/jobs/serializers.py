@@ -31,8 +31,8 @@ class JobSerializer(serializers.HyperlinkedModelSerializer):
         model = Job
         fields = ('url', 'table', 'master', 'parent',
                   'criteria', 'actual_criteria', 'status',
-                  'message',)
-        read_only_fields = ('message',)
+                  'message', 'deadline', 'cancelled')
+        read_only_fields = ('message', 'deadline', 'cancelled')
 
 
 class JobListSerializer(JobSerializer):
@@ -18,6 +18,18 @@ elif (settings.APPFWK_TASK_MODEL == 'async'):
     from steelscript.appfwk.apps.jobs.task.async import AsyncTask
     Task = AsyncTask
 
+elif (settings.APPFWK_TASK_MODEL == 'threadpool'):
+    from steelscript.appfwk.apps.jobs.task.threadpool import ThreadPoolTask
+    Task = ThreadPoolTask
+
+elif (settings.APPFWK_TASK_MODEL == 'process'):
+    from steelscript.appfwk.project import locks
+    if not locks.shared_between_processes():
+        raise Exception('settings.APPFWK_TASK_MODEL process needs a '
+                        'database file when using sqlite3')
+    from steelscript.appfwk.apps.jobs.task.process import ProcessTask
+    Task = ProcessTask
+
 elif (settings.APPFWK_TASK_MODEL == 'celery'):
     from steelscript.appfwk.apps.jobs.task.celerytask import CeleryTask
     Task = CeleryTask
@@ -7,6 +7,7 @@
 
 import sys
 import logging
+import threading
 import traceback
 
 from steelscript.appfwk.libs.fields import Callable
@@ -14,6 +15,22 @@ from steelscript.appfwk.libs.fields import Callable
 logger = logging.getLogger(__name__)
 
 
+# Task priorities, lower values run first with task models that queue
+# work.  Jobs started from report pages are interactive, jobs started
+# through the REST API or from the command line are background.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+# Priority of the task running in the current thread, inherited by
+# tasks it creates so dependent jobs keep the priority of their parent
+_current = threading.local()
+
+
+def current_priority():
+    priority = getattr(_current, 'priority', None)
+    return PRIORITY_INTERACTIVE if priority is None else priority
+
+
 class QueryResponse(object):
 
     QUERY_COMPLETE = 1
@@ -37,6 +54,31 @@ class QueryComplete(QueryResponse):
         self.data = data
 
 
+class QueryStream(QueryComplete):
+    """Complete query result delivered as an iterable of chunks.
+
+    Each chunk is a DataFrame or list of rows for the non-synthetic
+    columns of the table, as would be passed to QueryComplete.  Chunks
+    are checked and normalized as they are produced.  Only tables with
+    a row limit and no synthetic columns or resampling avoid holding
+    the whole result in memory, see Job.save_stream.  The job is
+    checked for cancellation between chunks.
+    """
+
+    def __init__(self, chunks):
+        super(QueryStream, self).__init__(None)
+        self.chunks = chunks
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        # Release a generator that was not read to the end
+        close = getattr(self.chunks, 'close', None)
+        if close is not None:
+            close()
+
+
 class QueryContinue(QueryResponse):
 
     def __init__(self, callback, jobs=None):
@@ -55,13 +97,21 @@ class QueryError(QueryResponse):
 
 class BaseTask(object):
 
-    def __init__(self, job, callback, generic=False):
+    def __init__(self, job, callback, generic=False, priority=None,
+                 continuation=False):
         job.reference("Task created")
         # Change to job id?
         self.job = job
         self.callback = callback
         self.generic = generic
 
+        # Continuations resume a job that has already run, such as parent
+        # callbacks once children complete, and go ahead of new queries
+        # of the same priority
+        self.priority = (current_priority() if priority is None
+                         else priority)
+        self.continuation = continuation or generic
+
     def __unicode__(self):
         return "<%s %s %s>" % (self.__class__, self.job, self.callback)
 
@@ -71,11 +121,64 @@ class BaseTask(object):
     def __repr__(self):
         return unicode(self)
 
+    def to_message(self):
+        """Return a compact description of this task to pass to workers.
+
+        Only the job id is sent, the worker loads the job from the
+        database with `from_message`, so the message does not carry a
+        snapshot of the job and its criteria.
+        """
+        return {'job_id': self.job.id,
+                'callback': self.callback.to_dict(),
+                'generic': self.generic,
+                'priority': self.priority,
+                'continuation': self.continuation}
+
+    @classmethod
+    def from_message(cls, message):
+        """Recreate a task from `to_message`, or None if the job is gone.
+
+        The job is not referenced again, the reference taken when the
+        task was created is released when it runs.
+        """
+        # Imported here, the models module depends on this one
+        from steelscript.appfwk.apps.jobs.models import Job
+
+        try:
+            job = Job.objects.get(pk=message['job_id'])
+        except Job.DoesNotExist:
+            logger.warning('Job %s no longer exists, dropping task %s' %
+                           (message['job_id'], message['callback']))
+            return None
+
+        self = cls.__new__(cls)
+        self.job = job
+        self.callback = Callable.from_dict(message['callback'])
+        self.generic = message['generic']
+        self.priority = message['priority']
+        self.continuation = message['continuation']
+        return self
+
     def call_method(self):
-        if self.generic:
-            return self._call_generic_method()
-        else:
-            return self._call_query_method()
+        saved = getattr(_current, 'priority', None)
+        _current.priority = self.priority
+        try:
+            if self.generic:
+                return self._call_generic_method()
+            else:
+                return self._call_query_method()
+        finally:
+            _current.priority = saved
+
+    def _cancelled(self):
+        """ Cancel the job if it should stop, returning True if so. """
+        reason = self.job.cancel_reason()
+        if reason is None:
+            return False
+
+        logger.info("%s: stopping %s(): %s" % (self, self.callback, reason))
+        self.job.cancel(reason)
+        return True
 
     def _call_query_method(self):
         """ Run query-based Job. """
@@ -86,6 +189,9 @@ class BaseTask(object):
         query = self.job.table.queryclass(self.job)
 
         try:
+            if self._cancelled():
+                return
+
             logger.info("%s: running %s()" % (self, callback))
             result = callback(query)
 
@@ -97,7 +203,18 @@ class BaseTask(object):
                 result = QueryError(self.job.message or
                                     ("Unknown failure running %s" % callback))
 
-            if result.is_complete():
+            # Drop the result if the job was cancelled while running,
+            # this also cancels any children the query created
+            if self._cancelled():
+                if isinstance(result, QueryStream):
+                    result.close()
+                return
+
+            if isinstance(result, QueryStream):
+                if self.job.save_stream(result, self._cancelled):
+                    self.job.mark_complete()
+
+            elif result.is_complete():
                 # Result is of type QueryComplete
                 self.job.mark_complete(result.data)
 
@@ -119,7 +236,8 @@ class BaseTask(object):
                                                  Callable(result.callback)))
 
                 logger.debug("%s: Setting callback %s" % (self.job, callback))
-                self.job.safe_update(callback=callback)
+                self.job.safe_update(callback=callback,
+                                     pending_children=len(result.jobs))
 
                 for name, job in result.jobs.iteritems():
                     job.start()
@@ -161,6 +279,11 @@ class BaseTask(object):
         finally:
             self.job.dereference("Task exiting")
 
+    @classmethod
+    def stats(cls):
+        """Return a dict of task model counters, if any."""
+        return {}
+
     @classmethod
     def validate_jobs(cls, jobs, delete=False):
         """Validate the given list of jobs and optionally delete invalid ones.
@@ -5,6 +5,7 @@
 # as set forth in the License.
 
 
+import re
 import celery
 import logging
 import djcelery
@@ -18,11 +19,20 @@ logger = logging.getLogger(__name__)
 class CeleryTask(BaseTask):
 
     def start(self):
-        task_start.delay(self)
+        task_run.delay(self.to_message())
+
+
+@celery.task()
+def task_run(message):
+    task = CeleryTask.from_message(message)
+    if task is not None:
+        task.call_method()
 
 
 @celery.task()
 def task_start(task):
+    # Messages with the whole task object, as queued by earlier
+    # versions, still run after an upgrade
     task.call_method()
 
 
@@ -78,9 +88,12 @@ class CeleryInspector(object):
     def check_job(self, job):
         self.update_workers()
 
+        # Worker queues list task arguments as strings, either the
+        # message from to_message() or an older full task object
+        job_id = re.compile(r"'job_id': %d\b" % job.id)
         for q in self.queues:
             for j in self.get_queue(q):
-                if str(job) in j:
+                if job_id.search(j) or str(job) in j:
                     logging.debug('Found alive job %s in queue %s' % (j, q))
                     return True
         return False
@@ -0,0 +1,192 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+"""
+Task model running jobs in a pool of worker processes.
+
+CPU-bound work such as analysis tables, synthetic columns and
+resampling holds the GIL, so with the ``async`` model concurrent
+reports run one at a time.  The ``process`` model runs tasks in a fixed
+number of forked worker processes instead, set by
+``settings.APPFWK_PROCESS_POOL_SIZE``.  No broker is needed, tasks are
+passed to workers over multiprocessing queues.
+
+All tasks for a job handle go to the same worker, so repeated work on
+the same data benefits from that worker's data cache.  Workers can
+start tasks themselves, for example for dependent jobs, and these are
+routed through the same queues.  Queues carry the compact task messages
+from BaseTask.to_message, workers load the job from the database.
+
+Workers update the same jobs concurrently, so job locks must hold
+across processes.  With SQLite they rely on fcntl locks on a lock file
+next to the database file, see project/locks.py: the database must be
+a file on a local filesystem, and an in-memory database is refused.
+"""
+
+import os
+import atexit
+import signal
+import logging
+import threading
+import multiprocessing
+
+from django import db
+from django.conf import settings
+
+from steelscript.appfwk.apps.jobs.task.base import BaseTask
+from steelscript.appfwk.apps.jobs.task.async import AsyncTask
+from steelscript.appfwk.project import locks
+
+logger = logging.getLogger(__name__)
+
+
+# Set in worker processes
+_in_worker = False
+
+# Database connections inherited from the parent, see _reset_connections
+_inherited_connections = []
+
+
+def _reset_connections():
+    """Drop the database connections inherited from the parent.
+
+    Closing them in the child would end the parent's sessions, possibly
+    in the middle of a transaction.  They are kept referenced so they are
+    never closed from here, and the worker opens its own connections on
+    first use.
+    """
+    _inherited_connections.extend(db.connections.all())
+    db.connections._connections = threading.local()
+
+
+def _worker_main(index, queue):
+    global _in_worker
+    _in_worker = True
+
+    # Shutdown is driven by the parent
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    _reset_connections()
+
+    # Locks held by other threads of the parent when forking
+    locks.after_fork()
+
+    from steelscript.appfwk.apps.jobs.progress import progressd
+    progressd.after_fork()
+
+    logger.info('Process pool worker %d started, pid %d' %
+                (index, os.getpid()))
+    while True:
+        message = queue.get()
+        if message is None:
+            break
+        try:
+            task = ProcessTask.from_message(message)
+            if task is not None:
+                task.run()
+        except:
+            logger.exception('Process pool worker %d: %s failed' %
+                             (index, message))
+        finally:
+            db.close_old_connections()
+
+    logger.info('Process pool worker %d exiting' % index)
+
+
+class ProcessPool(object):
+    """Fixed size pool of worker processes with a queue per worker."""
+
+    def __init__(self, size=None):
+        self.size = size or multiprocessing.cpu_count()
+        self.pid = None
+        self.queues = []
+        self.workers = []
+
+    def _start(self):
+        if not locks.shared_between_processes():
+            raise Exception('The process task model needs job locks that '
+                            'work across processes, see project/locks.py')
+
+        self.pid = os.getpid()
+        self.queues = [multiprocessing.Queue() for i in range(self.size)]
+        self.workers = [None] * self.size
+        for i in range(self.size):
+            self._start_worker(i)
+        logger.info('Started process pool with %d workers' % self.size)
+
+    def _start_worker(self, index):
+        worker = multiprocessing.Process(
+            target=_worker_main, args=(index, self.queues[index]),
+            name='appfwk-worker-%d' % index)
+        worker.daemon = True
+        worker.start()
+        self.workers[index] = worker
+
+    def index(self, handle):
+        """Return the index of the worker for job `handle`."""
+        return hash(handle) % self.size
+
+    def submit(self, task):
+        if not _in_worker:
+            if self.pid != os.getpid():
+                # First use, or the pool was inherited by a fork
+                self._start()
+
+            index = self.index(task.job.handle)
+            if not self.workers[index].is_alive():
+                logger.warning('Process pool worker %d (pid %s) died, '
+                               'restarting' %
+                               (index, self.workers[index].pid))
+                self._start_worker(index)
+        else:
+            index = self.index(task.job.handle)
+
+        self.queues[index].put(task.to_message())
+
+    def shutdown(self, timeout=10):
+        """Stop workers once they finish the tasks already queued."""
+        if self.pid != os.getpid() or _in_worker:
+            return
+
+        for queue in self.queues:
+            queue.put(None)
+        for worker in self.workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                logger.warning('Process pool worker pid %d did not exit, '
+                               'terminating' % worker.pid)
+                worker.terminate()
+        self.pid = None
+        self.workers = []
+
+
+pool = ProcessPool(settings.APPFWK_PROCESS_POOL_SIZE)
+atexit.register(pool.shutdown)
+
+
+class ProcessTask(BaseTask):
+
+    def __unicode__(self):
+        return "<ProcessTask %s>" % (self.job)
+
+    def __str__(self):
+        return "<ProcessTask %s>" % (self.job)
+
+    def __repr__(self):
+        return unicode(self)
+
+    def start(self):
+        pool.submit(self)
+
+    def run(self):
+        # Record the worker pid so that validate_jobs treats the job
+        # as stale if this worker dies
+        self.job.safe_update(pid=os.getpid())
+        self.call_method()
+
+    @classmethod
+    def validate_jobs(cls, jobs, delete=False):
+        return AsyncTask.validate_jobs(jobs, delete=delete)
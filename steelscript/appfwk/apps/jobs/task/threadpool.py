@@ -0,0 +1,169 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+"""
+Task model running jobs on a bounded, prioritized pool of threads.
+
+The ``async`` model starts a new thread for every task, so several large
+reports at once can mean hundreds of threads contending for the GIL and
+database connections.  The ``threadpool`` model instead queues tasks
+for a fixed number of threads, ``settings.APPFWK_THREAD_POOL_SIZE``.
+
+Queued tasks run in order of priority: interactive jobs before
+background jobs, and within the same priority, continuations such as
+parent callbacks before new queries, then first come, first served.
+"""
+
+import os
+import time
+import Queue
+import logging
+import itertools
+import threading
+
+from django import db
+from django.conf import settings
+
+from steelscript.appfwk.apps.jobs.task.base import BaseTask
+from steelscript.appfwk.apps.jobs.task.async import validate
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadPool(object):
+    """Fixed size pool of threads serving a priority queue of tasks."""
+
+    def __init__(self, size):
+        self.size = size
+        self.queue = Queue.PriorityQueue()
+        self.lock = threading.Lock()
+        self.threads = []
+        self.seq = itertools.count()
+
+        # Number of queued or running tasks by job id
+        self.jobs = {}
+
+        self.active = 0
+        self.submitted = 0
+        self.completed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _start(self):
+        # Called with self.lock held
+        self.threads = [t for t in self.threads if t.is_alive()]
+        for i in range(len(self.threads), self.size):
+            t = threading.Thread(target=self._worker,
+                                 name='appfwk-task-%d' % i)
+            t.daemon = True
+            t.start()
+            self.threads.append(t)
+
+    def submit(self, task):
+        key = (task.priority, 0 if task.continuation else 1, next(self.seq))
+        job_id = task.job.id
+        with self.lock:
+            if len(self.threads) < self.size:
+                self._start()
+            self.submitted += 1
+            self.jobs[job_id] = self.jobs.get(job_id, 0) + 1
+        self.queue.put((key, time.time(), task))
+
+    def _worker(self):
+        while True:
+            key, queued, task = self.queue.get()
+            wait = time.time() - queued
+            with self.lock:
+                self.active += 1
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+
+            try:
+                task.call_method()
+            except:
+                logger.exception('%s failed' % task)
+            finally:
+                db.close_old_connections()
+                with self.lock:
+                    self.active -= 1
+                    self.completed += 1
+                    job_id = task.job.id
+                    if self.jobs[job_id] > 1:
+                        self.jobs[job_id] -= 1
+                    else:
+                        del self.jobs[job_id]
+
+    def is_alive(self):
+        """True if all threads of the pool are running."""
+        with self.lock:
+            return all(t.is_alive() for t in self.threads)
+
+    def has_jobs(self, job_ids):
+        """True if a task of any of `job_ids` is queued or running."""
+        with self.lock:
+            return any(i in self.jobs for i in job_ids)
+
+    def stats(self):
+        """Return a dict of pool counters, times are in seconds."""
+        with self.lock:
+            started = self.submitted - self.queue.qsize()
+            return {'threads': len(self.threads),
+                    'size': self.size,
+                    'active': self.active,
+                    'queued': self.queue.qsize(),
+                    'submitted': self.submitted,
+                    'completed': self.completed,
+                    'wait_avg': self.wait_total / max(started, 1),
+                    'wait_max': self.wait_max}
+
+
+pool = ThreadPool(settings.APPFWK_THREAD_POOL_SIZE)
+
+
+class ThreadPoolTask(BaseTask):
+
+    def __unicode__(self):
+        return "<ThreadPoolTask %s>" % (self.job)
+
+    def __str__(self):
+        return "<ThreadPoolTask %s>" % (self.job)
+
+    def __repr__(self):
+        return unicode(self)
+
+    def start(self):
+        pool.submit(self)
+
+    @classmethod
+    def stats(cls):
+        return pool.stats()
+
+    @classmethod
+    def validate_jobs(cls, jobs, delete=False):
+        valid_jobs = []
+        for j in jobs:
+            if j.pid == os.getpid():
+                # Created but not started yet, waiting on children, or
+                # with a task of its own or of a child in the pool.  A
+                # child that is done runs the callback of its parent
+                # from its own task.
+                valid = (j.done() or j.status == j.NEW or
+                         j.pending_children > 0 or
+                         (pool.is_alive() and pool.has_jobs(
+                             [j.id] + list(j.children.values_list(
+                                 'id', flat=True)))))
+            else:
+                valid = validate(j)
+
+            if valid:
+                valid_jobs.append(j)
+            elif delete:
+                logging.debug('Deleting stale job %s with PID %s' % (j, j.pid))
+                j.delete()
+            else:
+                logging.debug('Ignoring stale job %s with PID %s' % (j, j.pid))
+
+        return valid_jobs
@@ -0,0 +1,27 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+from steelscript.appfwk.apps.jobs.tests.test_normalize import *
+from steelscript.appfwk.apps.jobs.tests.test_sort import *
+from steelscript.appfwk.apps.jobs.tests.test_locks import *
+from steelscript.appfwk.apps.jobs.tests.test_refresh import *
+from steelscript.appfwk.apps.jobs.tests.test_handle import *
+from steelscript.appfwk.apps.jobs.tests.test_janitor import *
+from steelscript.appfwk.apps.jobs.tests.test_fanin import *
+from steelscript.appfwk.apps.jobs.tests.test_followers import *
+from steelscript.appfwk.apps.jobs.tests.test_indexes import *
+from steelscript.appfwk.apps.jobs.tests.test_cancel import *
+from steelscript.appfwk.apps.jobs.tests.test_messages import *
+from steelscript.appfwk.apps.jobs.tests.test_synthetic import *
+from steelscript.appfwk.apps.jobs.tests.test_deferred import *
+from steelscript.appfwk.apps.jobs.tests.test_columns import *
+from steelscript.appfwk.apps.jobs.tests.test_options import *
+from steelscript.appfwk.apps.jobs.tests.test_fields import *
+from steelscript.appfwk.apps.jobs.tests.test_values import *
+from steelscript.appfwk.apps.jobs.tests.test_process import *
+from steelscript.appfwk.apps.jobs.tests.test_threadpool import *
+from steelscript.appfwk.apps.jobs.tests.test_cache import *
+from steelscript.appfwk.apps.jobs.tests.test_stream import *
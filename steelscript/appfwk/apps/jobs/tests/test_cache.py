@@ -0,0 +1,112 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import logging
+
+import pandas
+from django.test import TestCase
+
+from steelscript.appfwk.apps.datasource.models import Criteria
+from steelscript.appfwk.apps.jobs.cache import DataFrameCache, dfcache
+from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.progress import progressd
+from steelscript.appfwk.apps.jobs.tests.test_refresh import LifecycleTable
+
+logger = logging.getLogger(__name__)
+
+
+def frame(n=100):
+    return pandas.DataFrame({'key': range(n),
+                             'value': [float(i) for i in range(n)]})
+
+
+class DataFrameCacheTest(TestCase):
+
+    def setUp(self):
+        self.size = DataFrameCache.sizeof(frame())
+        self.cache = DataFrameCache(self.size * 3)
+
+    def test_get_put(self):
+        df = frame()
+        self.cache.put('a', 1, df)
+        self.assertIs(self.cache.get('a', 1), df)
+        self.assertIsNone(self.cache.get('b', 1))
+
+        # Data of another job for the same handle is dropped
+        self.assertIsNone(self.cache.get('a', 2))
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 2)
+
+    def test_columns(self):
+        df = frame()
+        self.cache.put('a', 1, df)
+        subset = self.cache.get('a', 1, columns=['value', 'missing'])
+        self.assertEqual(list(subset.columns), ['value'])
+
+        # Only the requested columns are copied
+        subset['value'] = 0.0
+        self.assertEqual(df['value'][1], 1.0)
+
+    def test_eviction(self):
+        for handle in 'abc':
+            self.cache.put(handle, 1, frame())
+        self.cache.get('a', 1)
+        self.cache.put('d', 1, frame())
+
+        # 'b' was the least recently used
+        self.assertEqual(sorted(self.cache.handles()), ['a', 'c', 'd'])
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+        self.assertEqual(self.cache.nbytes, self.size * 3)
+
+        # Frames larger than the cache are not kept
+        self.cache.put('a', 1, frame(1000))
+        self.assertIsNone(self.cache.get('a', 1))
+        self.assertEqual(self.cache.nbytes, self.size * 2)
+
+    def test_invalidate_retain(self):
+        for handle in 'abc':
+            self.cache.put(handle, 1, frame())
+
+        self.cache.invalidate('a')
+        self.cache.invalidate('missing')
+        self.assertEqual(sorted(self.cache.handles()), ['b', 'c'])
+
+        self.cache.retain(['c', 'd'])
+        self.assertEqual(self.cache.handles(), ['c'])
+        self.assertEqual(self.cache.nbytes, self.size)
+
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.nbytes, 0)
+
+    def test_disabled(self):
+        cache = DataFrameCache(0)
+        cache.put('a', 1, frame())
+        self.assertIsNone(cache.get('a', 1))
+        self.assertEqual(cache.stats()['misses'], 0)
+
+
+class JobDataCacheTest(TestCase):
+
+    def setUp(self):
+        progressd.reset()
+        dfcache.clear()
+        table = LifecycleTable.create('test-job-data-cache')
+        self.job = Job.create(table, Criteria())
+        self.job.start()
+
+    def test_data_shared(self):
+        self.assertIn(self.job.handle, dfcache.handles())
+
+        # Full reads share the cached frame
+        df = self.job.data()
+        self.assertIs(self.job.data(), df)
+
+        # A column subset is separate from the cached frame
+        subset = self.job.data(columns=['value'])
+        subset['value'] = 0
+        self.assertEqual(list(self.job.data()['value']), [10, 20, 30])
@@ -0,0 +1,115 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import datetime
+
+import pandas
+import pytz
+from django.test import TestCase
+
+from steelscript.appfwk.apps.alerting.models import post_data_save
+from steelscript.appfwk.apps.datasource.models import Criteria
+from steelscript.appfwk.apps.jobs.datastore import datastore
+from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.janitor import Janitor
+from steelscript.appfwk.apps.jobs.progress import progressd
+from steelscript.appfwk.apps.jobs.tests.test_refresh import LifecycleTable
+
+
+class JobCancelTest(TestCase):
+
+    def setUp(self):
+        progressd.reset()
+        self.parent_table = LifecycleTable.create('test-cancel-parent')
+        self.child_table = LifecycleTable.create('test-cancel-child')
+        self.shared_table = LifecycleTable.create('test-cancel-shared')
+
+    def assertCancelled(self, job, message='Job cancelled'):
+        job.refresh()
+        self.assertTrue(job.cancelled)
+        self.assertEqual(job.status, Job.ERROR)
+        self.assertEqual(job.message, message)
+
+    def test_cancel_tree(self):
+        parent = Job.create(self.parent_table, Criteria())
+        child = Job.create(self.child_table, Criteria(), parent=parent)
+        shared = Job.create(self.shared_table, Criteria(), parent=parent)
+
+        # Another report is following the shared child
+        follower = Job.create(self.shared_table, Criteria())
+        self.assertEqual(follower.master_id, shared.id)
+
+        ids = parent.cancel()
+        self.assertEqual(ids, [parent.id, child.id])
+
+        self.assertCancelled(parent)
+        self.assertCancelled(child)
+
+        shared.refresh()
+        self.assertFalse(shared.cancelled)
+        self.assertEqual(shared.status, Job.NEW)
+
+    def test_cancelled_job_does_not_run(self):
+        job = Job.create(self.parent_table, Criteria())
+        job.cancel()
+        job.start()
+        self.assertCancelled(job)
+
+    def test_deadline(self):
+        job = Job.create(self.parent_table, Criteria(), deadline=-1)
+        job.start()
+        self.assertCancelled(job, 'Job deadline exceeded')
+
+        parent = Job.create(self.parent_table, Criteria(), deadline=60)
+        child = Job.create(self.child_table, Criteria(), parent=parent,
+                           deadline=3600)
+        self.assertEqual(child.deadline, parent.deadline)
+
+    def test_expire(self):
+        job = Job.create(self.parent_table, Criteria())
+        Job.objects.filter(pk=job.pk).update(
+            deadline=datetime.datetime.now(tz=pytz.utc))
+
+        self.assertEqual(Janitor().expire_jobs(), 1)
+        self.assertCancelled(job, 'Job deadline exceeded')
+
+    def test_cancel_if_unused(self):
+        master = Job.create(self.parent_table, Criteria())
+        follower = Job.create(self.parent_table, Criteria())
+        self.assertEqual(follower.master_id, master.id)
+
+        # Still wanted by the follower
+        self.assertFalse(master.cancel_if_unused())
+
+        self.assertTrue(follower.cancel_if_unused())
+        self.assertCancelled(follower, 'Job no longer in use')
+
+        self.assertTrue(master.cancel_if_unused())
+        self.assertCancelled(master, 'Job no longer in use')
+
+    def test_cancel_while_completing(self):
+        senders = []
+
+        def on_data_save(sender, **kwargs):
+            senders.append(sender.id)
+
+        post_data_save.connect(on_data_save)
+        self.addCleanup(post_data_save.disconnect, on_data_save)
+
+        # Cancelled after the task's last check, before the result is saved
+        job = Job.create(self.parent_table, Criteria())
+        Job.objects.filter(pk=job.pk).update(cancelled=True)
+        job.mark_complete(pandas.DataFrame({'key': [1], 'value': [10]}))
+        self.assertIsNone(datastore.find(job.handle))
+
+        # Cancelled and marked done before mark_done runs
+        other = Job.create(self.child_table, Criteria())
+        other.mark_error('Job cancelled')
+        other.mark_complete()
+
+        self.assertEqual(senders, [])
+        other.refresh()
+        self.assertEqual(other.status, Job.ERROR)
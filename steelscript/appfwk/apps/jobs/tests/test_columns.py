@@ -0,0 +1,100 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import logging
+
+from django.test import TestCase
+
+from steelscript.appfwk.apps.datasource.models import \
+    Table, Column, Criteria, clear_column_cache, new_columns_stamp
+from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.progress import progressd
+from steelscript.appfwk.apps.jobs.tests.test_refresh import LifecycleTable
+
+logger = logging.getLogger(__name__)
+
+
+class ColumnCacheTest(TestCase):
+
+    def setUp(self):
+        progressd.reset()
+        self.table = LifecycleTable.create('test-column-cache')
+
+    def names(self, **kwargs):
+        return [c.name for c in self.table.get_columns(**kwargs)]
+
+    def test_cached(self):
+        self.assertEqual(self.names(), ['key', 'value'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names(), ['key', 'value'])
+            self.assertEqual(self.names(iskey=True), ['key'])
+            self.assertEqual(self.names(synthetic=True), [])
+
+    def test_copies(self):
+        column = self.table.get_columns()[0]
+        column.label = 'changed'
+        self.assertNotEqual(self.table.get_columns()[0].label, 'changed')
+
+    def test_save_and_delete(self):
+        self.names()
+        self.table.add_column('extra', 'Extra')
+        self.assertEqual(self.names(), ['key', 'value', 'extra'])
+
+        column = Column.objects.get(table=self.table, name='value')
+        column.label = 'Renamed'
+        column.save()
+        self.assertEqual(self.table.get_columns()[1].label, 'Renamed')
+
+        column.delete()
+        self.assertEqual(self.names(), ['key', 'extra'])
+
+        # Changes made without saving a Column need an explicit clear
+        Column.objects.filter(table=self.table).update(label='Updated')
+        self.assertEqual(self.table.get_columns()[0].label, 'Key')
+        clear_column_cache()
+        self.assertEqual(self.table.get_columns()[0].label, 'Updated')
+
+    def test_stamp(self):
+        self.names()
+        stamp = Table.objects.get(id=self.table.id).columns_stamp
+        self.assertEqual(stamp, self.table.columns_stamp)
+
+        # Saving a column replaces the stamp of the table
+        Column.objects.get(table=self.table, name='value').save()
+        table = Table.objects.get(id=self.table.id)
+        self.assertNotEqual(table.columns_stamp, stamp)
+
+        # A change made by another process is picked up by tables
+        # loaded after it, as is a table reusing the id
+        self.names()
+        Column.objects.filter(table=self.table,
+                              name='key').update(label='Other')
+        Table.objects.filter(id=self.table.id).update(
+            columns_stamp=new_columns_stamp())
+        self.assertEqual(self.table.get_columns()[0].label, 'Key')
+        table = Table.objects.get(id=self.table.id)
+        self.assertEqual(table.get_columns()[0].label, 'Other')
+
+    def test_ephemeral(self):
+        job = Job.create(self.table, Criteria())
+        other = Job.create(self.table, Criteria(ignore_cache=True))
+
+        Column.create(self.table, 'host1', ephemeral=job)
+        self.assertEqual(self.names(), ['key', 'value'])
+        self.assertEqual(self.names(ephemeral=job),
+                         ['key', 'value', 'host1'])
+        self.assertEqual(self.names(ephemeral=other), ['key', 'value'])
+
+        # Only the columns of finished jobs are cached
+        job.status = Job.COMPLETE
+        self.names(ephemeral=job)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names(ephemeral=job),
+                             ['key', 'value', 'host1'])
+
+        Column.create(self.table, 'host2', ephemeral=job)
+        self.assertEqual(self.names(ephemeral=job),
+                         ['key', 'value', 'host1', 'host2'])
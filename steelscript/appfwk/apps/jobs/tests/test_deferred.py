@@ -0,0 +1,142 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import logging
+
+import pandas
+from django.test import TestCase
+
+from steelscript.appfwk.apps.datasource.models import \
+    DatasourceTable, DatasourceQuery, Criteria, column_consumers
+from steelscript.appfwk.apps.datasource.exceptions import \
+    TableComputeSyntheticError
+from steelscript.appfwk.apps.datasource.synthetic import \
+    synthetic_graph, synthetic_order
+from steelscript.appfwk.apps.jobs import QueryComplete
+from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.progress import progressd
+
+logger = logging.getLogger(__name__)
+
+
+class DeferredTable(DatasourceTable):
+    class Meta:
+        proxy = True
+
+    _query_class = 'DeferredQuery'
+
+    def post_process_table(self, field_options):
+        self.add_column('key', 'Key', iskey=True)
+        self.add_column('value', 'Value')
+
+        # Defined before the column it refers to
+        self.add_column('quad', synthetic=True,
+                        compute_expression='{double} * 2')
+        self.add_column('double', synthetic=True,
+                        compute_expression='{value} * 2')
+        self.add_column('shown', synthetic=True,
+                        compute_expression='{value} + 1')
+        self.add_column('total', synthetic=True,
+                        compute_expression='{value}.sum()')
+
+
+class DeferredQuery(DatasourceQuery):
+
+    def run(self):
+        return QueryComplete(pandas.DataFrame({'key': [1, 2, 3],
+                                               'value': [10, 20, 30]}))
+
+
+class DeferredSyntheticTest(TestCase):
+
+    def setUp(self):
+        progressd.reset()
+        self.consumed = {}
+        column_consumers.append(self.consumer)
+
+    def tearDown(self):
+        column_consumers.remove(self.consumer)
+
+    def consumer(self, table):
+        return self.consumed.get(table.name, set())
+
+    def run_job(self, table):
+        job = Job.create(table, Criteria())
+        job.start()
+        self.assertEqual(job.status, Job.COMPLETE)
+        return job
+
+    def test_order(self):
+        table = DeferredTable.create('test-deferred-order')
+        columns = table.get_columns()
+        graph = synthetic_graph(columns)
+        self.assertEqual(graph['quad'], ['double'])
+        self.assertEqual(graph['double'], [])
+
+        order = [c.name for c in synthetic_order(columns, graph)]
+        self.assertEqual(order, ['double', 'quad', 'shown', 'total'])
+
+    def test_cycle(self):
+        table = DeferredTable.create('test-deferred-cycle')
+        table.add_column('a', synthetic=True, compute_expression='{b} + 1')
+        table.add_column('b', synthetic=True, compute_expression='{a} + 1')
+
+        job = Job.create(table, Criteria())
+        df = pandas.DataFrame({'key': [1], 'value': [1]})
+        with self.assertRaises(TableComputeSyntheticError):
+            table.compute_synthetic(job, df)
+
+    def test_all_consumed(self):
+        table = DeferredTable.create('test-deferred-all')
+        job = self.run_job(table)
+
+        saved = job._load_data()
+        for name in ('double', 'quad', 'shown', 'total'):
+            self.assertIn(name, saved)
+
+    def test_consumed_only(self):
+        table = DeferredTable.create('test-deferred-only')
+        self.consumed[table.name] = set(['shown'])
+        job = self.run_job(table)
+
+        saved = job._load_data()
+        self.assertEqual(list(saved['shown']), [11, 21, 31])
+        self.assertNotIn('double', saved)
+        self.assertNotIn('quad', saved)
+
+        # Reading a single column computes it and what it refers to
+        df = job.data(columns=['quad'])
+        self.assertEqual(list(df.columns), ['quad'])
+        self.assertEqual(list(df['quad']), [40, 80, 120])
+        self.assertIn('double', job._load_data())
+
+        df = job.data()
+        self.assertEqual(list(df['double']), [20, 40, 60])
+        self.assertEqual(list(df['total']), [60, 60, 60])
+
+    def test_values_columns(self):
+        table = DeferredTable.create('test-deferred-values')
+        self.consumed[table.name] = set(['shown'])
+        job = self.run_job(table)
+
+        names = [c.name for c in job.get_columns()]
+        rows = job.values(columns=set(['key', 'shown']))
+        self.assertEqual(len(rows), 3)
+        row = dict(zip(names, rows[0]))
+        self.assertEqual(row['shown'], 11)
+        self.assertEqual(row['quad'], 'None')
+
+    def test_not_deferrable(self):
+        # Trimmed to fewer rows than the query returns, so a total over
+        # the rows cannot be computed from the saved data
+        table = DeferredTable.create('test-deferred-rows', rows=2)
+        self.consumed[table.name] = set(['shown'])
+        job = self.run_job(table)
+
+        saved = job._load_data()
+        self.assertEqual(len(saved), 2)
+        self.assertEqual(list(saved['total']), [60, 60])
+        self.assertNotIn('quad', saved)
@@ -0,0 +1,100 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import time
+import logging
+
+import pandas
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from steelscript.appfwk.apps.datasource.models import \
+    DatasourceTable, DatasourceQuery, Criteria, Table
+from steelscript.appfwk.apps.jobs import QueryComplete, QueryContinue
+from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.progress import progressd
+from steelscript.appfwk.apps.jobs.tests.test_refresh import LifecycleTable
+
+logger = logging.getLogger(__name__)
+
+
+class FanoutTable(DatasourceTable):
+    class Meta:
+        proxy = True
+
+    TABLE_OPTIONS = {'children': 1,
+                     'child_table': None}
+
+    _query_class = 'FanoutQuery'
+
+    def post_process_table(self, field_options):
+        self.add_column('key', 'Key', iskey=True)
+        self.add_column('value', 'Value')
+
+
+class FanoutQuery(DatasourceQuery):
+
+    # Number of times the callback ran, by job id
+    callbacks = {}
+
+    def run(self):
+        child_table = Table.objects.get(name=self.table.options.child_table)
+        jobs = {}
+        for i in range(self.table.options.children):
+            jobs['child-%d' % i] = Job.create(
+                table=child_table,
+                criteria=Criteria(parent_id=self.job.id, n=i),
+                parent=self.job)
+        return QueryContinue(self.collect, jobs)
+
+    def collect(self, jobs):
+        FanoutQuery.callbacks[self.job.id] = (
+            FanoutQuery.callbacks.get(self.job.id, 0) + 1)
+        return QueryComplete(pandas.concat([j.data() for j in
+                                            jobs.values()]))
+
+
+class FanInTest(TestCase):
+
+    def setUp(self):
+        progressd.reset()
+        LifecycleTable.create('test-fanin-child')
+
+    def run_tree(self, children):
+        table = FanoutTable.create('test-fanin-%d' % children,
+                                   children=children,
+                                   child_table='test-fanin-child')
+        with CaptureQueriesContext(connection) as queries:
+            start = time.time()
+            job = Job.create(table, Criteria())
+            job.start()
+            elapsed = time.time() - start
+
+        job.refresh()
+        self.assertEqual(job.status, Job.COMPLETE)
+        self.assertEqual(FanoutQuery.callbacks[job.id], 1)
+        self.assertEqual(job.pending_children, 0)
+        self.assertEqual(len(job.data()), 3 * children)
+        return len(queries.captured_queries), elapsed
+
+    def test_callback_once(self):
+        self.run_tree(1)
+        self.run_tree(5)
+
+    def test_benchmark(self):
+        small, large = 10, 80
+        small_queries, small_secs = self.run_tree(small)
+        large_queries, large_secs = self.run_tree(large)
+
+        logger.info('Fan-in %d children: %d queries %.3fs, '
+                    '%d children: %d queries %.3fs' %
+                    (small, small_queries, small_secs,
+                     large, large_queries, large_secs))
+
+        # Queries grow no faster than the number of children
+        self.assertLess(float(large_queries) / small_queries,
+                        1.2 * large / small)
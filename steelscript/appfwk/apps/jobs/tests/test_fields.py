@@ -0,0 +1,40 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import logging
+import datetime
+
+from django.test import TestCase
+
+from steelscript.appfwk.apps.datasource.models import Criteria
+from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.progress import progressd
+from steelscript.appfwk.apps.jobs.tests.test_refresh import LifecycleTable
+from steelscript.appfwk.libs.fields import dbsafe_encode, FAST_PREFIX
+
+logger = logging.getLogger(__name__)
+
+
+class JobCriteriaFieldTest(TestCase):
+
+    def setUp(self):
+        progressd.reset()
+        self.table = LifecycleTable.create('test-pickled-fields')
+
+    def criteria(self, **kwargs):
+        return Criteria(resolution=datetime.timedelta(seconds=60),
+                        device=u'1', filterexpr='', **kwargs)
+
+    def test_job_criteria(self):
+        job = Job.create(self.table, self.criteria())
+        raw = (Job.objects.filter(id=job.id)
+               .values_list('criteria', flat=True)[0])
+        self.assertTrue(raw.startswith(FAST_PREFIX))
+
+        # Jobs stored with the previous encoding still load
+        Job.objects.filter(id=job.id).update(
+            criteria=dbsafe_encode(self.criteria()))
+        self.assertEqual(Job.objects.get(id=job.id).criteria.device, u'1')
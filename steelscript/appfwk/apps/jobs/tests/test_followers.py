@@ -0,0 +1,68 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import logging
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from steelscript.appfwk.apps.alerting.models import post_data_save
+from steelscript.appfwk.apps.datasource.models import Criteria
+from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.progress import progressd
+from steelscript.appfwk.apps.jobs.tests.test_refresh import LifecycleTable
+
+logger = logging.getLogger(__name__)
+
+
+class FollowerCompletionTest(TestCase):
+
+    def setUp(self):
+        progressd.reset()
+        self.senders = []
+        post_data_save.connect(self.on_data_save)
+
+    def tearDown(self):
+        post_data_save.disconnect(self.on_data_save)
+
+    def on_data_save(self, sender, **kwargs):
+        self.senders.append(sender.id)
+
+    def run_followers(self, count):
+        # A table per run, so the master is not a follower of a prior run
+        table = LifecycleTable.create('test-followers-%d' % count)
+        master = Job.create(table, Criteria())
+        followers = [Job.create(table, Criteria())
+                     for i in range(count)]
+        for f in followers:
+            self.assertEqual(f.master_id, master.id)
+
+        self.senders = []
+        with CaptureQueriesContext(connection) as queries:
+            master.start()
+
+        for f in followers:
+            f.refresh()
+            self.assertEqual(f.status, Job.COMPLETE)
+            self.assertEqual(f.actual_criteria, master.actual_criteria)
+            self.assertEqual(progressd.get(f.id, 'status'), Job.COMPLETE)
+            self.assertEqual(len(f.data()), 3)
+
+        # Only the master evaluates its data set
+        self.assertEqual(self.senders, [master.id])
+
+        return [q['sql'] for q in queries.captured_queries
+                if q['sql'].startswith('UPDATE')]
+
+    def test_bulk_update(self):
+        few = self.run_followers(2)
+        many = self.run_followers(20)
+        logger.info('Completing 2 followers ran %d updates, 20 ran %d' %
+                    (len(few), len(many)))
+
+        # Completing followers does not cost an UPDATE per follower
+        self.assertEqual(len(few), len(many))
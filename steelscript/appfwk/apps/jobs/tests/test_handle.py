@@ -0,0 +1,77 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import datetime
+
+import pytz
+from django.test import TestCase
+
+from steelscript.appfwk.apps.datasource.models import Criteria
+from steelscript.appfwk.apps.jobs.models import Job, handle_stats
+from steelscript.appfwk.apps.jobs.progress import progressd
+from steelscript.appfwk.apps.jobs.tests.test_refresh import LifecycleTable
+from steelscript.appfwk.libs import hashing
+
+
+class EncodeTest(TestCase):
+
+    def test_ordering(self):
+        a = dict((k, k.upper()) for k in 'abcdefgh')
+        b = dict((k, k.upper()) for k in reversed('abcdefgh'))
+        self.assertEqual(hashing.encode(a), hashing.encode(b))
+
+    def test_types(self):
+        self.assertNotEqual(hashing.encode(1), hashing.encode('1'))
+        self.assertNotEqual(hashing.encode(1), hashing.encode(True))
+        self.assertNotEqual(hashing.encode(['a', 'b']),
+                            hashing.encode(['ab']))
+        self.assertEqual(hashing.encode(u'abc'), hashing.encode('abc'))
+
+    def test_timezones(self):
+        utc = datetime.datetime(2015, 1, 1, 17, tzinfo=pytz.utc)
+        eastern = utc.astimezone(pytz.timezone('US/Eastern'))
+        self.assertEqual(hashing.encode(utc), hashing.encode(eastern))
+        self.assertNotEqual(hashing.encode(utc),
+                            hashing.encode(utc.replace(tzinfo=None)))
+
+    def test_snap_time(self):
+        t = datetime.datetime(2015, 1, 1, 12, 7, 33, 1234, tzinfo=pytz.utc)
+        self.assertEqual(hashing.snap_time(t, 300),
+                         datetime.datetime(2015, 1, 1, 12, 5,
+                                           tzinfo=pytz.utc))
+        self.assertEqual(hashing.snap_time(t, datetime.timedelta(hours=1)),
+                         datetime.datetime(2015, 1, 1, 12, tzinfo=pytz.utc))
+
+
+class HandleTest(TestCase):
+
+    def setUp(self):
+        progressd.reset()
+
+    def criteria(self, seconds):
+        end = datetime.datetime(2015, 1, 1, 12, 0, seconds, tzinfo=pytz.utc)
+        return Criteria(starttime=end - datetime.timedelta(hours=1),
+                        endtime=end, duration=datetime.timedelta(hours=1))
+
+    def test_exact(self):
+        table = LifecycleTable.create('test-handle-exact')
+        self.assertEqual(Job._compute_handle(table, self.criteria(10)),
+                         Job._compute_handle(table, self.criteria(10)))
+        self.assertNotEqual(Job._compute_handle(table, self.criteria(10)),
+                            Job._compute_handle(table, self.criteria(20)))
+
+    def test_bucket(self):
+        table = LifecycleTable.create('test-handle-bucket', cache_bucket=60)
+        self.assertEqual(Job._compute_handle(table, self.criteria(10)),
+                         Job._compute_handle(table, self.criteria(50)))
+
+    def test_stats(self):
+        table = LifecycleTable.create('test-handle-stats', cache_bucket=60)
+        before = dict(handle_stats)
+        Job.create(table, self.criteria(10))
+        Job.create(table, self.criteria(50))
+        self.assertEqual(handle_stats['misses'] - before['misses'], 1)
+        self.assertEqual(handle_stats['hits'] - before['hits'], 1)
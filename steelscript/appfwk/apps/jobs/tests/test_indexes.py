@@ -0,0 +1,31 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+from StringIO import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.tests.test_refresh import LifecycleTable
+
+
+class JobIndexTest(TestCase):
+
+    def test_jobtable(self):
+        LifecycleTable.create('test-jobtable')
+
+        out = StringIO()
+        call_command('jobtable', samples=5, populate=200, explain=True,
+                     stdout=out)
+        output = out.getvalue()
+
+        self.assertIn('get_master', output)
+        self.assertIn('present', output)
+        self.assertNotIn('MISSING', output)
+
+        # Rows added for timing are removed again
+        self.assertEqual(Job.objects.count(), 0)
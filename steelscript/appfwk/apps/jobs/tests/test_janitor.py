@@ -0,0 +1,84 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import os
+import datetime
+
+import pytz
+from django.conf import settings
+from django.test import TestCase
+
+from steelscript.appfwk.apps.datasource.models import Criteria
+from steelscript.appfwk.apps.jobs.janitor import Janitor
+from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.progress import progressd
+from steelscript.appfwk.apps.jobs.tests.test_refresh import LifecycleTable
+
+
+class JanitorTest(TestCase):
+
+    def setUp(self):
+        progressd.reset()
+        self.table = LifecycleTable.create('test-janitor')
+
+    def run_job(self, **criteria):
+        job = Job.create(self.table, Criteria(**criteria))
+        job.start()
+        return job
+
+    def age(self, jobs, days):
+        then = datetime.datetime.now(tz=pytz.utc) - datetime.timedelta(days)
+        Job.objects.filter(pk__in=[j.pk for j in jobs]).update(touched=then)
+
+    def test_age_jobs(self):
+        old = [self.run_job(n=i) for i in range(5)]
+        recent = self.run_job(n=10)
+        self.age(old, 2)
+
+        stats = Janitor(batch_size=2).age_jobs(datetime.timedelta(days=1),
+                                               datetime.timedelta(days=7))
+        self.assertEqual(stats['old'], 5)
+        self.assertEqual(list(Job.objects.values_list('pk', flat=True)),
+                         [recent.pk])
+        for job in old:
+            self.assertFalse(os.path.exists(job.datafile()))
+        self.assertTrue(os.path.exists(recent.datafile()))
+
+    def test_followers(self):
+        master = self.run_job(n=1)
+        follower = self.run_job(n=1)
+        self.assertEqual(follower.master_id, master.pk)
+        self.age([follower], 2)
+
+        Janitor().age_jobs(datetime.timedelta(days=1),
+                           datetime.timedelta(days=7))
+        self.assertFalse(Job.objects.filter(pk=follower.pk).exists())
+        master.refresh()
+        self.assertEqual(master.refcount, 0)
+        self.assertTrue(os.path.exists(master.datafile()))
+
+    def test_orphans(self):
+        job = self.run_job(n=1)
+        orphan = os.path.join(settings.DATA_CACHE, 'job-0123456789abcdef.data')
+        open(orphan, 'w').close()
+
+        self.assertEqual(Janitor().sweep_orphans(), 1)
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(job.datafile()))
+
+    def test_quota(self):
+        jobs = [self.run_job(n=i) for i in range(4)]
+        for i, job in enumerate(jobs):
+            self.age([job], 4 - i)
+        size = os.path.getsize(jobs[0].datafile())
+
+        # Room for two results, the two least recently used go.  Files
+        # left by other tests are orphans and removed first.
+        janitor = Janitor(quota_mb=(2.5 * size) / (1024 * 1024))
+        janitor.sweep_orphans()
+        self.assertEqual(janitor.enforce_quota(), 2)
+        self.assertEqual(set(Job.objects.values_list('pk', flat=True)),
+                         set([jobs[2].pk, jobs[3].pk]))
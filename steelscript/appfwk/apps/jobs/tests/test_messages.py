@@ -0,0 +1,52 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import pickle
+
+from django.test import TestCase
+
+from steelscript.appfwk.apps.datasource.models import Criteria
+from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.progress import progressd
+from steelscript.appfwk.apps.jobs.task.base import BaseTask
+from steelscript.appfwk.apps.jobs.tests.test_refresh import LifecycleTable
+from steelscript.appfwk.libs.fields import Callable
+
+
+class TaskMessageTest(TestCase):
+
+    def setUp(self):
+        progressd.reset()
+        self.table = LifecycleTable.create('test-task-message')
+        self.job = Job.create(self.table,
+                              Criteria(note='x' * 1000))
+        self.task = BaseTask(self.job,
+                             Callable(self.table.queryclass.run),
+                             priority=10)
+
+    def test_roundtrip(self):
+        message = self.task.to_message()
+        self.assertLess(len(pickle.dumps(message, -1)),
+                        len(pickle.dumps(self.task, -1)) / 2)
+
+        task = BaseTask.from_message(pickle.loads(pickle.dumps(message)))
+        self.assertEqual(task.job.id, self.job.id)
+        self.assertEqual(task.priority, 10)
+        self.assertEqual(task.callback.function, 'run')
+
+        # Recreating the task does not reference the job again
+        self.job.refresh(fields=['refcount'])
+        self.assertEqual(self.job.refcount, 1)
+
+        task.call_method()
+        self.job.refresh()
+        self.assertEqual(self.job.status, Job.COMPLETE)
+        self.assertEqual(self.job.refcount, 0)
+
+    def test_deleted_job(self):
+        message = self.task.to_message()
+        self.job.delete()
+        self.assertIsNone(BaseTask.from_message(message))
@@ -0,0 +1,99 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import time
+import logging
+import datetime
+
+import pytz
+import numpy
+import pandas
+from django.test import TestCase
+
+from steelscript.appfwk.apps.jobs.models import normalize_time
+
+logger = logging.getLogger(__name__)
+
+
+def legacy_normalize_time(s):
+    """Per-row time normalization used before normalize_time()."""
+    if str(s.dtype).startswith(str(pandas.np.dtype('datetime64'))):
+        pass
+    elif str(s.dtype).startswith('int'):
+        s = s.astype('datetime64[s]')
+    elif str(s.dtype).startswith('float'):
+        s = (1000 * s).astype('datetime64[ms]')
+    else:
+        s = s.astype('datetime64[ms]')
+
+    utc = pytz.utc
+    try:
+        s = s.apply(lambda x: x.tz_localize(utc))
+    except TypeError as e:
+        if e.message.startswith('Cannot localize'):
+            s = s.apply(lambda x: x.tz_convert(utc))
+    except AttributeError as e:
+        if e.message.startswith("'NaTType'"):
+            s = s.apply(lambda x: x.tz_convert(utc))
+    return s
+
+
+class NormalizeTimeTest(TestCase):
+
+    ROWS = 100000
+
+    def inputs(self, rows):
+        epoch = numpy.arange(1420070400, 1420070400 + rows, dtype='int64')
+        naive = pandas.Series(epoch).astype('datetime64[s]')
+        eastern = naive.dt.tz_localize(pytz.utc).dt.tz_convert('US/Eastern')
+        return {
+            'epoch-int': pandas.Series(epoch),
+            'epoch-float': pandas.Series(epoch + 0.25),
+            'naive': naive,
+            'aware': eastern,
+            'naive-objects': pandas.Series(
+                [datetime.datetime(2015, 1, 1, 0, 0, i % 60)
+                 for i in xrange(rows)], dtype=object),
+        }
+
+    def test_results(self):
+        for name, s in self.inputs(1000).iteritems():
+            expected = legacy_normalize_time(s)
+            result = normalize_time(s)
+            self.assertEqual(str(result.dtype), 'datetime64[ns, UTC]', name)
+            self.assertEqual(list(result), list(expected), name)
+
+    def test_nat(self):
+        s = pandas.Series([pandas.NaT, pandas.Timestamp('2015-01-01')])
+        result = normalize_time(s)
+        self.assertTrue(pandas.isnull(result[0]))
+        self.assertEqual(result[1], pandas.Timestamp('2015-01-01', tz='UTC'))
+
+    def test_mixed_objects(self):
+        s = pandas.Series([
+            datetime.datetime(2015, 1, 1, 12),
+            pandas.Timestamp('2015-01-01 07:00', tz='US/Eastern'),
+            None])
+        result = normalize_time(s)
+        self.assertEqual(list(result[:2]),
+                         [pandas.Timestamp('2015-01-01 12:00', tz='UTC')] * 2)
+        self.assertTrue(pandas.isnull(result[2]))
+
+    def test_benchmark(self):
+        for name, s in self.inputs(self.ROWS).iteritems():
+            start = time.time()
+            expected = legacy_normalize_time(s)
+            legacy = time.time() - start
+
+            start = time.time()
+            result = normalize_time(s)
+            vectorized = time.time() - start
+
+            logger.info('normalize_time %s, %d rows: legacy %.3fs, '
+                        'vectorized %.3fs, %.1fx' %
+                        (name, self.ROWS, legacy, vectorized,
+                         legacy / max(vectorized, 1e-6)))
+            self.assertEqual(list(result), list(expected), name)
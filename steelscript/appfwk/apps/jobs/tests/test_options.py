@@ -0,0 +1,67 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import logging
+
+from django.test import TestCase
+
+from steelscript.appfwk.apps.datasource.models import \
+    Table, queryclasses, clear_table_cache
+from steelscript.appfwk.apps.jobs.progress import progressd
+from steelscript.appfwk.apps.jobs.tests.test_refresh import \
+    LifecycleTable, LifecycleQuery
+from steelscript.appfwk.libs import fields
+
+logger = logging.getLogger(__name__)
+
+
+class TableCacheTest(TestCase):
+
+    def setUp(self):
+        progressd.reset()
+        self.table = LifecycleTable.create('test-table-cache',
+                                           cache_bucket=60)
+
+    def test_options_shared(self):
+        first = Table.objects.get(id=self.table.id)
+        second = Table.objects.get(id=self.table.id)
+        self.assertEqual(first.options.cache_bucket, 60)
+        self.assertEqual(first.options, second.options)
+
+        # Each instance gets its own copy of the decoded value
+        self.assertIsNot(first.options, second.options)
+        first.options['cache_bucket'] = 120
+        self.assertEqual(second.options.cache_bucket, 60)
+        self.assertEqual(
+            Table.objects.get(id=self.table.id).options.cache_bucket, 60)
+
+        # Decoded again after a change
+        first.criteria = {'resolution': 60}
+        first.save()
+        third = Table.objects.get(id=self.table.id)
+        self.assertEqual(third.criteria, {'resolution': 60})
+        self.assertNotEqual(second.criteria, third.criteria)
+
+    def test_fields_not_shared(self):
+        # Equal values of different fields are decoded separately
+        self.table.options = {}
+        self.table.criteria = {}
+        self.table.save()
+        table = Table.objects.get(id=self.table.id)
+        table.options['a'] = 1
+        self.assertEqual(table.criteria, {})
+        self.assertEqual(Table.objects.get(id=self.table.id).criteria, {})
+
+    def test_clear(self):
+        table = Table.objects.get(id=self.table.id)
+        self.assertIs(table.queryclass, LifecycleQuery)
+        self.assertIn((table.module, table.queryclassname), queryclasses)
+        self.assertTrue(fields.decoded_values)
+
+        clear_table_cache()
+        self.assertEqual(queryclasses, {})
+        self.assertEqual(fields.decoded_values, {})
+        self.assertIs(table.queryclass, LifecycleQuery)
@@ -0,0 +1,71 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import time
+import logging
+
+from mock import patch
+from django.test import TransactionTestCase
+
+from steelscript.appfwk.apps.datasource.models import Criteria
+from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.progress import progressd
+from steelscript.appfwk.apps.jobs.task import process
+from steelscript.appfwk.apps.jobs.tests.test_fanin import FanoutTable
+from steelscript.appfwk.apps.jobs.tests.test_refresh import LifecycleTable
+from steelscript.appfwk.project import locks
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessPoolTest(TransactionTestCase):
+    """Run a fan-out of child jobs through the process pool.
+
+    Children finish in different workers at the same time, so the
+    parent is only completed once if child_done and mark_done hold
+    their locks across processes.
+    """
+
+    CHILDREN = 16
+    WORKERS = 4
+    TIMEOUT = 60
+
+    def setUp(self):
+        if not locks.shared_between_processes():
+            # Workers could not open an in-memory test database anyway
+            self.skipTest('Process pool needs a database file')
+
+        progressd.reset()
+        LifecycleTable.create('test-process-child')
+        self.pool = process.ProcessPool(self.WORKERS)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_fanout(self):
+        table = FanoutTable.create('test-process-fanout',
+                                   children=self.CHILDREN,
+                                   child_table='test-process-child')
+
+        with patch.object(process, 'pool', self.pool), \
+                patch('steelscript.appfwk.apps.jobs.models.Task',
+                      process.ProcessTask):
+            job = Job.create(table, Criteria())
+            job.start()
+
+            end = time.time() + self.TIMEOUT
+            while not job.done() and time.time() < end:
+                time.sleep(0.1)
+                job.refresh()
+
+        self.assertEqual(job.status, Job.COMPLETE)
+        self.assertEqual(job.pending_children, 0)
+        self.assertEqual(len(job.data()), self.CHILDREN * 3)
+
+        children = Job.objects.filter(parent=job)
+        self.assertEqual(len(children), self.CHILDREN)
+        self.assertTrue(all(c.status == Job.COMPLETE for c in children))
+        self.assertGreater(len(set(c.pid for c in children)), 1)
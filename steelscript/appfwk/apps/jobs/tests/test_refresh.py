@@ -0,0 +1,77 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import logging
+
+import pandas
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from steelscript.appfwk.apps.datasource.models import \
+    DatasourceTable, DatasourceQuery, Criteria
+from steelscript.appfwk.apps.jobs import QueryComplete
+from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.progress import progressd
+
+logger = logging.getLogger(__name__)
+
+
+class LifecycleTable(DatasourceTable):
+    class Meta:
+        proxy = True
+
+    _query_class = 'LifecycleQuery'
+
+    def post_process_table(self, field_options):
+        self.add_column('key', 'Key', iskey=True)
+        self.add_column('value', 'Value')
+
+
+class LifecycleQuery(DatasourceQuery):
+
+    def run(self):
+        return QueryComplete(pandas.DataFrame({'key': [1, 2, 3],
+                                               'value': [10, 20, 30]}))
+
+
+class JobRefreshTest(TestCase):
+
+    # Upper bound on queries for creating and running one job, to catch
+    # regressions such as a refresh touching the whole job table
+    MAX_QUERIES = 60
+
+    def setUp(self):
+        progressd.reset()
+        self.table = LifecycleTable.create('test-job-lifecycle')
+
+    def test_refresh_fields(self):
+        job = Job.create(self.table, Criteria())
+        Job.objects.filter(pk=job.pk).update(message='changed', refcount=5)
+
+        job.refresh(fields=['message'])
+        self.assertEqual(job.message, 'changed')
+        self.assertEqual(job.refcount, 0)
+
+        job.refresh()
+        self.assertEqual(job.refcount, 5)
+
+    def test_lifecycle_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            job = Job.create(self.table, Criteria())
+            job.start()
+            self.assertTrue(job.done())
+
+        self.assertEqual(job.status, Job.COMPLETE)
+        self.assertEqual(len(job.data()), 3)
+
+        statements = [q['sql'] for q in queries.captured_queries]
+        logger.info('Job lifecycle ran %d queries' % len(statements))
+
+        unbounded = [s for s in statements
+                     if s.startswith('UPDATE') and 'WHERE' not in s]
+        self.assertEqual(unbounded, [])
+        self.assertLessEqual(len(statements), self.MAX_QUERIES)
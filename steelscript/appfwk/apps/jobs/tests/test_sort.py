@@ -0,0 +1,84 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import time
+import logging
+
+import pytz
+import numpy
+import pandas
+from django.test import TestCase
+
+from steelscript.appfwk.apps.jobs.models import sort_rows
+
+logger = logging.getLogger(__name__)
+
+
+def full_sort_rows(df, sortcols, ascending, rows):
+    """Full sort then slice, as done before sort_rows()."""
+    sorted = df.sort_values(sortcols, ascending=ascending, kind='mergesort')
+    n = sortcols[0]
+    df = sorted[sorted[n].notnull()].append(sorted[sorted[n].isnull()])
+    if rows > 0:
+        df = df[:rows]
+    return df
+
+
+class SortRowsTest(TestCase):
+
+    ROWS = 1000000
+
+    def data(self, rows):
+        rs = numpy.random.RandomState(0)
+        value = rs.randint(0, 50, rows).astype(float)
+        value[rs.rand(rows) < 0.1] = numpy.nan
+        times = pandas.to_datetime(rs.randint(0, 1000, rows), unit='s')
+        return pandas.DataFrame({
+            'value': value,
+            'rate': rs.rand(rows),
+            'count': rs.randint(0, 5, rows),
+            'time': times.tz_localize(pytz.utc),
+            'name': ['host%d' % i for i in rs.randint(0, 100, rows)]})
+
+    def assertSameRows(self, df, sortcols, ascending, rows):
+        expected = full_sort_rows(df, sortcols, ascending, rows)
+        result = sort_rows(df, sortcols, ascending, rows)
+        self.assertEqual(list(result.index), list(expected.index),
+                         (sortcols, ascending, rows))
+
+    def test_results(self):
+        df = self.data(10000)
+        for sortcols in (['value'], ['value', 'rate'], ['count', 'rate'],
+                         ['time', 'value'], ['name', 'value'], ['rate']):
+            for asc in (True, False):
+                ascending = [asc] + [not asc] * (len(sortcols) - 1)
+                for rows in (0, 1, 10, 100, 9990, 20000):
+                    self.assertSameRows(df, sortcols, ascending, rows)
+
+    def test_nan_fill(self):
+        # Fewer non-null values than rows, NaN rows fill the limit
+        df = self.data(1000)
+        df['value'] = numpy.nan
+        df.loc[:3, 'value'] = 1
+        for rows in (2, 4, 10):
+            self.assertSameRows(df, ['value', 'rate'], [False, True], rows)
+
+    def test_benchmark(self):
+        df = self.data(self.ROWS)
+        for rows in (10, 100):
+            start = time.time()
+            full_sort_rows(df, ['rate'], [False], rows)
+            full = time.time() - start
+
+            start = time.time()
+            sort_rows(df, ['rate'], [False], rows)
+            partial = time.time() - start
+
+            logger.info('sort_rows top %d of %d rows: full sort %.3fs, '
+                        'partial %.3fs, %.1fx' %
+                        (rows, self.ROWS, full, partial,
+                         full / max(partial, 1e-6)))
+            self.assertLess(partial, full)
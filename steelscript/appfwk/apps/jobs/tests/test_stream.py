@@ -0,0 +1,125 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import logging
+
+import pandas
+from django.test import TestCase
+
+from steelscript.appfwk.apps.datasource.models import \
+    DatasourceTable, DatasourceQuery, Criteria, Table
+from steelscript.appfwk.apps.jobs import QueryStream
+from steelscript.appfwk.apps.jobs.datastore import datastore
+from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.progress import progressd
+
+logger = logging.getLogger(__name__)
+
+CHUNK = 10
+
+
+class StreamTable(DatasourceTable):
+    class Meta:
+        proxy = True
+
+    TABLE_OPTIONS = {'chunks': 10,
+                     'fail_at': None,
+                     'cancel_at': None}
+
+    _query_class = 'StreamQuery'
+
+    def post_process_table(self, field_options):
+        self.add_column('key', 'Key', iskey=True, datatype='integer')
+        self.add_column('value', 'Value', datatype='integer')
+
+
+def chunk(i):
+    keys = range(i * CHUNK, (i + 1) * CHUNK)
+    # Spread the largest values over all chunks
+    return pandas.DataFrame({'key': keys,
+                             'value': [(k * 37) % 100 for k in keys]})
+
+
+class StreamQuery(DatasourceQuery):
+
+    # Number of chunks produced, and whether the stream was closed,
+    # by job id
+    produced = {}
+    closed = set()
+
+    def run(self):
+        return QueryStream(self.chunks())
+
+    def chunks(self):
+        options = self.table.options
+        try:
+            for i in range(options.chunks):
+                if i == options.fail_at:
+                    raise ValueError('Chunk %d failed' % i)
+                if i == options.cancel_at:
+                    self.job.cancel()
+                StreamQuery.produced[self.job.id] = i + 1
+                yield chunk(i)
+        finally:
+            StreamQuery.closed.add(self.job.id)
+
+
+class QueryStreamTest(TestCase):
+
+    def setUp(self):
+        progressd.reset()
+
+    def run_stream(self, name, **kwargs):
+        table = StreamTable.create(name, **kwargs)
+        job = Job.create(table, Criteria())
+        job.start()
+        job.refresh()
+        self.assertIn(job.id, StreamQuery.closed)
+        return job
+
+    def full(self, chunks=10):
+        return pandas.concat([chunk(i) for i in range(chunks)],
+                             ignore_index=True)
+
+    def test_stream(self):
+        job = self.run_stream('test-stream-all')
+        self.assertEqual(job.status, Job.COMPLETE)
+        self.assertEqual(StreamQuery.produced[job.id], 10)
+        self.assertEqual(list(job.data()['key']), list(self.full()['key']))
+
+    def test_topk(self):
+        job = self.run_stream('test-stream-topk', rows=5,
+                              sortcols=['value'], sortdir=[Table.SORT_DESC])
+        self.assertEqual(job.status, Job.COMPLETE)
+
+        # The top rows come from several chunks, all of them are read
+        self.assertEqual(StreamQuery.produced[job.id], 10)
+        expected = self.full().sort_values('value', ascending=False)[:5]
+        self.assertEqual(list(job.data()['value']), [99, 98, 97, 96, 95])
+        self.assertEqual(list(job.data()['key']), list(expected['key']))
+
+    def test_unsorted_limit(self):
+        job = self.run_stream('test-stream-unsorted', rows=15)
+        self.assertEqual(job.status, Job.COMPLETE)
+
+        # Reading stops once the first rows are known
+        self.assertEqual(StreamQuery.produced[job.id], 2)
+        self.assertEqual(list(job.data()['key']), range(15))
+
+    def test_error(self):
+        job = self.run_stream('test-stream-error', fail_at=3)
+        self.assertEqual(job.status, Job.ERROR)
+        self.assertIn('Chunk 3 failed', job.message)
+        self.assertIsNone(datastore.find(job.handle))
+
+    def test_cancel(self):
+        job = self.run_stream('test-stream-cancel', cancel_at=2)
+        self.assertEqual(job.status, Job.ERROR)
+        self.assertTrue(job.cancelled)
+
+        # Nothing more is read or saved once the job is cancelled
+        self.assertEqual(StreamQuery.produced[job.id], 3)
+        self.assertIsNone(datastore.find(job.handle))
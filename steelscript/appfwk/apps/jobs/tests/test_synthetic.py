@@ -0,0 +1,171 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import time
+import logging
+import tokenize
+from StringIO import StringIO
+
+import numpy
+import pandas
+from django.test import TestCase
+from mock import patch
+
+from steelscript.appfwk.apps.datasource.models import \
+    DatasourceTable, Column, Criteria, compiled_expressions
+from steelscript.appfwk.apps.datasource import synthetic
+from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.progress import progressd
+
+logger = logging.getLogger(__name__)
+
+
+def legacy_compute(df, expr, col_names, criteria):
+    """Evaluate `expr` the way compute_synthetic did before compiling."""
+    newexpr = ''
+    getvalue = False
+    getclose = False
+    g = tokenize.generate_tokens(StringIO(expr).readline)
+    for ttype, tvalue, _, _, _ in g:
+        if getvalue:
+            if tvalue in col_names:
+                newexpr += "df['%s']" % tvalue
+            else:
+                newexpr += '"%s"' % str(criteria.get(tvalue))
+            getclose = True
+            getvalue = False
+        elif getclose:
+            getclose = False
+        elif ttype == tokenize.OP and tvalue == '{':
+            getvalue = True
+        else:
+            newexpr += tvalue
+        newexpr += ' '
+    return eval(newexpr, {'pandas': pandas}, {'df': df})
+
+
+class WideTable(DatasourceTable):
+    class Meta:
+        proxy = True
+
+    TABLE_OPTIONS = {'values': 10,
+                     'synthetic': 20}
+
+    def post_process_table(self, field_options):
+        self.add_column('key', 'Key', iskey=True)
+        values = self.options.values
+        for i in range(values):
+            self.add_column('v%d' % i, 'Value %d' % i)
+
+        # Mix of arithmetic expressions and function calls
+        for i in range(self.options.synthetic):
+            a, b = i % values, (i * 7 + 3) % values
+            if i % 4 == 3:
+                expr = '{v%d}.clip(0, 500) + {v%d}.mean()' % (a, b)
+            else:
+                expr = '({v%d} * 2 - {v%d}) / ({v%d} + 1)' % (a, b, b)
+            self.add_column('s%d' % i, synthetic=True,
+                            compute_expression=expr)
+
+
+class SignedTable(DatasourceTable):
+    class Meta:
+        proxy = True
+
+    EXPRESSIONS = ['{a} % {b}', '{a} // {b}', '{a} ** {c}', '-{a} / {b}',
+                   '{a} * 2 - {b} + 1', '{a} < {b}']
+
+    def post_process_table(self, field_options):
+        self.add_column('key', 'Key', iskey=True)
+        for name in 'abc':
+            self.add_column(name, name.upper())
+        for i, expr in enumerate(self.EXPRESSIONS):
+            self.add_column('s%d' % i, synthetic=True,
+                            compute_expression=expr)
+
+
+class SyntheticTest(TestCase):
+
+    def setUp(self):
+        progressd.reset()
+
+    def make_frame(self, table, rows):
+        values = table.options.values
+        data = numpy.random.RandomState(1).randint(0, 1000,
+                                                   (rows, values))
+        df = pandas.DataFrame(data.astype(float),
+                              columns=['v%d' % i for i in range(values)])
+        df['key'] = numpy.arange(rows)
+        return df
+
+    def compute(self, table, rows):
+        job = Job.create(table, Criteria())
+        df = self.make_frame(table, rows)
+        start = time.time()
+        result = table.compute_synthetic(job, df.copy())
+        return df, result, time.time() - start
+
+    def test_results(self):
+        table = WideTable.create('test-synthetic-wide')
+        df, result, _ = self.compute(table, 1000)
+
+        names = [c.name for c in table.get_columns()]
+        for col in table.get_columns(synthetic=True):
+            expected = legacy_compute(df, col.compute_expression, names, {})
+            df[col.name] = expected
+            numpy.testing.assert_allclose(result[col.name], expected)
+
+    def test_invalidate_on_save(self):
+        table = WideTable.create('test-synthetic-save', values=2,
+                                 synthetic=1)
+        col = Column.objects.get(table=table, name='s0')
+        self.assertIs(col.compiled_expression(), col.compiled_expression())
+
+        col.compute_expression = '{v0} + {v1}'
+        col.save()
+        self.assertNotIn(col.pk, compiled_expressions)
+
+        _, result, _ = self.compute(table, 10)
+        numpy.testing.assert_allclose(result['s0'],
+                                      result['v0'] + result['v1'])
+
+    def test_benchmark(self):
+        table = WideTable.create('test-synthetic-bench', values=50,
+                                 synthetic=200)
+        rows = 20000
+        df, _, compiled_secs = self.compute(table, rows)
+
+        names = [c.name for c in table.get_columns()]
+        start = time.time()
+        for col in table.get_columns(synthetic=True):
+            df[col.name] = legacy_compute(df, col.compute_expression,
+                                          names, {})
+        legacy_secs = time.time() - start
+
+        logger.info('%d synthetic columns over %d rows: compiled %.3fs '
+                    '(engine %s), tokenized %.3fs' %
+                    (200, rows, compiled_secs, synthetic.VECTORIZED_ENGINE,
+                     legacy_secs))
+
+    def test_vectorized_matches_python(self):
+        table = SignedTable.create('test-synthetic-signed')
+        df = pandas.DataFrame({'key': range(4),
+                               'a': [-1, 1, -1, 0],
+                               'b': [3, 2, -2, 5],
+                               'c': [2, 3, 1, 0]})
+
+        vectorized = [c.name for c in table.get_columns(synthetic=True)
+                      if c.compiled_expression().vectorized]
+        self.assertEqual(vectorized, ['s3', 's4', 's5'])
+
+        job = Job.create(table, Criteria())
+        python = table.compute_synthetic(job, df.copy())
+        with patch.object(synthetic, 'VECTORIZED_MIN_ROWS', 1):
+            result = table.compute_synthetic(job, df.copy())
+
+        for name in ['s%d' % i for i in range(len(table.EXPRESSIONS))]:
+            numpy.testing.assert_allclose(result[name], python[name])
+        self.assertEqual(list(result['s0']), [2, 1, -1, 0])
@@ -0,0 +1,165 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import os
+import logging
+import threading
+
+from mock import patch
+from django.test import TestCase
+
+from steelscript.appfwk.apps.datasource.models import Criteria
+from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.progress import progressd
+from steelscript.appfwk.apps.jobs.task import threadpool
+from steelscript.appfwk.apps.jobs.task.base import \
+    PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from steelscript.appfwk.apps.jobs.tests.test_refresh import LifecycleTable
+
+logger = logging.getLogger(__name__)
+
+
+class PoolJob(object):
+    def __init__(self, id):
+        self.id = id
+
+
+class PoolTask(object):
+    """Task recording the order it ran in, optionally blocking."""
+
+    def __init__(self, name, ran, priority=PRIORITY_INTERACTIVE,
+                 continuation=False, job_id=0, gate=None):
+        self.name = name
+        self.ran = ran
+        self.priority = priority
+        self.continuation = continuation
+        self.job = PoolJob(job_id)
+        self.gate = gate
+        self.started = threading.Event()
+        self.done = threading.Event()
+
+    def call_method(self):
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(10)
+        self.ran.append(self.name)
+        self.done.set()
+
+
+class ThreadPoolTest(TestCase):
+
+    def setUp(self):
+        self.ran = []
+        self.gate = threading.Event()
+
+    def tearDown(self):
+        self.gate.set()
+
+    def run_ordered(self, tasks):
+        """Run `tasks` on a single thread, queued behind a blocked one."""
+        pool = threadpool.ThreadPool(1)
+        blocker = PoolTask('blocker', self.ran, gate=self.gate)
+        pool.submit(blocker)
+        self.assertTrue(blocker.started.wait(10))
+
+        for task in tasks:
+            pool.submit(task)
+        self.gate.set()
+        for task in tasks:
+            self.assertTrue(task.done.wait(10))
+        return self.ran[1:]
+
+    def test_priority(self):
+        order = self.run_ordered([
+            PoolTask('background-1', self.ran, PRIORITY_BACKGROUND),
+            PoolTask('interactive-1', self.ran, PRIORITY_INTERACTIVE),
+            PoolTask('background-2', self.ran, PRIORITY_BACKGROUND),
+            PoolTask('interactive-2', self.ran, PRIORITY_INTERACTIVE)])
+        self.assertEqual(order, ['interactive-1', 'interactive-2',
+                                 'background-1', 'background-2'])
+
+    def test_continuation_first(self):
+        order = self.run_ordered([
+            PoolTask('query-1', self.ran),
+            PoolTask('callback-1', self.ran, continuation=True),
+            PoolTask('query-2', self.ran),
+            PoolTask('callback-2', self.ran, continuation=True),
+            PoolTask('background', self.ran, PRIORITY_BACKGROUND,
+                     continuation=True)])
+        self.assertEqual(order, ['callback-1', 'callback-2',
+                                 'query-1', 'query-2', 'background'])
+
+    def test_bound(self):
+        pool = threadpool.ThreadPool(2)
+        tasks = [PoolTask('task-%d' % i, self.ran, job_id=i, gate=self.gate)
+                 for i in range(6)]
+        for task in tasks:
+            pool.submit(task)
+        self.assertTrue(tasks[0].started.wait(10))
+        self.assertTrue(tasks[1].started.wait(10))
+
+        stats = pool.stats()
+        self.assertEqual(stats['threads'], 2)
+        self.assertEqual(stats['active'], 2)
+        self.assertEqual(stats['queued'], 4)
+        self.assertTrue(pool.has_jobs([5]))
+
+        self.gate.set()
+        for task in tasks:
+            self.assertTrue(task.done.wait(10))
+        self.assertEqual(len(pool.threads), 2)
+        self.assertEqual(sorted(self.ran), sorted(t.name for t in tasks))
+
+        # Counts are dropped once the last task of a job is done
+        for i in range(10):
+            if pool.stats()['completed'] == 6:
+                break
+            tasks[-1].done.wait(0.1)
+        self.assertFalse(pool.has_jobs(range(6)))
+
+
+class ThreadPoolValidateTest(TestCase):
+
+    def setUp(self):
+        progressd.reset()
+        self.table = LifecycleTable.create('test-threadpool-validate')
+        self.pool = threadpool.ThreadPool(1)
+        self.gate = threading.Event()
+
+    def tearDown(self):
+        self.gate.set()
+
+    def job(self, status, **kwargs):
+        job = Job.create(self.table, Criteria(**kwargs))
+        Job.objects.filter(id=job.id).update(status=status,
+                                             pid=os.getpid())
+        job.refresh()
+        return job
+
+    def validate(self, job):
+        with patch.object(threadpool, 'pool', self.pool):
+            return threadpool.ThreadPoolTask.validate_jobs([job]) == [job]
+
+    def test_validate(self):
+        self.assertTrue(self.validate(self.job(Job.NEW, n=1)))
+        self.assertTrue(self.validate(self.job(Job.COMPLETE, n=2)))
+
+        # Running in this process but unknown to the pool
+        job = self.job(Job.RUNNING, n=3)
+        self.assertFalse(self.validate(job))
+
+        task = PoolTask('running', [], job_id=job.id, gate=self.gate)
+        self.pool.submit(task)
+        self.assertTrue(task.started.wait(10))
+        self.assertTrue(self.validate(job))
+
+        # Waiting on a child running in the pool
+        parent = self.job(Job.RUNNING, n=4)
+        Job.objects.filter(id=job.id).update(parent=parent)
+        self.assertTrue(self.validate(parent))
+
+        self.gate.set()
+        self.assertTrue(task.done.wait(10))
@@ -0,0 +1,96 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import logging
+import datetime
+
+import pytz
+import numpy
+import pandas
+from django.test import TestCase
+
+from steelscript.appfwk.apps.datasource.models import \
+    DatasourceTable, DatasourceQuery, Criteria
+from steelscript.appfwk.apps.jobs import QueryComplete
+from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.progress import progressd
+
+logger = logging.getLogger(__name__)
+
+T0 = 1420113600     # 2015-01-01 12:00 UTC
+
+
+class ValuesTable(DatasourceTable):
+    class Meta:
+        proxy = True
+
+    _query_class = 'ValuesQuery'
+
+    def post_process_table(self, field_options):
+        self.add_column('time', 'Time', datatype='time', iskey=True)
+        self.add_column('key', 'Key', datatype='string', iskey=True)
+        self.add_column('value', 'Value')
+        self.add_column('count', 'Count', datatype='integer')
+
+
+class ValuesQuery(DatasourceQuery):
+
+    def run(self):
+        return QueryComplete(pandas.DataFrame(
+            {'time': [T0, T0 + 60, T0 + 120],
+             'key': ['a', None, 'c'],
+             'value': [1.5, numpy.nan, 3.5],
+             'count': [1, 2, 3]}))
+
+
+class JobValuesTest(TestCase):
+
+    def setUp(self):
+        progressd.reset()
+        table = ValuesTable.create('test-job-values')
+        self.job = Job.create(table, Criteria())
+        self.job.start()
+        self.assertEqual(self.job.status, Job.COMPLETE)
+
+    def test_column_values(self):
+        cv = self.job.column_values()
+        self.assertEqual(cv.keys(), ['time', 'key', 'value', 'count'])
+        self.assertEqual(cv['key'], ['a', None, 'c'])
+        self.assertEqual(cv['value'], [1.5, None, 3.5])
+        self.assertEqual(cv['count'], [1, 2, 3])
+        self.assertTrue(all(type(v) is int for v in cv['count']))
+
+        t = cv['time'][0]
+        self.assertIsInstance(t, datetime.datetime)
+        self.assertEqual(t, datetime.datetime(2015, 1, 1, 12, 0,
+                                              tzinfo=pytz.utc))
+
+    def test_column_values_options(self):
+        cv = self.job.column_values(na_value='None')
+        self.assertEqual(cv['key'], ['a', 'None', 'c'])
+        self.assertEqual(cv['value'], [1.5, 'None', 3.5])
+
+        cv = self.job.column_values(columns=['value', 'key'], rows=2)
+        self.assertEqual(cv.keys(), ['value', 'key'])
+        self.assertEqual(cv['key'], ['a', None])
+
+        cv = self.job.column_values(rows=0)
+        self.assertEqual(cv['count'], [])
+
+    def test_values(self):
+        rows = self.job.values()
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1][1:], ['None', 'None', 2])
+        self.assertEqual(rows[0][0],
+                         datetime.datetime(2015, 1, 1, 12, 0,
+                                           tzinfo=pytz.utc))
+
+        self.assertEqual(len(self.job.values(rows=1)), 1)
+
+    def test_values_columns(self):
+        rows = self.job.values(rows=2, columns=set(['key', 'count']))
+        self.assertEqual(rows, [['None', 'a', 'None', 1],
+                                ['None', 'None', 'None', 2]])
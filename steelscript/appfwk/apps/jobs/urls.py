@@ -20,10 +20,18 @@ urlpatterns = patterns(
         views.JobVisualize.as_view(),
         name='job-visualize'),
 
+    url(r'^stats/$',
+        views.JobStats.as_view(),
+        name='job-stats'),
+
     url(r'^(?P<pk>[0-9]+)/$',
         views.JobDetail.as_view(),
         name='job-detail'),
 
+    url(r'^(?P<pk>[0-9]+)/cancel/$',
+        views.JobCancel.as_view(),
+        name='job-cancel'),
+
     url(r'^(?P<pk>[0-9]+)/data/$',
         views.JobDetailData.as_view(),
         name='job-detail-data'),
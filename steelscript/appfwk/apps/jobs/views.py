@@ -20,8 +20,11 @@ from rest_framework.response import Response
 from rest_framework.renderers import JSONRenderer, TemplateHTMLRenderer
 from rest_framework_csv.renderers import CSVRenderer
 
-from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.models import Job, handle_stats
 from steelscript.appfwk.apps.jobs import serializers
+from steelscript.appfwk.apps.jobs.task import Task
+from steelscript.appfwk.apps.jobs.task.base import PRIORITY_BACKGROUND
+from steelscript.appfwk.apps.jobs.cache import dfcache
 
 logger = logging.getLogger(__name__)
 
@@ -38,7 +41,7 @@ class JobList(generics.ListAPIView):
 
     def post_save(self, obj, created=False):
         if created:
-            obj.start()
+            obj.start(priority=PRIORITY_BACKGROUND)
 
 
 class JobVisualize(views.APIView):
@@ -65,11 +68,34 @@ class JobVisualize(views.APIView):
         )
 
 
+class JobStats(views.APIView):
+    """Task queue, job reuse and job data cache counters."""
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({'task_model': settings.APPFWK_TASK_MODEL,
+                         'tasks': Task.stats(),
+                         'handles': dict(handle_stats),
+                         'datacache': dfcache.stats()})
+
+
 class JobDetail(generics.RetrieveAPIView):
     model = Job
     serializer_class = serializers.JobDetailSerializer
 
 
+class JobCancel(views.APIView):
+    """Cancel a job and its children."""
+    permission_classes = (IsAdminUser,)
+
+    def post(self, request, pk):
+        try:
+            job = Job.objects.get(pk=pk)
+        except Job.DoesNotExist:
+            raise Http404
+        return Response({'cancelled': job.cancel()})
+
+
 class JobDetailData(generics.RetrieveAPIView):
     model = Job
     serializer_class = serializers.JobDataSerializer
@@ -97,7 +123,7 @@ class JobDetailData(generics.RetrieveAPIView):
 
             # map the label names to data source columns
             names = dict((col.name, col.label) for col in columns)
-            df.rename(columns=lambda c: names.get(c, c), inplace=True)
+            df = df.rename(columns=lambda c: names.get(c, c))
 
         elif request.accepted_renderer.format == 'json':
             content_type = 'application/json'
@@ -36,7 +36,7 @@ class WhoisQuery(AnalysisQuery):
 
     def analyze(self, jobs):
         """ Return a data frame that simply adds a whois link for each IP. """
-        df = jobs['t'].data()
+        df = jobs['t'].data().copy()
         df['whois'] = df['host_ip'].map(make_whois_link)
         return QueryComplete(df)
 
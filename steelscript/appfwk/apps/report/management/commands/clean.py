@@ -20,7 +20,9 @@ from django.conf import settings
 from steelscript.appfwk.apps.jobs.models import Job
 from steelscript.appfwk.apps.report.models import Report, WidgetJob
 from steelscript.appfwk.apps.datasource.models import (Table, TableField,
-                                                       Column)
+                                                       Column,
+                                                       clear_column_cache,
+                                                       clear_table_cache)
 from steelscript.appfwk.apps.alerting.models import (Destination, TriggerCache,
                                                      ErrorHandlerCache)
 
@@ -159,6 +161,8 @@ class Command(BaseCommand):
         # clear model caches
         TriggerCache.clear()
         ErrorHandlerCache.clear()
+        clear_column_cache()
+        clear_table_cache()
 
         # rotate the logs once
         management.call_command('rotate_logs')
@@ -13,6 +13,7 @@ import logging
 from django.core.management.base import BaseCommand
 
 from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.task.base import PRIORITY_BACKGROUND
 from steelscript.appfwk.apps.datasource.models import Table
 from steelscript.appfwk.apps.datasource.forms import TableFieldForm
 from steelscript.appfwk.apps.report.models import Report, Widget
@@ -212,7 +213,7 @@ class Command(BaseCommand):
             self.console('Criteria: %s' % criteria.print_details())
 
             start_time = datetime.datetime.now()
-            job.start()
+            job.start(priority=PRIORITY_BACKGROUND)
             self.console('Job running . . ', ending='')
 
             # wait for results
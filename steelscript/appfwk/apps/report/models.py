@@ -26,7 +26,8 @@ from steelscript.appfwk.apps.jobs.models import Job
 from steelscript.common.datastructures import JsonDict
 from steelscript.appfwk.project.utils import (get_module, get_module_name,
                                               get_sourcefile, get_namespace)
-from steelscript.appfwk.apps.datasource.models import Table, TableField
+from steelscript.appfwk.apps.datasource.models import \
+    Table, TableField, register_column_consumer
 from steelscript.appfwk.libs.fields import \
     PickledObjectField, SeparatedValuesField
 from steelscript.appfwk.apps.preferences.models import AppfwkUser
@@ -288,7 +289,7 @@ class ReportHistory(models.Model):
     last_run = models.DateTimeField()
     job_handles = models.TextField()
     user = models.CharField(max_length=50)
-    criteria = PickledObjectField()
+    criteria = PickledObjectField(fast=True)
     run_count = models.IntegerField()
 
     status_choices = ((ReportStatus.NEW, "New"),
@@ -693,6 +694,32 @@ class Widget(models.Model):
     def table(self, i=0):
         return self.tables.all()[i]
 
+    def consumed_columns(self, table):
+        """ Return the names of the columns of `table` this widget reads.
+
+        Returns None unless the widget options list the columns shown.
+        Other options naming columns of the table, such as the key or
+        series column, and the key columns are included.
+
+        """
+        options = self.options or {}
+        columns = options.get('columns')
+        if not columns or columns == '*' or options.get('dynamic'):
+            return None
+
+        names = set(c.name for c in table.get_columns())
+        consumed = set(columns)
+        for value in options.values():
+            if isinstance(value, basestring):
+                value = [value]
+            elif not isinstance(value, (list, tuple)):
+                continue
+            consumed.update(v for v in value
+                            if isinstance(v, basestring) and v in names)
+
+        consumed.update(c.name for c in table.get_columns(iskey=True))
+        return consumed
+
     def compute_row_col(self):
         rowmax = self.section.report.widgets().aggregate(Max('row'))
         row = rowmax['row__max']
@@ -805,9 +832,28 @@ class WidgetAuthToken(models.Model):
 @receiver(pre_delete, sender=WidgetJob)
 def _widgetjob_delete(sender, instance, **kwargs):
     try:
-        instance.job.dereference(str(instance))
+        job = instance.job
+        job.dereference(str(instance))
     except ObjectDoesNotExist:
         logger.info('Job not found for instance %s, ignoring.' % instance)
+        return
+
+    # Stop work no widget is waiting for anymore
+    others = WidgetJob.objects.filter(job=job).exclude(pk=instance.pk)
+    if job.status not in (Job.COMPLETE, Job.ERROR) and not others.exists():
+        job.cancel_if_unused()
+
+
+@register_column_consumer
+def _widget_columns(table):
+    """ Return the columns of `table` read by the widgets showing it. """
+    consumed = set()
+    for widget in Widget.objects.filter(tables=table):
+        columns = widget.consumed_columns(table)
+        if columns is None:
+            return None
+        consumed.update(columns)
+    return consumed
 
 
 class UIWidgetHelper(object):
@@ -38,6 +38,9 @@ class BaseWidget(object):
 
 
 class TimeSeriesWidget(BaseWidget):
+    # process() receives column value lists, see Job.column_values()
+    columnar = True
+
     @classmethod
     def create(cls, section, table, title, width=6, height=300,
                keycols=None, valuecols=None, altaxis=None, bar=False,
@@ -135,6 +138,8 @@ class TimeSeriesWidget(BaseWidget):
 
 
 class PieWidget(BaseWidget):
+    columnar = True
+
     @classmethod
     def create(cls, section, table, title, width=6, rows=10, height=300,
                keycol=None, stack_widget=False):
@@ -172,19 +177,12 @@ class PieWidget(BaseWidget):
     def process(cls, widget, job, data):
         columns = job.get_columns()
 
-        col_names = [c.name for c in columns]
-
         catcol = [c for c in columns if c.name == widget.options.key][0]
         col = [c for c in columns if c.name == widget.options.value][0]
 
         # For each slice, catcol will be the label, col will be the value
-        rows = []
-
-        if data:
-            for rawrow in data:
-                row = dict(zip(col_names, rawrow))
-                r = [row[catcol.name], row[col.name]]
-                rows.append(r)
+        if data and data[catcol.name]:
+            rows = map(list, zip(data[catcol.name], data[col.name]))
         else:
             # create a "full" pie to show something
             rows = [[1, 1]]
@@ -203,6 +201,8 @@ class PieWidget(BaseWidget):
 
 
 class ChartWidget(BaseWidget):
+    columnar = True
+
     @classmethod
     def create(cls, section, table, title, width=6, rows=10, height=300,
                keycols=None, valuecols=None, charttype='line',
@@ -247,21 +247,18 @@ class ChartWidget(BaseWidget):
         # create composite name for key label
         keyname = '-'.join([k.name for k in helper.keycols])
 
-        # For each slice, keyname will be the label
-        rows = []
-
-        for rawrow in data:
-            row = dict(zip([c.name for c in helper.all_cols], rawrow))
-
-            # populate values first
-            r = {c.name: format_single_value(c, row[c.name], d_unit)
-                 for c in helper.valcols}
+        # populate values first
+        names = [c.name for c in helper.valcols]
+        colvals = [[format_single_value(c, v, d_unit) for v in data[c.name]]
+                   for c in helper.valcols]
 
-            # now add the key
-            key = '-'.join([row[k.name] for k in helper.keycols])
-            r[keyname] = key
+        # now add the key, for each slice keyname will be the label,
+        # missing key values are labeled 'None'
+        names.append(keyname)
+        colvals.append(['-'.join(unicode(v) for v in k) for k in
+                        zip(*[data[k.name] for k in helper.keycols])])
 
-            rows.append(r)
+        rows = [dict(zip(names, r)) for r in zip(*colvals)]
 
         data = {
             'chartTitle':  format_labels(
@@ -10,9 +10,8 @@ import logging
 
 from steelscript.appfwk.apps.report.models import Widget, UIWidgetHelper
 from steelscript.appfwk.apps.report.utils import format_labels, \
-    format_single_value
+    format_single_value, time_to_ms
 from steelscript.appfwk.apps.preferences.models import SystemSettings
-from steelscript.common import timeutils
 
 logger = logging.getLogger(__name__)
 
@@ -23,12 +22,14 @@ def clean_key(s):
 
 
 class BaseTableWidget(object):
+    # process() receives column value lists, see Job.column_values()
+    columnar = True
+
     @classmethod
     def base_process(cls, widget, job, data):
         helper = UIWidgetHelper(widget, job)
 
         d_unit = SystemSettings.get_system_settings().data_units
-        rows = []
 
         allcols = helper.colmap.values()
         if widget.options.get('columns', None):
@@ -36,25 +37,25 @@ class BaseTableWidget(object):
         else:
             cols = allcols
 
-        for rawrow in data:
-            row = {}
-
-            for col in cols:
-                if col.istime or col.isdate:
-                    t = rawrow[col.dataindex]
-                    try:
-                        val = timeutils.datetime_to_microseconds(t) / 1000
-                    except AttributeError:
-                        val = t * 1000
-                else:
-                    col.label = format_labels(col.label,
-                                              d_unit,
-                                              helper.valcols)
-                    val = format_single_value(col.col,
-                                              rawrow[col.dataindex],
-                                              d_unit)
-                row[col.key] = val
-            rows.append(row)
+        colvals = []
+        for col in cols:
+            values = data[col.col.name]
+            if col.istime or col.isdate:
+                values = [None if t is None else time_to_ms(t)
+                          for t in values]
+            else:
+                col.label = format_labels(col.label,
+                                          d_unit,
+                                          helper.valcols)
+                if d_unit != 'default':
+                    values = [format_single_value(col.col, v, d_unit)
+                              for v in values]
+                # Missing values are rendered as 'None' by the formatters
+                values = ['None' if v is None else v for v in values]
+            colvals.append(values)
+
+        keys = [col.key for col in cols]
+        rows = [dict(zip(keys, r)) for r in zip(*colvals)]
 
         column_defs = [
             c.to_json('key', 'label', 'sortable', 'formatter', 'allow_html')
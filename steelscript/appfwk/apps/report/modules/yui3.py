@@ -13,6 +13,7 @@ from steelscript.common import timeutils
 from steelscript.common.datastructures import JsonDict
 from steelscript.appfwk.libs.nicescale import NiceScale
 from steelscript.appfwk.apps.report.models import Axes, Widget
+from steelscript.appfwk.apps.report.utils import time_to_ms
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +23,9 @@ def cleankey(s):
 
 
 class TableWidget(object):
+    # process() receives column value lists, see Job.column_values()
+    columnar = True
+
     @classmethod
     def create(cls, section, table, title, width=6,
                cols=None, rows=1000, height=300, stack_widget=False):
@@ -93,25 +97,18 @@ class TableWidget(object):
 
             w_columns.append(w_column)
 
-        rows = []
-
-        for rawrow in data:
-            row = {}
-
-            for key in w_keys:
-                ci = colinfo[key]
-                if colinfo[key].istime or colinfo[key].isdate:
-                    t = rawrow[ci.dataindex]
-                    try:
-                        val = timeutils.datetime_to_microseconds(t) / 1000
-                    except AttributeError:
-                        val = t * 1000
-                else:
-                    val = rawrow[ci.dataindex]
-
-                row[key] = val
+        colvals = []
+        for key in w_keys:
+            ci = colinfo[key]
+            values = data[ci.col.name]
+            if ci.istime or ci.isdate:
+                values = [None if t is None else time_to_ms(t)
+                          for t in values]
+            else:
+                values = ['None' if v is None else v for v in values]
+            colvals.append(values)
 
-            rows.append(row)
+        rows = [dict(zip(w_keys, r)) for r in zip(*colvals)]
 
         data = {
             "chartTitle": widget.title.format(**job.actual_criteria),
@@ -123,6 +120,8 @@ class TableWidget(object):
 
 
 class PieWidget(object):
+    columnar = True
+
     @classmethod
     def create(cls, section, table, title, width=6, rows=10, height=300,
                stack_widget=False):
@@ -162,7 +161,6 @@ class PieWidget(object):
     def process(cls, widget, job, data):
         columns = job.get_columns()
 
-        col_names = [c.name for c in columns]
         catcol = [c for c in columns if c.name == widget.options.key][0]
         col = [c for c in columns if c.name == widget.options.value][0]
 
@@ -173,14 +171,9 @@ class PieWidget(object):
                        "valueDisplayName": col.label
                        })
 
-        rows = []
-
-        if len(data) > 0:
-            for rawrow in data:
-                row = dict(zip(col_names, rawrow))
-                r = {catcol.name: row[catcol.name],
-                     col.name: row[col.name]}
-                rows.append(r)
+        if data and data[catcol.name]:
+            rows = [{catcol.name: k, col.name: v}
+                    for k, v in zip(data[catcol.name], data[col.name])]
         else:
             # create a "full" pie to show something
             rows = [{catcol.name: 1,
@@ -24,6 +24,9 @@ rvbd.report = {
     intervalID: 0,              // ID to manage scheduled reports
     needs_reload_scheduled: false,
 
+    statusUrl: null,            // widget jobs status, full reports only
+    statusID: null,             // ID of the pending status request
+
     /**
      * HTML5 local storage and history methods
      */
@@ -111,6 +114,14 @@ rvbd.report = {
             }
         });
 
+        // Let the server cancel jobs of widgets still loading when the
+        // user navigates away
+        $(window).on('beforeunload', function() {
+            $.each(rvbd.report.widgets, function(i, widget) {
+                widget.releaseJob(true);
+            });
+        });
+
         if (rvbd.report.isEmbedded) { // We already have the widget spec data, so launch right away
             rvbd.report.runFixedCriteriaReport();
         } else if (rvbd.report.reloadMinutes > 0 && !rvbd.report.live) { // Auto-run report (updates at intervals)
@@ -439,6 +450,65 @@ rvbd.report = {
         $('#report-timezone').html(timezone);
     },
 
+    /**
+     * Widgets waiting for their job to be done, see Widget.waitForJob.
+     */
+    waitingWidgets: function() {
+        return $.grep(rvbd.report.widgets, function(w) {
+            return w.onJobDone;
+        });
+    },
+
+    /**
+     * Schedule the next status request for the running widget jobs.
+     */
+    watchJobs: function() {
+        if (rvbd.report.statusID === null) {
+            rvbd.report.statusID = setTimeout(rvbd.report.pollJobs, 1000);
+        }
+    },
+
+    /**
+     * Get the status of all running widget jobs in a single request, rather
+     * than one request per widget, and pass it on to the widgets.
+     */
+    pollJobs: function() {
+        var waiting = rvbd.report.waitingWidgets();
+
+        rvbd.report.statusID = null;
+        if (waiting.length === 0) {
+            return;
+        }
+
+        $.ajax({
+            dataType: 'json',
+            type: 'GET',
+            url: rvbd.report.statusUrl,
+            data: {ids: $.map(waiting, function(w) { return w.widgetJobId; }).join(',')},
+            success: function(data, textStatus) {
+                var statuses = {};
+                $.each(data, function(i, s) {
+                    statuses[s.id] = s;
+                });
+                $.each(waiting, function(i, w) {
+                    if (w.onJobDone && statuses[w.widgetJobId]) {
+                        w.updateJobStatus(statuses[w.widgetJobId]);
+                    }
+                });
+
+                if (rvbd.report.waitingWidgets().length > 0) {
+                    rvbd.report.watchJobs();
+                }
+            },
+            error: function(jqXHR, textStatus, errorThrown) {
+                $.each(waiting, function(i, w) {
+                    w.onJobDone = null;
+                    w.displayError(errorThrown);
+                });
+            }
+        });
+    },
+
     /**
      * Renders all widgets in the current report (or just the one if this is an
      * embedded widget).
@@ -481,7 +551,10 @@ rvbd.report = {
             widgetsToRender = [targetWidget];
         }
 
-        // Clear existing list of widgets
+        // Clear existing list of widgets, releasing any jobs still running
+        $.each(rvbd.report.widgets, function(i, widget) {
+            widget.releaseJob();
+        });
         rvbd.report.widgets = [];
 
         var $row,
@@ -189,9 +189,10 @@ rvbd.widgets.Widget.prototype = {
             data: {criteria: JSON.stringify(criteria)},
             success: function (data, textStatus) {
                 self.jobUrl = data.joburl;
-                self.asyncID = setTimeout(function () {
+                self.widgetJobId = data.id;
+                self.waitForJob(function () {
                     self.getData(criteria);
-                }, 1000);
+                }, true);
             },
             error: function (jqXHR, textStatus, errorThrown) {
                 self.displayError(JSON.parse(jqXHR.responseText));
@@ -252,6 +253,40 @@ rvbd.widgets.Widget.prototype = {
         }
     },
 
+    /**
+     * Call `fetch` once the job of this widget is done.  Full reports poll
+     * the status of all their running widget jobs in a single request,
+     * embedded widgets poll their own job.
+     */
+    waitForJob: function(fetch, showProgress) {
+        var self = this;
+
+        if (rvbd.report.statusUrl) {
+            self.onJobDone = fetch;
+            self.showProgress = showProgress;
+            rvbd.report.watchJobs();
+        } else {
+            self.asyncID = setTimeout(fetch, 1000);
+        }
+    },
+
+    /**
+     * Update the widget from the status of its job, as returned by the
+     * report jobs status request.
+     */
+    updateJobStatus: function(status) {
+        var self = this,
+            fetch;
+
+        if (status.status == 3 || status.status == 4) { // Complete or Error
+            fetch = self.onJobDone;
+            self.onJobDone = null;
+            fetch();
+        } else if (self.showProgress) {
+            $(self.div).setLoading(status.progress);
+        }
+    },
+
     // Background Versions - post and query in the background without updates until done
 
     postRequestAsync: function(criteria) {
@@ -264,9 +299,10 @@ rvbd.widgets.Widget.prototype = {
             data: {criteria: JSON.stringify(criteria)},
             success: function (data, textStatus) {
                 self.jobUrl = data.joburl;
-                self.asyncID = setTimeout(function () {
+                self.widgetJobId = data.id;
+                self.waitForJob(function () {
                     self.getDataAsync(criteria);
-                }, 1000);
+                }, false);
             },
             error: function (jqXHR, textStatus, errorThrown) {
                 self.displayError(JSON.parse(jqXHR.responseText));
@@ -341,6 +377,22 @@ rvbd.widgets.Widget.prototype = {
             clearTimeout(self.asyncID);
             self.asyncID = null;
         }
+        self.onJobDone = null;
+    },
+
+    releaseJob: function(sync) {
+        // tell the server the pending job is no longer wanted
+        var self = this;
+
+        if (self.status == 'running' && self.jobUrl) {
+            self.cancelAsync();
+            $.ajax({
+                type: 'DELETE',
+                url: self.jobUrl,
+                async: !sync
+            });
+            self.jobUrl = null;
+        }
     },
 
     reloadWidget: function() {
@@ -349,7 +401,7 @@ rvbd.widgets.Widget.prototype = {
 
         // avoid multiple request threads
         if (self.status == 'running') {
-            self.cancelAsync();
+            self.releaseJob();
         }
 
         self.status = 'running';
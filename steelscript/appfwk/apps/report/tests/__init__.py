@@ -7,3 +7,5 @@
 from steelscript.appfwk.apps.report.tests.test_criteria import *
 from steelscript.appfwk.apps.report.tests.test_synthetic import *
 from steelscript.appfwk.apps.report.tests.test_token import *
+from steelscript.appfwk.apps.report.tests.test_widgets import *
+from steelscript.appfwk.apps.report.tests.test_widgetjob import *
@@ -0,0 +1,132 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import json
+import threading
+
+from mock import patch
+
+from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.task import Task, threadpool
+from steelscript.appfwk.apps.jobs.task.base import \
+    PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from steelscript.appfwk.apps.jobs.tests.test_threadpool import PoolTask
+from steelscript.appfwk.apps.report.models import WidgetJob
+
+from . import reportrunner
+
+
+class WidgetJobDeleteTest(reportrunner.ReportRunnerTestCase):
+
+    report = 'token_report'
+
+    def setUp(self):
+        super(WidgetJobDeleteTest, self).setUp()
+        criteria = {'endtime_0': '3/4/2015',
+                    'endtime_1': '4:00 pm',
+                    'duration': '15min',
+                    'resolution': '2min'}
+        widgets = self.run_report(criteria)
+
+        # url="/report/appfwk/<report_slug>/widgets/<widget_slug>/jobs/<id>/"
+        self.url = widgets.keys()[0]
+        self.parts = self.url.rstrip('/').split('/')
+        self.wjob_id = int(self.parts[-1])
+        self.assertTrue(WidgetJob.objects.filter(id=self.wjob_id).exists())
+
+    def url_with(self, index, value):
+        parts = list(self.parts)
+        parts[index] = value
+        return '/'.join(parts) + '/'
+
+    def test_delete(self):
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(WidgetJob.objects.filter(id=self.wjob_id).exists())
+
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_delete_other_widget(self):
+        for index, value in ((3, 'wrong-report'), (5, 'wrong-widget')):
+            response = self.client.delete(self.url_with(index, value))
+            self.assertEqual(response.status_code, 404)
+
+        self.assertTrue(WidgetJob.objects.filter(id=self.wjob_id).exists())
+
+
+class ReportJobsStatusTest(reportrunner.ReportRunnerTestCase):
+
+    report = 'token_report'
+
+    def test_status(self):
+        criteria = {'endtime_0': '3/4/2015',
+                    'endtime_1': '4:00 pm',
+                    'duration': '15min',
+                    'resolution': '2min'}
+        joburl = self.run_report(criteria).keys()[0]
+        wjob_id = int(joburl.rstrip('/').split('/')[-1])
+
+        url = '/report/appfwk/%s/jobs/status/' % self.report
+        response = self.client.get(url, {'ids': str(wjob_id)})
+        self.assertEqual(response.status_code, 200)
+        status = json.loads(response.content)
+        self.assertEqual(len(status), 1)
+        self.assertEqual(status[0]['id'], wjob_id)
+        self.assertEqual(status[0]['joburl'], joburl)
+        self.assertEqual(status[0]['status'], Job.COMPLETE)
+
+        response = self.client.get(url, {'ids': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class WidgetJobPriorityTest(reportrunner.ReportRunnerTestCase):
+
+    report = 'token_report'
+
+    def post_widget(self, duration, query=''):
+        criteria = {'endtime_0': '3/4/2015',
+                    'endtime_1': '4:00 pm',
+                    'duration': duration,
+                    'resolution': '2min'}
+        response = self.client.post('/report/appfwk/%s/' % self.report,
+                                    data=criteria)
+        widget = json.loads(response.content)['widgets'][0]
+
+        postdata = {'criteria': json.dumps(widget['criteria'])}
+        response = self.client.post(widget['posturl'] + query,
+                                    data=postdata)
+        self.assertEqual(response.status_code, 200)
+
+    def test_scheduled_background(self):
+        started = []
+        with patch.object(Task, 'start', autospec=True,
+                          side_effect=started.append):
+            # As posted by the scheduler command, then from a report page
+            self.post_widget('15min', '?priority=background')
+            self.post_widget('30min')
+
+        self.assertEqual([t.priority for t in started],
+                         [PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE])
+
+        # Queued behind a running task, the interactive job runs first
+        ran = []
+        gate = threading.Event()
+        self.addCleanup(gate.set)
+        pool = threadpool.ThreadPool(1)
+        blocker = PoolTask('blocker', ran, gate=gate)
+        pool.submit(blocker)
+        self.assertTrue(blocker.started.wait(10))
+
+        tasks = [PoolTask(name, ran, task.priority, job_id=task.job.id)
+                 for name, task in zip(['scheduled', 'interactive'],
+                                       started)]
+        for task in tasks:
+            pool.submit(task)
+        gate.set()
+        for task in tasks:
+            self.assertTrue(task.done.wait(10))
+        self.assertEqual(ran[1:], ['interactive', 'scheduled'])
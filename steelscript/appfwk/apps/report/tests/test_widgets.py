@@ -0,0 +1,116 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import logging
+
+import numpy
+import pandas
+from django.test import TestCase
+
+from steelscript.appfwk.apps.datasource.models import \
+    DatasourceTable, DatasourceQuery, Criteria
+from steelscript.appfwk.apps.jobs import QueryComplete
+from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.progress import progressd
+from steelscript.appfwk.apps.report.models import Report, Section, Widget
+from steelscript.appfwk.apps.report.modules import c3, tables, yui3
+
+logger = logging.getLogger(__name__)
+
+T0 = 1420113600     # 2015-01-01 12:00 UTC
+
+
+class WidgetsTable(DatasourceTable):
+    class Meta:
+        proxy = True
+
+    _query_class = 'WidgetsQuery'
+
+    def post_process_table(self, field_options):
+        self.add_column('time', 'Time', datatype='time', iskey=True)
+        self.add_column('host', 'Host', datatype='string', iskey=True)
+        self.add_column('bytes', 'Bytes', sortdesc=True)
+
+
+class WidgetsQuery(DatasourceQuery):
+
+    def run(self):
+        return QueryComplete(pandas.DataFrame(
+            {'time': [T0, T0 + 60, T0 + 120],
+             'host': ['a', None, 'c'],
+             'bytes': [30.0, 20.0, numpy.nan]}))
+
+
+class ColumnarWidgetTest(TestCase):
+    """Run the process() of columnar widgets on data with missing values,
+    the way WidgetJobDetail calls them."""
+
+    def setUp(self):
+        progressd.reset()
+        self.table = WidgetsTable.create('test-widget-process')
+        report = Report.create('Widget process',
+                               slug='test-widget-process',
+                               namespace='test',
+                               sourcefile='test.widget_process')
+        self.section = Section.create(report)
+
+        self.job = Job.create(self.table, Criteria())
+        self.job.start()
+        self.assertEqual(self.job.status, Job.COMPLETE)
+
+    def process(self, module, uiwidget, rows=None):
+        widget = Widget.objects.get(section=self.section, uiwidget=uiwidget)
+        widget_cls = getattr(module, uiwidget)
+        self.assertTrue(widget_cls.columnar)
+
+        rows = rows or (widget.rows if widget.rows > 0 else None)
+        data = self.job.column_values(rows=rows)
+        return widget_cls.process(widget, self.job, data)
+
+    def test_c3_bar(self):
+        c3.BarWidget.create(self.section, self.table, 'Bar',
+                            keycols=['host'], valuecols=['bytes'])
+        data = self.process(c3, 'BarWidget')
+        self.assertEqual(sorted(r['host'] for r in data['rows']),
+                         ['None', 'a', 'c'])
+
+        data = self.process(c3, 'BarWidget', rows=2)
+        self.assertEqual(len(data['rows']), 2)
+
+    def test_c3_multiple_keys(self):
+        c3.BarWidget.create(self.section, self.table, 'Bar',
+                            keycols=['time', 'host'], valuecols=['bytes'])
+        data = self.process(c3, 'BarWidget')
+        self.assertEqual(data['keyname'], 'time-host')
+        labels = [r['time-host'] for r in data['rows']]
+        self.assertIn('2015-01-01 12:01:00+00:00-None', labels)
+
+    def test_c3_pie(self):
+        c3.PieWidget.create(self.section, self.table, 'Pie', keycol='host')
+        data = self.process(c3, 'PieWidget')
+        self.assertIn([None, 20.0], data['rows'])
+
+    def test_c3_timeseries(self):
+        c3.TimeSeriesWidget.create(self.section, self.table, 'Time',
+                                   keycols=['time'], valuecols=['bytes'])
+        data = self.process(c3, 'TimeSeriesWidget')
+        self.assertEqual(len(data['json']), 3)
+        self.assertEqual(sorted(r['time'] for r in data['json'])[0],
+                         '2015-01-01T12:00:00.000Z')
+
+    def test_tables(self):
+        tables.TableWidget.create(self.section, self.table, 'Table')
+        data = self.process(tables, 'TableWidget')
+        rows = dict((r['time'], r) for r in data['data'])
+        self.assertEqual(rows[T0 * 1000]['host'], 'a')
+        self.assertEqual(rows[(T0 + 60) * 1000]['host'], 'None')
+        self.assertEqual(rows[(T0 + 120) * 1000]['bytes'], 'None')
+
+    def test_yui3_table(self):
+        yui3.TableWidget.create(self.section, self.table, 'Table')
+        data = self.process(yui3, 'TableWidget', rows=1)
+        self.assertEqual(len(data['data']), 1)
+        self.assertEqual(data['data'][0]['time'], T0 * 1000)
@@ -83,6 +83,10 @@ urlpatterns = patterns(
         views.WidgetJobsList.as_view(),
         name='widget-job-list'),
 
+    url(r'^(?P<namespace>[0-9_a-zA-Z]+)/(?P<report_slug>[0-9_a-zA-Z]+)/jobs/status/$',
+        views.ReportJobsStatus.as_view(),
+        name='report-jobs-status'),
+
     url(r'^(?P<namespace>[0-9_a-zA-Z]+)/(?P<report_slug>[0-9_a-zA-Z]+)/widgets/(?P<widget_slug>[0-9_a-zA-Z-]+)/jobs/(?P<job_id>[0-9]+)/$',
         views.WidgetJobDetail.as_view(),
         name='report-job-detail'),
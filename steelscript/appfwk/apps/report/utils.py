@@ -14,7 +14,8 @@ import pytz
 from django.conf import settings
 
 from steelscript.commands.steel import shell
-from steelscript.common.timeutils import datetime_to_seconds
+from steelscript.common.timeutils import datetime_to_seconds, \
+    datetime_to_microseconds
 from steelscript.appfwk.apps.datasource.models import Column
 from steelscript.appfwk.apps.preferences.models import AppfwkUser
 
@@ -75,6 +76,8 @@ def format_df_values(c, df, d_unit):
 
 
 def format_single_value(c, value, d_unit):
+    if value is None:
+        return value
     if d_unit != 'default':
         if hasattr(c, 'units'):
             if d_unit == 'bits':
@@ -86,6 +89,14 @@ def format_single_value(c, value, d_unit):
     return value
 
 
+def time_to_ms(t):
+    # datetime or seconds since the epoch to milliseconds
+    try:
+        return datetime_to_microseconds(t) / 1000
+    except AttributeError:
+        return t * 1000
+
+
 def debug_fileinfo(fname):
     st = os.stat(fname)
     logging.debug('%15s: mtime - %s, ctime - %s' % (os.path.basename(fname),
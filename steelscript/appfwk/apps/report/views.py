@@ -42,6 +42,8 @@ from rest_framework.renderers import TemplateHTMLRenderer, JSONRenderer
 from rest_framework.authentication import (SessionAuthentication,
                                            BasicAuthentication)
 from steelscript.appfwk.apps.jobs.models import Job
+from steelscript.appfwk.apps.jobs.progress import progressd
+from steelscript.appfwk.apps.jobs.task.base import PRIORITY_BACKGROUND
 
 from steelscript.common.timeutils import round_time, timedelta_total_seconds, \
     parse_timedelta, sec_string_to_datetime, datetime_to_seconds
@@ -1036,7 +1038,12 @@ class WidgetJobsList(views.APIView):
                 logger.debug('Form_criteria: %s' % form_criteria)
                 job = Job.create(table=widget.table(),
                                  criteria=form_criteria)
-                job.start()
+
+                # Scheduled reports run in the background
+                priority = None
+                if request.GET.get('priority') == 'background':
+                    priority = PRIORITY_BACKGROUND
+                job.start(priority=priority)
 
                 wjob = WidgetJob(widget=widget, job=job)
                 wjob.save()
@@ -1044,7 +1051,8 @@ class WidgetJobsList(views.APIView):
                 logger.debug("Created WidgetJob %s for report %s (handle %s)" %
                              (str(wjob), report_slug, job.handle))
 
-                return Response({"joburl": reverse('report-job-detail',
+                return Response({"id": wjob.id,
+                                 "joburl": reverse('report-job-detail',
                                                    args=[namespace,
                                                          report_slug,
                                                          widget_slug,
@@ -1065,6 +1073,61 @@ class WidgetJobsList(views.APIView):
             from IPython import embed; embed()
 
 
+class ReportJobsStatus(views.APIView):
+    """Status of all widget jobs of a report in a single request.
+
+    Returns the same status and progress fields as polling each
+    WidgetJobDetail status url.  The optional `ids` query parameter is
+    a comma separated list of WidgetJob ids to limit the result to.
+    """
+
+    authentication_classes = (SessionAuthentication,
+                              BasicAuthentication,
+                              URLTokenAuthentication)
+
+    def get(self, request, namespace, report_slug, format=None):
+        report = get_object_or_404(Report, namespace=namespace,
+                                   slug=report_slug)
+
+        wjobs = (WidgetJob.objects
+                 .filter(widget__section__report=report)
+                 .select_related('widget', 'job'))
+
+        ids = request.GET.get('ids', None)
+        if ids:
+            try:
+                wjobs = wjobs.filter(id__in=[int(i) for i in ids.split(',')])
+            except ValueError:
+                return Response({'message': 'Invalid ids: %s' % ids},
+                                status=400)
+
+        wjobs = list(wjobs)
+        progress = progressd.get_many([w.job_id for w in wjobs])
+
+        resp = []
+        for wjob in wjobs:
+            job = wjob.job
+            p = progress.get(job.id, None)
+            if p is None:
+                # Not known to progressd, report what the database has
+                status, pct = job.status, 0
+            else:
+                status, pct = int(p['status']), int(p['progress'])
+
+            resp.append({
+                'id': wjob.id,
+                'widget': wjob.widget.slug,
+                'joburl': reverse('report-job-detail',
+                                  args=[namespace, report_slug,
+                                        wjob.widget.slug, wjob.id]),
+                'status': status,
+                'progress': pct,
+                'message': cgi.escape(job.message),
+            })
+
+        return Response(resp)
+
+
 class WidgetJobDetail(views.APIView):
 
     authentication_classes = (SessionAuthentication,
@@ -1091,13 +1154,28 @@ class WidgetJobDetail(views.APIView):
         else:
             try:
                 i = importlib.import_module(widget.module)
-                widget_func = i.__dict__[widget.uiwidget].process
-                if widget.rows > 0:
-                    tabledata = job.values()[:widget.rows]
+                widget_cls = i.__dict__[widget.uiwidget]
+                widget_func = widget_cls.process
+                rows = widget.rows if widget.rows > 0 else None
+
+                # Only read the columns the widget shows, so synthetic
+                # columns it does not show are not computed for it
+                consumed = widget.consumed_columns(job.table)
+
+                # Widgets marked as columnar take an OrderedDict of
+                # column name to list of values instead of a list of rows
+                if getattr(widget_cls, 'columnar', False):
+                    columns = None
+                    if consumed is not None:
+                        columns = [c.name for c in job.get_columns()
+                                   if c.name in consumed]
+                    tabledata = job.column_values(columns=columns, rows=rows)
+                    nrows = len(tabledata.values()[0]) if tabledata else 0
                 else:
-                    tabledata = job.values()
+                    tabledata = job.values(rows=rows, columns=consumed)
+                    nrows = len(tabledata)
 
-                if tabledata is None or len(tabledata) == 0:
+                if nrows == 0:
                     resp = job.json()
                     resp['status'] = Job.ERROR
                     resp['message'] = "No data returned"
@@ -1164,3 +1242,20 @@ geolocation documentation</a> for more information.'''
         except:
             logger.error('Failed to generate HttpResponse:\n%s' % str(resp))
             raise
+
+    def delete(self, request, namespace, report_slug, widget_slug, job_id,
+               format=None, status=None):
+        """Release the job of a widget that is no longer displayed.
+
+        The job is cancelled if nothing else is waiting for it.
+        """
+        logger.debug("WidgetJobDetail DELETE %s/%s/%s/%s" %
+                     (namespace, report_slug, widget_slug, job_id))
+
+        wjob = get_object_or_404(
+            WidgetJob, id=job_id,
+            widget__slug=widget_slug,
+            widget__section__report__slug=report_slug,
+            widget__section__report__namespace=namespace)
+        wjob.delete()
+        return JsonResponse({})
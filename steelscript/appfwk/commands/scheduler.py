@@ -281,11 +281,13 @@ def run_report_via_rest(host, slug, namespace,
 
     jobs = []
 
-    # create the widget jobs for each widget found
+    # create the widget jobs for each widget found, queued behind the
+    # jobs of reports run interactively
     for w in r.json()['widgets']:
         data = {'criteria': json.dumps(w['criteria'])}
+        posturl = w['posturl'] + '?priority=background'
 
-        w_response = conn.request('POST', w['posturl'],
+        w_response = conn.request('POST', posturl,
                                   extra_headers=post_header, body=data)
         jobs.append(w_response.json()['joburl'])
 
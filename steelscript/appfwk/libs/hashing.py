@@ -0,0 +1,97 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+"""
+Canonical encoding of criteria values for computing cache handles.
+
+`encode()` produces the same byte string for equal values regardless of
+dict ordering, and encodes each value with a type tag so that, for
+example, the integer ``1`` and the string ``'1'`` differ.  Timezone
+aware datetimes are encoded in UTC, so equal instants in different
+timezones encode the same.
+"""
+
+import datetime
+
+import pytz
+import numpy
+
+
+def encode(value):
+    """Return the canonical byte string encoding of `value`."""
+    out = []
+    _encode(value, out.append)
+    return ''.join(out)
+
+
+def _encode(v, out):
+    if isinstance(v, numpy.generic):
+        v = v.item()
+
+    if v is None:
+        out('n;')
+    elif isinstance(v, bool):
+        out('b1;' if v else 'b0;')
+    elif isinstance(v, (int, long)):
+        out('i%d;' % v)
+    elif isinstance(v, float):
+        out('f%r;' % v)
+    elif isinstance(v, basestring):
+        if isinstance(v, unicode):
+            v = v.encode('utf-8')
+        out('s%d:%s' % (len(v), v))
+    elif isinstance(v, datetime.datetime):
+        if v.tzinfo is not None:
+            v = v.astimezone(pytz.utc).replace(tzinfo=None)
+            out('Z')
+        out('d%s;' % v.isoformat())
+    elif isinstance(v, datetime.date):
+        out('D%s;' % v.isoformat())
+    elif isinstance(v, datetime.timedelta):
+        out('t%d.%06d;' % (v.days * 86400 + v.seconds, v.microseconds))
+    elif isinstance(v, dict):
+        items = sorted((encode(k), val) for k, val in v.iteritems())
+        out('{%d:' % len(items))
+        for k, val in items:
+            out(k)
+            _encode(val, out)
+        out('}')
+    elif isinstance(v, (list, tuple)):
+        out('[%d:' % len(v))
+        for val in v:
+            _encode(val, out)
+        out(']')
+    elif isinstance(v, (set, frozenset)):
+        items = sorted(encode(val) for val in v)
+        out('<%d:%s>' % (len(items), ''.join(items)))
+    else:
+        # Other objects are identified by type and string form, as
+        # handles were computed before
+        s = str(v)
+        out('o%s.%s:%d:%s' % (v.__class__.__module__,
+                              v.__class__.__name__, len(s), s))
+
+
+def snap_time(dt, bucket):
+    """Return datetime `dt` rounded down to a multiple of `bucket`.
+
+    :param bucket: bucket size as a timedelta or number of seconds,
+        measured from the Unix epoch in UTC
+
+    """
+    if isinstance(bucket, datetime.timedelta):
+        bucket = bucket.days * 86400 + bucket.seconds
+    bucket = int(bucket)
+    if bucket <= 0:
+        return dt
+
+    if dt.tzinfo is not None:
+        epoch = datetime.datetime(1970, 1, 1, tzinfo=pytz.utc)
+    else:
+        epoch = datetime.datetime(1970, 1, 1)
+    delta = dt - epoch
+    seconds = delta.days * 86400 + delta.seconds
+    return epoch + datetime.timedelta(seconds=seconds - seconds % bucket)
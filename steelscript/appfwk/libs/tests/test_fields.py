@@ -0,0 +1,63 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+import logging
+import datetime
+
+from django.test import TestCase
+
+from steelscript.appfwk.libs.fields import \
+    dbsafe_encode, dbsafe_encode_fast, dbsafe_decode, pickled_hash, \
+    FAST_PREFIX
+
+logger = logging.getLogger(__name__)
+
+
+class PickledEncodingTest(TestCase):
+
+    def test_codec(self):
+        value = {'a': [1, 2, (3, 4)], u'b': datetime.timedelta(seconds=5)}
+        for compress in (False, True):
+            encoded = dbsafe_encode_fast(value, compress)
+            self.assertTrue(encoded.startswith(FAST_PREFIX))
+            self.assertEqual(dbsafe_decode(encoded), value)
+
+            # Values stored before are still decoded
+            self.assertEqual(dbsafe_decode(dbsafe_encode(value, compress),
+                                           compress), value)
+
+    def test_references(self):
+        # Shared objects are decoded as separate copies
+        shared = [1, 2]
+        decoded = dbsafe_decode(dbsafe_encode_fast({'a': shared,
+                                                    'b': shared}))
+        self.assertEqual(decoded['a'], decoded['b'])
+        self.assertIsNot(decoded['a'], decoded['b'])
+
+        # Values that refer to themselves are still encoded
+        value = [1]
+        value.append(value)
+        decoded = dbsafe_decode(dbsafe_encode_fast(value))
+        self.assertIs(decoded[1], decoded)
+
+
+class PickledHashTest(TestCase):
+
+    def criteria(self, **kwargs):
+        return dict(resolution=datetime.timedelta(seconds=60),
+                    device=u'1', filterexpr='', **kwargs)
+
+    def test_hash(self):
+        first = self.criteria()
+        second = {'filterexpr': '', 'device': '1'}
+        second['resolution'] = datetime.timedelta(seconds=60)
+        self.assertEqual(pickled_hash(first), pickled_hash(second))
+        self.assertEqual(pickled_hash(set(['a', 'b', 'c'])),
+                         pickled_hash(set(['c', 'b', 'a'])))
+        self.assertNotEqual(pickled_hash(first),
+                            pickled_hash(self.criteria(extra=1)))
+        self.assertNotEqual(pickled_hash([1, 2]), pickled_hash((1, 2)))
+        self.assertIsNone(pickled_hash(None))
@@ -0,0 +1,132 @@
+# Copyright (c) 2015 Riverbed Technology, Inc.
+#
+# This software is licensed under the terms and conditions of the MIT License
+# accompanying the software ("License").  This software is distributed "AS IS"
+# as set forth in the License.
+
+"""
+Benchmark progress roll-up in progressd.
+
+Builds a tree of jobs with the in-memory progressd structures, runs
+progress updates and status transitions against it, and compares the
+time taken with a full recount of children at every level, as done
+before children counts were kept.  The counts are checked against a
+recount once all jobs are complete.
+
+    python benchmark.py --jobs 10000 --fanout 4 --followers 0.2
+"""
+
+import time
+import random
+import argparse
+
+import progressd
+from progressd import Job, JOBS, COMPLETE
+
+
+def build_tree(njobs, fanout, followers):
+    """Create `njobs` jobs, each parent having up to `fanout` children.
+
+    A fraction `followers` of the jobs are created as followers of an
+    earlier job instead of running themselves.  Only running jobs have
+    children.
+    """
+    JOBS.clear()
+    root = Job(job_id=1, status=0, progress=0)
+    root.link()
+    JOBS[1] = root
+
+    masters = [1]
+    for job_id in xrange(2, njobs + 1):
+        parent_id = masters[(job_id - 2) / fanout]
+        master_id = None
+        if random.random() < followers:
+            master_id = random.choice(masters)
+        j = Job(job_id=job_id, status=0, progress=0,
+                master_id=master_id, parent_id=parent_id)
+        j.link()
+        JOBS[job_id] = j
+        if master_id is None:
+            masters.append(job_id)
+
+    depth = 0
+    j = JOBS[njobs]
+    while j.parent_id:
+        depth += 1
+        j = JOBS[j.parent_id]
+    return masters, depth
+
+
+def recount(job):
+    """Full recount of children at every level, the previous roll-up."""
+    children = job.children
+    if children:
+        num_done = sum(1 for c in children if c.status == COMPLETE)
+        progress = int((num_done / float(len(children))) * 100)
+        if progress > job._progress:
+            job._progress = min(progress, progressd.PARENT_MAX_PROGRESS)
+    if job.parent_id:
+        recount(JOBS[job.parent_id])
+
+
+def run(label, masters, update):
+    ids = list(reversed(masters))
+
+    start = time.time()
+    for job_id in ids:
+        update(JOBS[job_id], progress=50)
+    progress_secs = time.time() - start
+
+    start = time.time()
+    for job_id in ids:
+        update(JOBS[job_id], status=COMPLETE, progress=100)
+    status_secs = time.time() - start
+
+    print '%-12s %d progress updates %.3fs, %d completions %.3fs' % (
+        label, len(ids), progress_secs, len(ids), status_secs)
+    return progress_secs + status_secs
+
+
+def incremental_update(job, **kwargs):
+    job.update(**kwargs)
+
+
+def recount_update(job, status=None, progress=None):
+    if status is not None:
+        job._status = status
+    if progress is not None and progress > job._progress:
+        job._progress = progress
+    recount(job)
+
+
+def check_counts():
+    for j in JOBS.itervalues():
+        children = j.children
+        done = sum(1 for c in children if c.status == COMPLETE)
+        assert j.children_total == len(children), j
+        assert j.children_done == done, j
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, default=10000,
+                        help='Number of jobs in the tree')
+    parser.add_argument('--fanout', type=int, default=4,
+                        help='Number of children per parent job')
+    parser.add_argument('--followers', type=float, default=0.2,
+                        help='Fraction of jobs that are followers')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    masters, depth = build_tree(args.jobs, args.fanout, args.followers)
+    print '%d jobs, %d running, depth %d' % (args.jobs, len(masters), depth)
+
+    incremental = run('incremental', masters, incremental_update)
+    check_counts()
+
+    random.seed(args.seed)
+    build_tree(args.jobs, args.fanout, args.followers)
+    full = run('recount', masters, recount_update)
+
+    print 'speedup %.1fx' % (full / max(incremental, 1e-6))
@@ -7,21 +7,39 @@
 import os
 import sys
 import json
+import struct
 import logging
 import argparse
+import threading
+import functools
 import subprocess
+import SocketServer
 from collections import OrderedDict
 
 from flask import Flask, request
-from flask_restful import Resource, Api, abort, fields, marshal_with
+from flask_restful import (Resource, Api, abort, fields, marshal,
+                           marshal_with)
+from werkzeug.exceptions import HTTPException
 
 import reschema
 from reschema.exceptions import ValidationError
 
 logger = logging.getLogger(__name__)
 
+# JOBS is shared between the HTTP server and the socket server thread
+lock = threading.RLock()
+
+
+def locked(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with lock:
+            return func(*args, **kwargs)
+    return wrapper
+
+
 app = Flask(__name__)
-api = Api(app)
+api = Api(app, decorators=[locked])
 
 # API Service Definitions
 service = reschema.ServiceDef()
@@ -29,6 +47,7 @@ yamlfile = os.path.join(os.path.dirname(__file__), 'progressd.yaml')
 service.load(yamlfile)
 job_schema = service.find_resource('job')
 jobs_schema = service.find_resource('jobs')
+jobs_query_schema = service.find_resource('jobs_query')
 
 
 JOBS = {}                   # Map of Job IDs to Job objects
@@ -36,6 +55,10 @@ JOBS = {}                   # Map of Job IDs to Job objects
 PARENT_MIN_PROGRESS = 33    # progress when single child complete
 PARENT_MAX_PROGRESS = 90    # max progress until job is complete
 
+COMPLETE = 3                # Job status counted as a finished child
+ERROR = 4
+DONE = (COMPLETE, ERROR)    # Job status no longer taken from the master
+
 
 def get_job_or_404(job_id):
     if job_id not in JOBS:
@@ -44,17 +67,27 @@ def get_job_or_404(job_id):
 
 
 class Job(object):
-    """Basic data structure for Job status"""
+    """Basic data structure for Job status
+
+    Followers report the status and progress of their master while they
+    are pending, and their own once they are done themselves, such as
+    when a follower is cancelled before its master.  Each job keeps a count of its children and
+    of how many of those are complete, updated as children change status,
+    so an update never needs to walk the list of children.
+    """
 
     def __init__(self, job_id, status, progress,
                  master_id=None, parent_id=None):
         self.job_id = job_id
-        self.status = status
-        self.progress = progress
+        self._status = status
+        self._progress = progress
         self.master_id = master_id
         self.parent_id = parent_id
 
-        self.update_links()
+        self._followers = set()
+        self._children = set()
+        self.children_total = 0
+        self.children_done = 0
 
     def __cmp__(self, other):
         return cmp(self.job_id, other.job_id)
@@ -69,20 +102,49 @@ class Job(object):
     def unicode(self):
         return self.values()
 
-    def update_links(self):
-        """Update internal references to master/parent links"""
-        self._followers = set()
-        self._children = set()
+    @property
+    def master(self):
+        return JOBS.get(self.master_id) if self.master_id else None
 
-        if self.master_id:
-            get_job_or_404(self.master_id)._followers.add(self.job_id)
+    @property
+    def reported_master(self):
+        """The master whose status this job reports, None if its own."""
+        return self.master if self._status not in DONE else None
 
-        if self.parent_id:
-            get_job_or_404(self.parent_id)._children.add(self.job_id)
+    @property
+    def status(self):
+        master = self.reported_master
+        return master.status if master else self._status
+
+    @property
+    def progress(self):
+        master = self.reported_master
+        return master.progress if master else self._progress
+
+    @property
+    def done(self):
+        return self.status == COMPLETE
+
+    def link(self):
+        """Add references to this job in its master and parent."""
+        master = get_job_or_404(self.master_id) if self.master_id else None
+        parent = get_job_or_404(self.parent_id) if self.parent_id else None
+
+        if master:
+            master._followers.add(self.job_id)
+
+        if parent:
+            parent._children.add(self.job_id)
+            parent.children_total += 1
+            if self.done:
+                parent.children_done += 1
 
     def clean_links(self):
         """Clean job references in master/parent links"""
         for f in self.followers:
+            # keep the last status seen through this master
+            if f._status not in DONE:
+                f._status, f._progress = self.status, self.progress
             f.master_id = None
         if self.master_id:
             get_job_or_404(self.master_id)._followers.remove(self.job_id)
@@ -90,16 +152,34 @@ class Job(object):
         for c in self.children:
             c.parent_id = None
         if self.parent_id:
-            get_job_or_404(self.parent_id)._children.remove(self.job_id)
+            parent = get_job_or_404(self.parent_id)
+            parent._children.remove(self.job_id)
+            parent.children_total -= 1
+            if self.done:
+                parent.children_done -= 1
 
     def update(self, status=None, progress=None):
+        # Followers that are done themselves do not change with this job
+        jobs = [self] + self.followers
+        was_done = [job.done for job in jobs]
+
         if status is not None:
-            self.status = status
-        if progress is not None and progress > self.progress:
-            self.progress = progress
+            self._status = status
+        if progress is not None and progress > self._progress:
+            self._progress = progress
 
         self.calculate_progress()
 
+        for job, done in zip(jobs, was_done):
+            if job.done != done:
+                # Update the counts of the parents of the jobs that
+                # changed state
+                delta = 1 if job.done else -1
+                if job.parent_id and job.parent_id in JOBS:
+                    parent = JOBS[job.parent_id]
+                    parent.children_done += delta
+                    parent.calculate_progress()
+
     @property
     def followers(self):
         return [get_job_or_404(c) for c in self._followers]
@@ -109,7 +189,7 @@ class Job(object):
         return [get_job_or_404(c) for c in self._children]
 
     def calculate_progress(self):
-        """Roll up progress from children and push progress to followers."""
+        """Roll up progress from the children counts."""
 
         # when calculating progress for a parent job, assumptions are made
         # since not all jobs are necessarily created immediately; initial
@@ -119,28 +199,17 @@ class Job(object):
 
         # XXXMFG make the params configurable
 
-        children = self.children
-        if children:
-            if len(children) == 1 and children[0].status == 3:
+        if self.children_total:
+            if self.children_total == 1 and self.children_done == 1:
                 # one child so far, and it's complete
-                self.progress = PARENT_MIN_PROGRESS
+                self._progress = PARENT_MIN_PROGRESS
             else:
-                num_done = sum(1 for c in children if c.status == 3)
-                progress = int((num_done / float(len(children))) * 100)
-                if progress > self.progress:
+                progress = int((self.children_done /
+                                float(self.children_total)) * 100)
+                if progress > self._progress:
                     if progress > PARENT_MAX_PROGRESS:
                         progress = PARENT_MAX_PROGRESS
-                    self.progress = progress
-
-        for f in self.followers:
-            # shadow jobs - push status and progress down
-            f.status, f.progress = self.status, self.progress
-
-        if self.master_id:
-            get_job_or_404(self.master_id).calculate_progress()
-
-        if self.parent_id:
-            get_job_or_404(self.parent_id).calculate_progress()
+                    self._progress = progress
 
 
 job_resource_fields = OrderedDict([
@@ -164,20 +233,12 @@ class JobAPI(Resource):
 
     @marshal_with(job_resource_fields)
     def put(self, job_id):
-        s = get_job_or_404(job_id)
         data = request.get_json()
         print 'Received PUT data for Job ID %d: %s' % (job_id, data)
-
-        # id and master fields are read-only, remove if present
-        data.pop('job_id', None)
-        data.pop('master_id', None)
-        s.update(**data)
-        return s, 200
+        return update_job(job_id, data), 200
 
     def delete(self, job_id):
-        j = get_job_or_404(job_id)
-        j.clean_links()
-        del JOBS[job_id]
+        delete_job(job_id)
         return '', 204
 
 
@@ -237,17 +298,32 @@ class JobListAPI(Resource):
     def post(self):
         data = request.get_json()
         print 'Received POST data: %s' % data
+        j = create_job(data)
+        return j, 201, {'Location': api.url_for(JobAPI, job_id=j.job_id)}
+
+
+class JobQueryAPI(Resource):
+    """Return the status of many jobs in one request."""
+    @marshal_with(jobs_resource_fields)
+    def post(self):
+        data = request.get_json()
         try:
-            job_schema.validate(data)
+            jobs_query_schema.validate(data)
         except ValidationError as e:
             abort(400, message=str(e))
+        return {'items': [JOBS[i] for i in data['ids'] if i in JOBS]}
 
-        j = Job(**data)
-        if j.job_id in JOBS:
-            abort(409, message='Job with job_id %d already exists' % j.job_id)
 
-        JOBS[j.job_id] = j
-        return j, 201, {'Location': api.url_for(JobAPI, job_id=j.job_id)}
+class JobDeleteManyAPI(Resource):
+    """Delete many jobs in one request, unknown ids are skipped."""
+    def post(self):
+        data = request.get_json()
+        try:
+            jobs_query_schema.validate(data)
+        except ValidationError as e:
+            abort(400, message=str(e))
+        delete_many(data['ids'])
+        return '', 204
 
 
 class JobFlushAPI(Resource):
@@ -264,9 +340,144 @@ api.add_resource(JobMasterAPI, '/jobs/items/<int:job_id>/master/')
 api.add_resource(JobFollowersAPI, '/jobs/items/<int:job_id>/followers/')
 api.add_resource(JobChildrenAPI, '/jobs/items/<int:job_id>/children/')
 api.add_resource(JobDoneAPI, '/jobs/items/<int:job_id>/done/')
+api.add_resource(JobQueryAPI, '/jobs/query/')
+api.add_resource(JobDeleteManyAPI, '/jobs/delete/')
 api.add_resource(JobFlushAPI, '/jobs/reset/')
 
 
+def create_job(data):
+    try:
+        job_schema.validate(data)
+    except ValidationError as e:
+        abort(400, message=str(e))
+
+    if data['job_id'] in JOBS:
+        abort(409, message='Job with job_id %d already exists' %
+              data['job_id'])
+
+    j = Job(**data)
+    j.link()
+    JOBS[j.job_id] = j
+    return j
+
+
+def update_job(job_id, data):
+    j = get_job_or_404(job_id)
+
+    # id and master fields are read-only, remove if present
+    data.pop('job_id', None)
+    data.pop('master_id', None)
+    j.update(**data)
+    return j
+
+
+def delete_job(job_id):
+    j = get_job_or_404(job_id)
+    j.clean_links()
+    del JOBS[job_id]
+
+
+def delete_many(ids):
+    for job_id in ids:
+        if job_id in JOBS:
+            delete_job(job_id)
+
+
+#
+# Unix domain socket server
+#
+# Each request and response is a JSON object preceded by its length as
+# a 4 byte unsigned int in network byte order.  Requests name an 'op'
+# and its arguments, responses hold either 'result' or 'error' and
+# 'code', mirroring the HTTP status the REST API would return.
+# Connections are persistent, and the batch operations handle many
+# jobs per round-trip.
+#
+FRAME_HEADER = struct.Struct('!I')
+
+
+def socket_get_many(ids):
+    return [marshal(JOBS[i], job_resource_fields) if i in JOBS else None
+            for i in ids]
+
+
+def socket_put_many(items):
+    # Jobs that no longer exist are skipped and returned
+    missing = []
+    for item in items:
+        item = dict(item)
+        job_id = item.pop('job_id')
+        if job_id not in JOBS:
+            missing.append(job_id)
+            continue
+        update_job(job_id, item)
+    return missing
+
+
+SOCKET_OPS = {
+    'get': lambda job_id: marshal(get_job_or_404(job_id),
+                                  job_resource_fields),
+    'get_many': socket_get_many,
+    'post': lambda data: marshal(create_job(data), job_resource_fields),
+    'put': lambda job_id, data: marshal(update_job(job_id, data),
+                                        job_resource_fields),
+    'put_many': socket_put_many,
+    'delete': delete_job,
+    'delete_many': delete_many,
+    'reset': lambda: load_existing_jobs(),
+}
+
+
+class SocketHandler(SocketServer.StreamRequestHandler):
+
+    def read_frame(self):
+        header = self.rfile.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            return None
+        length, = FRAME_HEADER.unpack(header)
+        return json.loads(self.rfile.read(length))
+
+    def write_frame(self, obj):
+        body = json.dumps(obj)
+        self.wfile.write(FRAME_HEADER.pack(len(body)) + body)
+        self.wfile.flush()
+
+    def handle(self):
+        while True:
+            req = self.read_frame()
+            if req is None:
+                return
+
+            try:
+                op = SOCKET_OPS[req.pop('op')]
+                with lock:
+                    resp = {'result': op(**req)}
+            except HTTPException as e:
+                message = getattr(e, 'data', {}).get('message', str(e))
+                resp = {'error': message, 'code': e.code}
+            except Exception as e:
+                resp = {'error': str(e), 'code': 400}
+
+            self.write_frame(resp)
+
+
+class ThreadingUnixServer(SocketServer.ThreadingMixIn,
+                          SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+def start_socket_server(path):
+    if os.path.exists(path):
+        os.unlink(path)
+    server = ThreadingUnixServer(path, SocketHandler)
+    thread = threading.Thread(target=server.serve_forever,
+                              name='progressd-socket')
+    thread.daemon = True
+    thread.start()
+    print 'Listening on socket %s' % path
+    return server
+
+
 def load_existing_jobs():
     global JOBS
 
@@ -303,7 +514,7 @@ def load_existing_jobs():
 
     # update references since jobs may have been added out of order
     for j in JOBS.itervalues():
-        j.update_links()
+        j.link()
 
 
 if __name__ == '__main__':
@@ -314,6 +525,9 @@ if __name__ == '__main__':
                         help='If true, will not sync jobs with database')
     parser.add_argument('--port', type=int, default=5000,
                         help='Port number to run server on')
+    parser.add_argument('--socket', default=None,
+                        help='Path of a Unix domain socket to also accept '
+                             'requests on, see PROGRESSD_SOCKET')
 
     args = parser.parse_args()
     app.config['PROJECT_PATH'] = args.path
@@ -321,4 +535,7 @@ if __name__ == '__main__':
 
     load_existing_jobs()
 
+    if args.socket:
+        start_socket_server(args.socket)
+
     app.run(host='127.0.0.1', port=args.port, debug=False)
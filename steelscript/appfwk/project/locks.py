@@ -5,8 +5,14 @@
 # as set forth in the License.
 
 
+import os
+import zlib
 import logging
 import threading
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 from django.conf import settings
 from django.db import transaction
@@ -14,33 +20,128 @@ from django.db import transaction
 logger = logging.getLogger(__name__)
 
 """
-This module defines two classes, ClassLock and TransactionLock.  ClassLock
-works at a model level for performing transaction locks, and TransactionLock
-works at a model *instance* level.
+This module defines three classes, ClassLock, TransactionLock and
+StripedLock.  ClassLock works at a model level for performing transaction
+locks, and TransactionLock works at a model *instance* level.  StripedLock
+locks an arbitrary key, such as a job handle, by locking one of a fixed
+number of rows of a lock model chosen by a hash of the key.  The rows
+must exist before the lock is used, ids 0 to LOCK_STRIPES - 1.
 
 Since SQLite doesn't support row locking (select_for_update()), we need
-to use a threading lock.  This provides support when running
-the dev server.  It will not work across multiple processes, only
-between threads of a single process
+to use a threading lock.  To also lock between processes, such as the
+workers of the ``process`` task model, each lock also holds a byte
+range lock (fcntl.lockf) on a lock file next to the database file.
+All processes must therefore run on the same host.  An in-memory
+database, or a platform without fcntl, only gets the threading locks.
+
+Worker processes forked while a lock may be held must call
+``after_fork`` before taking any lock.
 """
 
+# Number of locks that keys are spread over by StripedLock
+LOCK_STRIPES = 64
+
+
+def lock_stripe(key):
+    """Return the stripe for `key`, stable across processes."""
+    return (zlib.crc32(str(key)) & 0xffffffff) % LOCK_STRIPES
+
+
+def after_fork():
+    """Reset the locks inherited by a forked child process.
+
+    Only needed with SQLite, where a lock held by any thread of the
+    parent would otherwise appear held forever in the child.
+    """
+    pass
+
+
+def shared_between_processes():
+    """Return True if the locks also lock out other processes."""
+    return True
+
 
 if settings.DATABASES['default']['ENGINE'].endswith('sqlite3'):
-    lock = threading.RLock()
+
+    # Lock file descriptors by path, opened on first use as tests
+    # switch to another database
+    lock_files = {}
+    lock_files_lock = threading.Lock()
+
+    def _lock_fd():
+        name = settings.DATABASES['default']['NAME']
+        if (fcntl is None or not name or name == ':memory:' or
+                'mode=memory' in name):
+            return None
+
+        path = name + '.lock'
+        with lock_files_lock:
+            if path not in lock_files:
+                # Record locks are per process and not inherited by
+                # fork(), so children can share the descriptor
+                lock_files[path] = os.open(path, os.O_RDWR | os.O_CREAT,
+                                           0600)
+            return lock_files[path]
+
+    class _FileLock(object):
+        """Reentrant lock over threads and processes.
+
+        Threads of a process are serialized by an RLock, the thread
+        holding it then locks byte `offset` of the lock file.
+        """
+        def __init__(self, offset):
+            self.offset = offset
+            self.reset()
+
+        def reset(self):
+            self.lock = threading.RLock()
+            self.depth = 0
+            self.fd = None
+
+        def acquire(self, blocking=True):
+            if not self.lock.acquire(blocking):
+                return False
+            if self.depth == 0:
+                try:
+                    self.fd = _lock_fd()
+                    if self.fd is not None:
+                        fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, self.offset)
+                except:
+                    self.lock.release()
+                    raise
+            self.depth += 1
+            return True
+
+        def release(self):
+            self.depth -= 1
+            if self.depth == 0 and self.fd is not None:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, self.offset)
+            self.lock.release()
+
+    lock = _FileLock(0)
+    stripes = [_FileLock(i + 1) for i in range(LOCK_STRIPES)]
+
+    def after_fork():
+        for l in [lock] + stripes:
+            l.reset()
+
+    def shared_between_processes():
+        return _lock_fd() is not None
 
     class _SQLLock(object):
 
         def __init__(self, obj, context=""):
             self.obj = obj
             self.context = context
+            self.lock = lock
 
         def __enter__(self):
             logger.debug("%s.enter: %s - %s" % (self.__class__.__name__,
                                                 self.context, self.obj))
-            lock.acquire()
+            self.lock.acquire()
 
         def __exit__(self, type_, value, traceback_):
-            lock.release()
+            self.lock.release()
             logger.debug("%s.exit: %s - %s" % (self.__class__.__name__,
                                                self.context, self.obj))
 
@@ -50,6 +151,11 @@ if settings.DATABASES['default']['ENGINE'].endswith('sqlite3'):
     class TransactionLock(_SQLLock):
         pass
 
+    class StripedLock(_SQLLock):
+        def __init__(self, model, key, context=""):
+            super(StripedLock, self).__init__(key, context)
+            self.lock = stripes[lock_stripe(key)]
+
 else:
     class _DBLock(transaction.Atomic):
         def __init__(self, obj, context=""):
@@ -75,3 +181,13 @@ else:
         def __enter__(self):
             super(TransactionLock, self).__enter__()
             self.obj.__class__.objects.select_for_update().get(id=self.obj.id)
+
+    class StripedLock(_DBLock):
+        def __init__(self, model, key, context=""):
+            super(StripedLock, self).__init__(key, context)
+            self.model = model
+
+        def __enter__(self):
+            super(StripedLock, self).__enter__()
+            (self.model.objects.select_for_update()
+             .get(id=lock_stripe(self.obj)))
@@ -60,13 +60,42 @@ DATABASES = {
 # work with sqlite3.  The other models require a database
 # APPFWK_TASK_MODEL = 'sync'
 APPFWK_TASK_MODEL = 'async'
+# APPFWK_TASK_MODEL = 'threadpool'
+# APPFWK_TASK_MODEL = 'process'
 # APPFWK_TASK_MODEL = 'celery'
 
+# Number of threads for the 'threadpool' task model, further tasks
+# are queued with interactive jobs ahead of background ones
+APPFWK_THREAD_POOL_SIZE = 16
+
+# Number of worker processes for the 'process' task model, defaults to
+# the number of CPUs when 0.  Use for CPU heavy analysis tables.  With
+# sqlite3, workers lock jobs through a lock file next to the database
+# file, so the database must be a file on a local filesystem.
+APPFWK_PROCESS_POOL_SIZE = 0
+
+# Storage format for job data files in DATA_CACHE, 'pickle' or 'feather'.
+# Feather files are columnar and memory-mapped, so callers asking for a
+# subset of columns only load those, this requires the pyarrow package.
+# Existing pickle files are still read after switching to feather.
+APPFWK_JOB_DATASTORE = 'pickle'
+
+# Memory in MB for the per-process cache of recently used job data,
+# set to 0 to always read job data from DATA_CACHE.  Each web server
+# process and each 'process' task model worker has its own cache.
+APPFWK_JOB_DATA_CACHE_MB = 64
+
 # Location of progressd daemon, default for locally running
 PROGRESSD_HOST = 'http://127.0.0.1'
 PROGRESSD_PORT = '5000'
 # Seconds that it takes to restart progressd with around 5000 jobs
 PROGRESSD_CONN_TIMEOUT = 10
+# How to reach progressd, 'http' or 'socket'.  The socket backend keeps
+# a persistent connection per thread to the Unix domain socket below,
+# progressd must be started with '--socket <PROGRESSD_SOCKET>'.  Requests
+# fall back to HTTP if the socket cannot be reached.
+PROGRESSD_BACKEND = 'http'
+PROGRESSD_SOCKET = os.path.join(DATAHOME, 'data', 'progressd.sock')
 
 # Local time zone for this installation. Choices can be found here:
 # http://en.wikipedia.org/wiki/List_of_tz_zones_by_name
@@ -456,6 +485,17 @@ APPS_DATASOURCE = {
     'threading': True
 }
 
+# Default deadline in seconds for jobs started from reports and the
+# REST API, 0 for none.  Child jobs inherit the deadline of their parent.
+APPFWK_JOB_DEADLINE_SECONDS = 0
+
+# Number of jobs deleted per transaction by the janitor management command
+APPFWK_JANITOR_BATCH_SIZE = 500
+
+# Size limit of job data files in DATA_CACHE in MB, 0 for no limit.  The
+# janitor deletes the least recently used unreferenced jobs to fit.
+APPFWK_DATACACHE_QUOTA_MB = 0
+
 TESTING = 'test' in sys.argv
 TEST_RUNNER = 'steelscript.appfwk.project.testing.AppfwkTestRunner'
 